@@ -1,42 +1,58 @@
-import csv
-import time
+import argparse
 import os
+import sys
+import time
+
+# The shared vectorized generator lives with the binary format code
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'toy_parquet_format'))
+from datagen import Column, DatasetSpec, Modular, Sequence, Template, generate
 
 # Configuration for LARGER DATA
 num_rows = 5000000 # 5 Million rows - significantly larger
 num_cols = 50     # More columns - making rows wider
 filename = 'massive_wide_data.csv'
-
-print(f"Creating a MUCH larger wide dataset with {num_rows} rows and {num_cols} columns...")
-print(f"This may take several minutes and consume significant disk space (~{num_rows * num_cols * 20 / (1024*1024):.0f} MB estimated)...") # Rough estimate
+columnar_filename = 'massive_wide_data.mycol' # Same rows as MYCOL1 for queries.py Query 3; only with --columnar (about as large as the CSV)
+random_seed = 42  # Same seed -> same file, whatever the worker count
+num_workers = os.cpu_count() # Blocks of rows are generated in parallel and written in order
 
 headers = [f'col_{i}' for i in range(num_cols)]
 headers[5] = 'price' # Our target numeric column
 headers[0] = 'id'
 headers[1] = 'category' # Add a column for potential future exercises
 
-start_time = time.time()
-with open(filename, 'w', newline='') as csvfile:
-    writer = csv.writer(csvfile)
-    writer.writerow(headers)
-
-    # Write data in chunks to provide feedback (optional, but nice for large files)
-    chunk_size = 100000
-    for i in range(num_rows):
-        row = [i] # id
-        row.append(f'cat_{(i % 10)}') # category (low cardinality)
-        for j in range(2, num_cols): # Start from index 2
-            if headers[j] == 'price':
-                row.append(f"{i % 1000 + 0.75:.2f}") # Sample price data
-            else:
-                row.append(f"data_row_{i}_col_{j}_some_extra_text_to_increase_size") # Other random data, longer strings
-        writer.writerow(row)
-        if (i + 1) % chunk_size == 0:
-            print(f"  {i + 1}/{num_rows} rows written...")
-
-end_time = time.time()
-duration = end_time - start_time
-
-print(f"Dataset '{filename}' created.")
-print(f"Creation time: {duration:.2f} seconds")
-print(f"Actual File size: {os.path.getsize(filename) / (1024*1024):.2f} MB")
\ No newline at end of file
+columns = []
+for j, name in enumerate(headers):
+    if name == 'id':
+        columns.append(Column(name, 'int', Sequence()))
+    elif name == 'category':
+        columns.append(Column(name, 'string', Template('cat_', Modular(10)))) # category (low cardinality)
+    elif name == 'price':
+        columns.append(Column(name, 'float', Modular(1000, offset=0.75), decimals=2)) # Sample price data
+    else:
+        # Other random data, longer strings
+        columns.append(Column(name, 'string', Template('data_row_', Sequence(), f'_col_{j}_some_extra_text_to_increase_size')))
+
+dataset = DatasetSpec(columns, num_rows, seed=random_seed, block_rows=100000)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate the large wide CSV used by the I/O exercises.")
+    parser.add_argument('--columnar', nargs='?', const=columnar_filename, default=None, metavar='FILE',
+                        help=f"Also write the rows as MYCOL1 (default file: {columnar_filename}); needs as much disk again as the CSV.")
+    args = parser.parse_args()
+
+    print(f"Creating a MUCH larger wide dataset with {num_rows} rows and {num_cols} columns...")
+    print(f"This may take several minutes and consume significant disk space (~{num_rows * num_cols * 20 / (1024*1024):.0f} MB estimated)...") # Rough estimate
+
+    start_time = time.time()
+    outputs = {'csv': filename}
+    if args.columnar:
+        outputs['mycol'] = args.columnar
+    generate(dataset, outputs, workers=num_workers)
+    end_time = time.time()
+    duration = end_time - start_time
+
+    print(f"Dataset '{filename}' created.")
+    print(f"Creation time: {duration:.2f} seconds")
+    print(f"Actual File size: {os.path.getsize(filename) / (1024*1024):.2f} MB")
+    if args.columnar:
+        print(f"Columnar copy '{args.columnar}' size: {os.path.getsize(args.columnar) / (1024*1024):.2f} MB")
@@ -1,9 +1,11 @@
 import csv
 import time
 import os
+import sys
 
 # Configuration - MUST match the data creation script's output filename
 filename = 'massive_wide_data.csv'
+columnar_filename = 'massive_wide_data.mycol' # MYCOL1 copy written by data_file_generator.py
 price_column_name = 'price'
 id_column_name = 'id'
 
@@ -79,3 +81,21 @@ avg_id, count_id, time_id = read_column_for_calculation(filename, id_column_name
 if avg_id is not None:
      print(f"\nAverage ID: {avg_id:.2f} (from {count_id} values)")
      print(f"Time taken for ID Query: {time_id:.4f} seconds")
+
+print("\n--- Running Query 3: Both averages from the MYCOL1 footer ---")
+# The columnar copy stores count / non_null / sum / min / max per column chunk in its footer,
+# so unfiltered aggregates need no data reads at all.
+if os.path.exists(columnar_filename):
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'toy_parquet_format'))
+    from metadata_query import aggregate_columnar_file
+
+    start_time = time.time()
+    results, report = aggregate_columnar_file(columnar_filename, [('avg', price_column_name), ('avg', id_column_name)])
+    duration = time.time() - start_time
+    print(f"\nAverage Price: {results[('avg', price_column_name)]:.2f}")
+    print(f"Average ID: {results[('avg', id_column_name)]:.2f}")
+    print(f"Row groups answered from the footer: {report['row_groups_from_metadata']} of {report['row_groups']} "
+          f"({report['bytes_read']} bytes of data read)")
+    print(f"Time taken for both averages: {duration:.4f} seconds")
+else:
+    print(f"'{columnar_filename}' not found; skipping. Run data_file_generator.py --columnar to create it.")
@@ -1,59 +1,44 @@
+import argparse
 import pandas as pd
 import numpy as np
 import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
 import pyarrow.parquet as pq
 import os
-import datetime
+import resource
+import sys
+import time
 
 # --- Configuration for the Demo Parquet File ---
 parquet_demo_file = "my_concept_demo.parquet"
 num_rows = 150000 # Enough to guarantee multiple row groups
 row_group_size = 50000 # This will create 3 row groups (150,000 / 50,000)
+data_page_size = 64 * 1024 # Smaller pages -> finer-grained page index pruning (default is 1 MB)
+write_page_index = True # Emit ColumnIndex (per-page min/max) and OffsetIndex (page locations)
+# Dictionary pages are read whole before any data page, so keep them to low-cardinality columns
+dictionary_columns = ['status', 'category', 'is_active']
+# Bloom filters help point lookups on high-cardinality columns where min/max cannot prune.
+# A filter is built per column chunk, so size it for one row group, not the whole file.
+bloom_filter_columns = {
+    'description': {'ndv': row_group_size, 'fpp': 0.01},
+    'id': {'ndv': row_group_size, 'fpp': 0.01},
+}
 
-# --- 1. Generate Data with Diverse Characteristics ---
-print(f"Generating {num_rows} rows of demo data...")
-
-# Column A: id (int) - Simple int, usually Plain or RLE
-ids = np.arange(num_rows)
-
-# Column B: status (string) - LOW CARDINALITY -> should trigger Dictionary Encoding
 statuses = ['PENDING', 'PROCESSED', 'FAILED', 'CANCELLED', 'SHIPPED', 'COMPLETED']
-status_data = np.random.choice(statuses, num_rows)
-
-# Column C: amount (float) - High cardinality float
-amounts = np.random.rand(num_rows) * 1000 + 10
-
-# Column D: category (string) - MEDIUM CARDINALITY -> might trigger Dictionary Encoding
 categories = [f'CAT_{i}' for i in range(50)] # 50 unique categories
-category_data = np.random.choice(categories, num_rows)
-
-# Column E: is_active (int/boolean) - VERY LOW CARDINALITY, repetitive -> good for RLE/Bit-packing (if auto-chosen)
-is_active_data = np.random.randint(0, 2, num_rows) # 0 or 1
-
-# Column F: timestamp (datetime) - Shows timestamp type
-timestamps = pd.to_datetime('2023-01-01') + pd.to_timedelta(np.arange(num_rows), unit='s')
-
-# Column G: description (string) - HIGH CARDINALITY string
-descriptions = [f"Description for item {i} with some random suffix {'X' * (i%10)}" for i in range(num_rows)]
-
-# Create Pandas DataFrame
-data = pd.DataFrame({
-    'id': ids,
-    'status': status_data,
-    'amount': amounts,
-    'category': category_data,
-    'is_active': is_active_data,
-    'timestamp': timestamps,
-    'description': descriptions
-})
-
-print("Data generated.")
-
-# --- 2. Write to Parquet File with Specific Parameters ---
-print(f"Writing data to '{parquet_demo_file}' with Row Group Size = {row_group_size}...")
-
-# Convert Pandas DataFrame to a PyArrow Table (necessary for fine-grained control)
-table = pa.Table.from_pandas(data, preserve_index=False)
+start_timestamp = pd.Timestamp('2023-01-01')
+description_suffixes = ['X' * k for k in range(10)]
+
+demo_schema = pa.schema([
+    ('id', pa.int64()),
+    ('status', pa.string()),
+    ('amount', pa.float64()),
+    ('category', pa.string()),
+    ('is_active', pa.int64()),
+    ('timestamp', pa.timestamp('us')),
+    ('description', pa.string()),
+])
 
 # Define column-specific compression.
 # PyArrow typically auto-detects encoding like Dictionary for low-cardinality strings.
@@ -68,14 +53,126 @@ compression_args = {
     'description': 'gzip' # Good for high-cardinality strings
 }
 
-# Write the Parquet file
-pq.write_table(
-    table,
-    parquet_demo_file,
-    row_group_size=row_group_size, # Control Row Group size
+writer_args = dict(
     compression=compression_args,  # Apply column-specific compression
-    version='1.0'                  # Use Parquet 2.0 format (common default)
+    use_dictionary=dictionary_columns, # Dictionary-encode only the low-cardinality columns
+    version='2.6',                 # Use Parquet 2.x format (common default)
+    data_page_size=data_page_size, # Target encoded size of each data page
+    write_page_index=write_page_index, # Page-level min/max + page offsets in the footer area
+    bloom_filter_options=bloom_filter_columns # Per-chunk Bloom filters for point lookups
 )
 
-print(f"Parquet file '{parquet_demo_file}' created.")
-print(f"File size: {os.path.getsize(parquet_demo_file) / (1024*1024):.2f} MB")
\ No newline at end of file
+
+# --- 1. Generate Data with Diverse Characteristics ---
+
+def generate_batch(start, count, rng):
+    """Rows [start, start + count) of the demo data as one RecordBatch, built column-wise."""
+    ids = np.arange(start, start + count, dtype=np.int64)
+
+    # Column B: status (string) - LOW CARDINALITY -> should trigger Dictionary Encoding
+    status_data = pa.array(statuses).take(pa.array(rng.integers(0, len(statuses), count)))
+    # Column C: amount (float) - High cardinality float
+    amounts = rng.random(count) * 1000 + 10
+    # Column D: category (string) - MEDIUM CARDINALITY -> might trigger Dictionary Encoding
+    category_data = pa.array(categories).take(pa.array(rng.integers(0, len(categories), count)))
+    # Column E: is_active (int/boolean) - VERY LOW CARDINALITY, repetitive -> good for RLE/Bit-packing
+    is_active_data = rng.integers(0, 2, count) # 0 or 1
+    # Column F: timestamp (datetime) - one row per second
+    timestamps = (start_timestamp + pd.to_timedelta(ids, unit='s')).values.astype('datetime64[us]')
+    # Column G: description (string) - HIGH CARDINALITY string, built with Arrow kernels, not a Python list
+    suffixes = pa.array(description_suffixes).take(pa.array(ids % 10))
+    descriptions = pc.binary_join_element_wise(
+        "Description for item", pc.cast(pa.array(ids), pa.string()), "with some random suffix", suffixes, " "
+    )
+
+    return pa.record_batch(
+        [pa.array(ids), status_data, pa.array(amounts), category_data, pa.array(is_active_data),
+         pa.array(timestamps, pa.timestamp('us')), descriptions],
+        schema=demo_schema,
+    )
+
+
+def generate_batches(total_rows, batch_size, rng):
+    for start in range(0, total_rows, batch_size):
+        yield generate_batch(start, min(batch_size, total_rows - start), rng)
+
+
+def csv_batches(csv_path, block_size=16 * 1024 * 1024):
+    """Stream an existing CSV as RecordBatches (one per ~block_size of input) for ingestion."""
+    convert_options = pv.ConvertOptions(column_types={field.name: field.type for field in demo_schema})
+    reader = pv.open_csv(csv_path, read_options=pv.ReadOptions(block_size=block_size), convert_options=convert_options)
+    for batch in reader:
+        yield batch
+
+
+# --- 2. Write to Parquet File with Specific Parameters ---
+
+def write_in_memory(path, total_rows, rng):
+    """Original approach: whole dataset as a DataFrame, then a Table, then one write_table call."""
+    data = generate_batch(0, total_rows, rng).to_pandas()
+    print("Data generated.")
+    # Convert Pandas DataFrame to a PyArrow Table (necessary for fine-grained control)
+    table = pa.Table.from_pandas(data, schema=demo_schema, preserve_index=False)
+    pq.write_table(table, path, row_group_size=row_group_size, **writer_args)
+
+
+def write_streaming(path, batches, schema):
+    """
+    Write batches through one ParquetWriter, emitting exactly one row group per
+    row_group_size rows. Only the current row group (plus one incoming batch) is held
+    in memory, so peak memory is set by row_group_size, not by the row count.
+    """
+    pending, pending_rows, row_groups_written = [], 0, 0
+    with pq.ParquetWriter(path, schema, **writer_args) as writer:
+        for batch in batches:
+            pending.append(batch)
+            pending_rows += batch.num_rows
+            while pending_rows >= row_group_size:
+                buffered = pa.Table.from_batches(pending, schema)
+                writer.write_table(buffered.slice(0, row_group_size), row_group_size=row_group_size)
+                remainder = buffered.slice(row_group_size)
+                pending = remainder.to_batches()
+                pending_rows = remainder.num_rows
+                row_groups_written += 1
+        if pending_rows:
+            writer.write_table(pa.Table.from_batches(pending, schema), row_group_size=row_group_size)
+            row_groups_written += 1
+    return row_groups_written
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate the demo Parquet file.")
+    parser.add_argument('--rows', type=int, default=num_rows)
+    parser.add_argument('--streaming', action='store_true',
+                        help="Generate and write in record batches through ParquetWriter (bounded memory).")
+    parser.add_argument('--batch-size', type=int, default=row_group_size, help="Rows per generated batch in streaming mode.")
+    parser.add_argument('--ingest-csv', default=None, help="Stream this CSV (demo schema) into Parquet instead of generating data.")
+    parser.add_argument('--output', default=parquet_demo_file)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng()
+    start_time = time.time()
+
+    if args.ingest_csv:
+        print(f"Streaming '{args.ingest_csv}' into '{args.output}' with Row Group Size = {row_group_size}...")
+        written = write_streaming(args.output, csv_batches(args.ingest_csv), demo_schema)
+        print(f"{written} row groups written.")
+    elif args.streaming:
+        print(f"Streaming {args.rows} rows into '{args.output}' in batches of {args.batch_size} "
+              f"with Row Group Size = {row_group_size}, Data Page Size = {data_page_size} bytes...")
+        written = write_streaming(args.output, generate_batches(args.rows, args.batch_size, rng), demo_schema)
+        print(f"{written} row groups written.")
+    else:
+        print(f"Generating {args.rows} rows of demo data...")
+        print(f"Writing data to '{args.output}' with Row Group Size = {row_group_size}, Data Page Size = {data_page_size} bytes...")
+        write_in_memory(args.output, args.rows, rng)
+
+    duration = time.time() - start_time
+    # ru_maxrss is in KB on Linux but in bytes on macOS
+    rss_units_per_mb = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / rss_units_per_mb
+
+    print(f"Parquet file '{args.output}' created in {duration:.2f} seconds.")
+    print(f"File size: {os.path.getsize(args.output) / (1024*1024):.2f} MB")
+    print(f"Peak process memory (ru_maxrss): {peak_rss_mb:.1f} MB")
+    print(f"Page index written: {write_page_index}, Bloom filters on: {list(bloom_filter_columns)}")
@@ -0,0 +1,174 @@
+import argparse
+import io
+import json
+import os
+import time
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# --- Configuration ---
+parquet_file = "my_concept_demo.parquet" # Sample source; any Parquet file works
+sample_rows = 50000     # Total rows trial-written per column
+sample_blocks = 5       # Contiguous blocks taken across the file (keeps local ordering, which encodings exploit)
+repeats = 3             # Best-of-N timing for encode/decode
+io_bandwidth_mb_s = 200 # Storage bandwidth used to turn bytes into scan time for the 'scan' objective
+target_row_group_mb = 128 # Target compressed row group size for the row_group_size suggestion
+
+CANDIDATE_CODECS = ['none', 'snappy', 'lz4', 'zstd', 'gzip', 'brotli']
+OBJECTIVES = ('size', 'scan', 'balanced')
+
+
+def candidate_encodings(arrow_type):
+    """Non-dictionary encodings worth trying for a column of this Arrow type."""
+    if pa.types.is_floating(arrow_type):
+        return ['PLAIN', 'BYTE_STREAM_SPLIT']
+    if pa.types.is_integer(arrow_type) or pa.types.is_timestamp(arrow_type) or pa.types.is_date(arrow_type):
+        return ['PLAIN', 'DELTA_BINARY_PACKED', 'BYTE_STREAM_SPLIT']
+    if pa.types.is_string(arrow_type) or pa.types.is_binary(arrow_type) or pa.types.is_large_string(arrow_type):
+        return ['PLAIN', 'DELTA_LENGTH_BYTE_ARRAY', 'DELTA_BYTE_ARRAY']
+    if pa.types.is_boolean(arrow_type):
+        return ['PLAIN', 'RLE']
+    return ['PLAIN']
+
+
+def sample_table(filename, rows=sample_rows, blocks=sample_blocks):
+    """Read a few evenly spaced row groups and take a contiguous block from each."""
+    parquet_file_handle = pq.ParquetFile(filename)
+    num_row_groups = parquet_file_handle.metadata.num_row_groups
+    chosen = sorted(set(np.linspace(0, num_row_groups - 1, min(blocks, num_row_groups)).astype(int).tolist()))
+    rows_per_block = max(1, rows // len(chosen))
+    pieces = [parquet_file_handle.read_row_group(i).slice(0, rows_per_block) for i in chosen]
+    return pa.concat_tables(pieces)
+
+
+def trial_write(column_table, codec, use_dictionary, encoding):
+    """Write one single-column table in memory. Returns (size_bytes, encode_s, decode_s) or None if unsupported."""
+    name = column_table.column_names[0]
+    kwargs = {'compression': codec, 'use_dictionary': use_dictionary}
+    if encoding is not None:
+        kwargs['column_encoding'] = {name: encoding}
+
+    encode_times, decode_times = [], []
+    try:
+        for _ in range(repeats):
+            buf = io.BytesIO()
+            start = time.perf_counter()
+            pq.write_table(column_table, buf, **kwargs)
+            encode_times.append(time.perf_counter() - start)
+
+            data = buf.getvalue()
+            start = time.perf_counter()
+            pq.read_table(pa.BufferReader(data))
+            decode_times.append(time.perf_counter() - start)
+    except (pa.ArrowNotImplementedError, pa.ArrowInvalid, OSError):
+        return None # Encoding not valid for this physical type / codec not built in
+    return len(data), min(encode_times), min(decode_times)
+
+
+def evaluate_column(column_table):
+    """Trial every (codec, dictionary, encoding) combination for one column."""
+    arrow_type = column_table.schema.field(0).type
+    codecs = [c for c in CANDIDATE_CODECS if c == 'none' or pa.Codec.is_available(c)]
+    layouts = [(True, None)] + [(False, encoding) for encoding in candidate_encodings(arrow_type)]
+
+    results = []
+    for codec in codecs:
+        for use_dictionary, encoding in layouts:
+            measured = trial_write(column_table, codec, use_dictionary, encoding)
+            if measured is None:
+                continue
+            size, encode_s, decode_s = measured
+            results.append({
+                'codec': codec,
+                'dictionary': use_dictionary,
+                'encoding': 'DICTIONARY' if use_dictionary else encoding,
+                'size': size,
+                'encode_s': encode_s,
+                'decode_s': decode_s,
+                'scan_s': decode_s + size / (io_bandwidth_mb_s * 1024 * 1024),
+            })
+    return results
+
+
+def pick(results, objective):
+    """Choose the best trial for an objective: smallest file, fastest scan, or both normalized."""
+    if objective == 'size':
+        return min(results, key=lambda r: (r['size'], r['scan_s']))
+    if objective == 'scan':
+        return min(results, key=lambda r: (r['scan_s'], r['size']))
+    best_size = min(r['size'] for r in results)
+    best_scan = min(r['scan_s'] for r in results)
+    return min(results, key=lambda r: r['size'] / best_size + r['scan_s'] / best_scan)
+
+
+def recommend(table, objective='balanced'):
+    """
+    Returns (writer_config, per_column_details). writer_config can be passed straight to
+    pq.write_table(**writer_config).
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Objective must be one of {OBJECTIVES}, got '{objective}'.")
+    compression, dictionary_columns, column_encoding = {}, [], {}
+    details = {}
+    sampled_bytes = 0
+    for name in table.column_names:
+        results = evaluate_column(table.select([name]))
+        best = pick(results, objective)
+        details[name] = {'best': best, 'trials': results}
+        sampled_bytes += best['size']
+        compression[name] = best['codec']
+        if best['dictionary']:
+            dictionary_columns.append(name)
+        else:
+            column_encoding[name] = best['encoding']
+
+    # Size row groups from the measured bytes/row so they land near the target
+    bytes_per_row = sampled_bytes / max(1, table.num_rows)
+    row_group_size = int(target_row_group_mb * 1024 * 1024 / max(bytes_per_row, 1))
+
+    writer_config = {
+        'compression': compression,
+        'use_dictionary': dictionary_columns,
+        'column_encoding': column_encoding,
+        'row_group_size': row_group_size,
+    }
+    return writer_config, details
+
+
+def print_details(details):
+    print(f"   {'column':<14}{'codec':<9}{'encoding':<26}{'size KB':>10}{'enc ms':>9}{'dec ms':>9}  (worst size KB / best)")
+    for name, info in details.items():
+        best = info['best']
+        worst_size = max(r['size'] for r in info['trials'])
+        print(f"   {name:<14}{best['codec']:<9}{best['encoding']:<26}{best['size'] / 1024:>10.1f}"
+              f"{best['encode_s'] * 1000:>9.2f}{best['decode_s'] * 1000:>9.2f}  ({worst_size / 1024:.1f} KB, "
+              f"{worst_size / best['size']:.1f}x, {len(info['trials'])} trials)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Trial-write sampled columns with candidate codecs/encodings and recommend a writer configuration.")
+    parser.add_argument('file', nargs='?', default=parquet_file)
+    parser.add_argument('--objective', choices=OBJECTIVES, default='balanced')
+    parser.add_argument('--output', default=None, help="Optional JSON file to store the recommended writer configuration.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        print(f"Error: {args.file} not found. Please run the generation script first.")
+        raise SystemExit(1)
+
+    print(f"\n--- Encoding & Compression Advisor for '{args.file}' (objective: {args.objective}) ---")
+    start_time = time.time()
+    sample = sample_table(args.file)
+    print(f"   Sampled {sample.num_rows} rows (up to {sample_blocks} contiguous blocks).")
+    writer_config, details = recommend(sample, args.objective)
+    print_details(details)
+    print(f"   Advisor time: {time.time() - start_time:.2f} seconds")
+
+    print("\n   Recommended pq.write_table(...) arguments:")
+    print(json.dumps(writer_config, indent=4))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(writer_config, f, indent=4)
+        print(f"   Saved to '{args.output}'.")
@@ -0,0 +1,245 @@
+import argparse
+import base64
+import datetime
+import decimal
+import json
+import os
+import time
+
+import pyarrow.parquet as pq
+
+from row_group_pruning import column_stats_for_row_group, parse_predicate, row_group_may_match, stats_may_match
+
+# --- Configuration ---
+dataset_dir = "." # Directory of Parquet files (e.g. where complete_parquet.py wrote my_concept_demo.parquet)
+CACHE_FILENAME = "_metadata_cache.json" # One read loads every footer summary for the directory
+CACHE_VERSION = 1
+
+
+# --- JSON encoding of statistics values ---
+# Footer min/max come back as datetime, date, bytes, Decimal... which JSON cannot hold.
+# Tag them so they round-trip to the same Python types the predicates are parsed into.
+
+def encode_stat(value):
+    if isinstance(value, datetime.datetime):
+        return {'__type__': 'datetime', 'value': value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {'__type__': 'date', 'value': value.isoformat()}
+    if isinstance(value, bytes):
+        return {'__type__': 'bytes', 'value': base64.b64encode(value).decode('ascii')}
+    if isinstance(value, decimal.Decimal):
+        return {'__type__': 'decimal', 'value': str(value)}
+    return value
+
+
+def decode_stat(value):
+    if not isinstance(value, dict):
+        return value
+    kind = value['__type__']
+    if kind == 'datetime':
+        return datetime.datetime.fromisoformat(value['value'])
+    if kind == 'date':
+        return datetime.date.fromisoformat(value['value'])
+    if kind == 'bytes':
+        return base64.b64decode(value['value'])
+    if kind == 'decimal':
+        return decimal.Decimal(value['value'])
+    raise ValueError(f"Unknown cached statistics type '{kind}'.")
+
+
+# --- Building entries ---
+
+def summarize_file(path):
+    """Read one footer and reduce it to the schema, row-group stats and chunk offsets planning needs."""
+    parquet_metadata = pq.read_metadata(path)
+    schema = parquet_metadata.schema
+    arrow_schema = schema.to_arrow_schema()
+    row_groups = []
+    for i in range(parquet_metadata.num_row_groups):
+        rg_metadata = parquet_metadata.row_group(i)
+        column_stats = column_stats_for_row_group(rg_metadata, schema)
+        columns = {}
+        for j in range(rg_metadata.num_columns):
+            col_metadata = rg_metadata.column(j)
+            stats = column_stats[schema[j].name]
+            columns[schema[j].name] = {
+                'min': encode_stat(stats['min']),
+                'max': encode_stat(stats['max']),
+                'null_count': stats['null_count'],
+                'num_values': stats['num_values'],
+                'file_offset': col_metadata.file_offset,
+                'data_page_offset': col_metadata.data_page_offset,
+                'dictionary_page_offset': col_metadata.dictionary_page_offset,
+                'total_compressed_size': col_metadata.total_compressed_size,
+            }
+        row_groups.append({
+            'num_rows': rg_metadata.num_rows,
+            'total_byte_size': rg_metadata.total_byte_size,
+            'columns': columns,
+        })
+    return {
+        'num_rows': parquet_metadata.num_rows,
+        'created_by': parquet_metadata.created_by,
+        'schema': [[field.name, str(field.type)] for field in arrow_schema],
+        'row_groups': row_groups,
+    }
+
+
+def list_parquet_files(directory):
+    return sorted(
+        name for name in os.listdir(directory)
+        if name.endswith('.parquet') and not name.startswith(('_', '.'))
+    )
+
+
+# --- Load / Refresh ---
+
+def load_cache(directory):
+    """Load the whole directory summary in a single read. Returns an empty cache if missing/stale."""
+    cache_path = os.path.join(directory, CACHE_FILENAME)
+    try:
+        with open(cache_path, 'r') as f:
+            cache = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {'version': CACHE_VERSION, 'files': {}}
+    if cache.get('version') != CACHE_VERSION:
+        return {'version': CACHE_VERSION, 'files': {}}
+    return cache
+
+
+def save_cache(directory, cache):
+    """Write to a temp file and rename so readers never see a half-written cache."""
+    cache_path = os.path.join(directory, CACHE_FILENAME)
+    tmp_path = cache_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(cache, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, cache_path)
+
+
+def refresh_cache(directory):
+    """
+    Bring the cache in line with the directory. Only files that are new or whose
+    (size, mtime) changed have their footers re-read; deleted files are dropped.
+    Returns (cache, changes_dict).
+    """
+    cache = load_cache(directory)
+    cached_files = cache['files']
+    changes = {'added': [], 'updated': [], 'removed': [], 'unchanged': 0}
+
+    present = list_parquet_files(directory)
+    for name in present:
+        st = os.stat(os.path.join(directory, name))
+        entry = cached_files.get(name)
+        if entry is not None and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns:
+            changes['unchanged'] += 1
+            continue
+        summary = summarize_file(os.path.join(directory, name))
+        summary['size'] = st.st_size
+        summary['mtime_ns'] = st.st_mtime_ns
+        changes['updated' if entry is not None else 'added'].append(name)
+        cached_files[name] = summary
+
+    for name in set(cached_files) - set(present):
+        del cached_files[name]
+        changes['removed'].append(name)
+
+    if changes['added'] or changes['updated'] or changes['removed']:
+        save_cache(directory, cache)
+    return cache, changes
+
+
+# --- Planning ---
+
+def decoded_row_group_stats(row_group):
+    return {
+        name: {**col, 'min': decode_stat(col['min']), 'max': decode_stat(col['max'])}
+        for name, col in row_group['columns'].items()
+    }
+
+
+def file_level_stats(row_groups_stats):
+    """Fold row-group stats into one zone map per file so whole files can be skipped first."""
+    merged = {}
+    for column_stats in row_groups_stats:
+        for name, entry in column_stats.items():
+            current = merged.get(name)
+            if current is None:
+                merged[name] = dict(entry)
+                continue
+            try:
+                current['min'] = None if current['min'] is None or entry['min'] is None else min(current['min'], entry['min'])
+                current['max'] = None if current['max'] is None or entry['max'] is None else max(current['max'], entry['max'])
+            except TypeError:
+                current['min'] = current['max'] = None
+            if current['null_count'] is None or entry['null_count'] is None:
+                current['null_count'] = None
+            else:
+                current['null_count'] += entry['null_count']
+            current['num_values'] += entry['num_values']
+    return merged
+
+
+def plan_query(cache, predicates):
+    """
+    Decide which files and row groups to open, purely from the cache.
+    Returns (plan, report) where plan is [(filename, [row_group_indices])].
+    """
+    plan = []
+    report = {'files_total': 0, 'files_skipped': 0, 'row_groups_total': 0, 'row_groups_skipped': 0}
+    for name, entry in sorted(cache['files'].items()):
+        report['files_total'] += 1
+        row_groups_stats = [decoded_row_group_stats(rg) for rg in entry['row_groups']]
+        report['row_groups_total'] += len(row_groups_stats)
+
+        file_stats = file_level_stats(row_groups_stats)
+        if not all(stats_may_match(file_stats.get(p[0]), p) for p in predicates):
+            report['files_skipped'] += 1
+            report['row_groups_skipped'] += len(row_groups_stats)
+            continue
+
+        selected = [i for i, column_stats in enumerate(row_groups_stats) if row_group_may_match(column_stats, predicates)]
+        report['row_groups_skipped'] += len(row_groups_stats) - len(selected)
+        if selected:
+            plan.append((name, selected))
+        else:
+            report['files_skipped'] += 1
+    return plan, report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build/refresh a cached metadata summary for a directory of Parquet files and plan queries from it.")
+    parser.add_argument('directory', nargs='?', default=dataset_dir)
+    parser.add_argument('--where', action='append', default=[],
+                        help="Predicate such as 'id>=120000' or 'status=FAILED'. Repeat to AND.")
+    args = parser.parse_args()
+
+    print(f"\n--- Metadata Cache for '{args.directory}' ---")
+    start_time = time.time()
+    cache, changes = refresh_cache(args.directory)
+    refresh_duration = time.time() - start_time
+    print(f"   Refresh: {len(changes['added'])} added, {len(changes['updated'])} updated, "
+          f"{len(changes['removed'])} removed, {changes['unchanged']} unchanged ({refresh_duration:.4f} seconds)")
+
+    start_time = time.time()
+    cache = load_cache(args.directory)
+    load_duration = time.time() - start_time
+    total_row_groups = sum(len(entry['row_groups']) for entry in cache['files'].values())
+    print(f"   Loaded summary of {len(cache['files'])} files / {total_row_groups} row groups in {load_duration:.4f} seconds (one read)")
+
+    if args.where and cache['files']:
+        # Predicates are typed against the first file's schema; the files of a dataset share one
+        first_file = os.path.join(args.directory, sorted(cache['files'])[0])
+        arrow_schema = pq.read_schema(first_file)
+        predicates = [parse_predicate(text, arrow_schema) for text in args.where]
+
+        start_time = time.time()
+        plan, report = plan_query(cache, predicates)
+        plan_duration = time.time() - start_time
+        print(f"\n   Plan for: {' AND '.join(args.where)}")
+        print(f"   Files: {report['files_total']} total, {report['files_skipped']} skipped")
+        print(f"   Row Groups: {report['row_groups_total']} total, {report['row_groups_skipped']} skipped")
+        print(f"   Planning time (no footers opened): {plan_duration:.4f} seconds")
+        for name, row_groups in plan:
+            print(f"     - {name}: row groups {row_groups}")
@@ -0,0 +1,269 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from parquet_pages import (
+    bloom_filter_might_contain, chunk_start_offset, column_chunk_locations, decode_data_page,
+    decode_dictionary_page, decode_stat_value, plain_value_bytes, read_bloom_filter, read_column_index,
+    read_offset_index, read_page_header, read_raw_footer,
+)
+from row_group_pruning import (
+    column_stats_for_row_group, parse_predicate, predicates_to_expression, row_group_may_match, stats_may_match,
+)
+
+# Coalesced range reads are shared with the MYCOL1 reader
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'toy_parquet_format'))
+from range_reads import DEFAULT_MAX_GAP, DEFAULT_MAX_READ_SIZE, read_ranges
+
+# --- Configuration ---
+parquet_file = "my_concept_demo.parquet" # Written by complete_parquet.py with write_page_index=True
+default_predicates = ["description=Description for item 123456 with some random suffix XXXXXX"]
+default_columns = ["id", "amount", "status"]
+
+
+# --- Page Pruning ---
+
+def page_mask_for_predicate(column_index, offset_index, num_rows, predicate, physical_type, arrow_type):
+    """Row mask (True = may match) for one predicate, built from per-page min/max in the ColumnIndex."""
+    mask = np.ones(num_rows, dtype=bool)
+    for i, location in enumerate(offset_index):
+        first_row = location['first_row_index']
+        end_row = offset_index[i + 1]['first_row_index'] if i + 1 < len(offset_index) else num_rows
+        page_rows = end_row - first_row
+        if column_index['null_pages'][i]:
+            entry = {'min': None, 'max': None, 'null_count': page_rows, 'num_values': page_rows}
+        else:
+            null_counts = column_index['null_counts']
+            entry = {
+                'min': decode_stat_value(column_index['min_values'][i], physical_type, arrow_type),
+                'max': decode_stat_value(column_index['max_values'][i], physical_type, arrow_type),
+                'null_count': null_counts[i] if null_counts else None,
+                'num_values': page_rows,
+            }
+        if not stats_may_match(entry, predicate):
+            mask[first_row:end_row] = False
+    return mask
+
+
+def bloom_filter_excludes(f, chunk, predicate, arrow_type, report):
+    """True if the chunk's Bloom filter proves no value can satisfy an '=' / 'in' predicate."""
+    _, op, value = predicate
+    if op not in ('=', 'in') or chunk['bloom_filter_offset'] is None:
+        return False
+    bitset = read_bloom_filter(f, chunk)
+    report['index_bytes_read'] += chunk['bloom_filter_length'] or len(bitset)
+    candidates = value if op == 'in' else [value]
+    return not any(
+        bloom_filter_might_contain(bitset, plain_value_bytes(v, chunk['physical_type'], arrow_type))
+        for v in candidates
+    )
+
+
+def selected_page_ranges(chunk, offset_index, row_mask):
+    """
+    Byte ranges to fetch for the rows in row_mask: [('dictionary', (offset, size))] if the chunk
+    has a dictionary page, then [(page_number, (offset, size))] for each data page overlapping the mask.
+    """
+    num_rows = len(row_mask)
+    ranges = []
+    start = chunk_start_offset(chunk)
+    first_data_page_offset = offset_index[0]['offset']
+    if start < first_data_page_offset: # Dictionary page sits in front of the first data page
+        ranges.append(('dictionary', (start, first_data_page_offset - start)))
+    for i, location in enumerate(offset_index):
+        first_row = location['first_row_index']
+        end_row = offset_index[i + 1]['first_row_index'] if i + 1 < len(offset_index) else num_rows
+        if row_mask[first_row:end_row].any():
+            ranges.append((i, (location['offset'], location['compressed_page_size'])))
+    return ranges
+
+
+def decode_selected_pages(chunk, offset_index, row_mask, page_buffers, max_definition_level, arrow_type, report):
+    """
+    Decode the buffers fetched for selected_page_ranges() ({key: bytes}) and return the values
+    of the selected rows as an Array of arrow_type.
+    """
+    num_rows = len(row_mask)
+    dictionary = None
+    if 'dictionary' in page_buffers:
+        dictionary_bytes = page_buffers['dictionary']
+        page, header_length = read_page_header(dictionary_bytes)
+        payload = dictionary_bytes[header_length:header_length + page['compressed_page_size']]
+        dictionary = decode_dictionary_page(page, payload, chunk['physical_type'], chunk['codec'])
+
+    pieces = []
+    for i, location in enumerate(offset_index):
+        first_row = location['first_row_index']
+        end_row = offset_index[i + 1]['first_row_index'] if i + 1 < len(offset_index) else num_rows
+        if i not in page_buffers:
+            report['pages_skipped'] += 1
+            continue
+        page_bytes = page_buffers[i]
+        report['pages_read'] += 1
+
+        page, header_length = read_page_header(page_bytes)
+        payload = page_bytes[header_length:header_length + page['compressed_page_size']]
+        values = decode_data_page(page, payload, chunk['physical_type'], chunk['codec'], max_definition_level, dictionary)
+        pieces.append(values.filter(pa.array(row_mask[first_row:end_row])))
+
+    physical = pa.concat_arrays(pieces) if pieces else pa.array([], pa.binary() if chunk['physical_type'] == 'BYTE_ARRAY' else pa.int64())
+    return physical.cast(arrow_type)
+
+
+def query_with_page_index(filename, predicates, columns, max_gap=DEFAULT_MAX_GAP, max_read_size=DEFAULT_MAX_READ_SIZE):
+    """
+    Prune row groups by footer stats and Bloom filters, then pages by the ColumnIndex,
+    and fetch only the surviving pages of the projected columns. The surviving pages of all
+    projected columns in a row group are fetched together with coalesced reads.
+    Returns (filtered_table, report_dict).
+    """
+    parquet_file_handle = pq.ParquetFile(filename)
+    parquet_metadata = parquet_file_handle.metadata
+    schema = parquet_metadata.schema
+    arrow_schema = parquet_file_handle.schema_arrow
+    chunk_locations = column_chunk_locations(read_raw_footer(filename))
+    max_definition_levels = {schema.column(j).path: schema.column(j).max_definition_level for j in range(len(schema))}
+
+    projection = list(dict.fromkeys(list(columns) + [p[0] for p in predicates]))
+    report = {
+        'row_groups_total': parquet_metadata.num_row_groups,
+        'row_groups_pruned_stats': 0,
+        'row_groups_pruned_bloom': 0,
+        'pages_read': 0,
+        'pages_skipped': 0,
+        'bytes_read': 0,            # Dictionary + data pages actually fetched
+        'bytes_chunk_level': 0,     # What a chunk-granular reader (row-group pruning only) would fetch
+        'bytes_projected_total': 0, # All projected chunks in the file
+        'index_bytes_read': 0,      # Column/offset index + Bloom filter overhead
+        'io': {},                   # read_ranges counters: ranges, reads, bytes_requested, bytes_read (incl. gaps)
+    }
+    result_tables = []
+
+    with open(filename, 'rb') as f:
+        for i in range(parquet_metadata.num_row_groups):
+            rg_metadata = parquet_metadata.row_group(i)
+            chunks = chunk_locations[i]['columns']
+            projected_bytes = sum(chunks[name]['total_compressed_size'] for name in projection)
+            report['bytes_projected_total'] += projected_bytes
+
+            if not row_group_may_match(column_stats_for_row_group(rg_metadata, schema), predicates):
+                report['row_groups_pruned_stats'] += 1
+                continue
+            report['bytes_chunk_level'] += projected_bytes
+
+            if any(bloom_filter_excludes(f, chunks[p[0]], p, arrow_schema.field(p[0]).type, report) for p in predicates):
+                report['row_groups_pruned_bloom'] += 1
+                continue
+
+            # Page-level pruning: intersect the row ranges each predicate's ColumnIndex allows
+            num_rows = rg_metadata.num_rows
+            row_mask = np.ones(num_rows, dtype=bool)
+            offset_indexes = {}
+            for name in projection:
+                chunk = chunks[name]
+                offset_indexes[name] = read_offset_index(f, chunk)
+                report['index_bytes_read'] += chunk['offset_index_length'] or 0
+            for predicate in predicates:
+                chunk = chunks[predicate[0]]
+                column_index = read_column_index(f, chunk)
+                if column_index is None or offset_indexes[predicate[0]] is None:
+                    continue
+                report['index_bytes_read'] += chunk['column_index_length']
+                row_mask &= page_mask_for_predicate(
+                    column_index, offset_indexes[predicate[0]], num_rows, predicate,
+                    chunk['physical_type'], arrow_schema.field(predicate[0]).type,
+                )
+            if not row_mask.any():
+                continue
+
+            # Plan the pages of every projected column, then fetch them all in as few reads as possible
+            planned = [(name, key, byte_range) for name in projection if offset_indexes[name] is not None
+                       for key, byte_range in selected_page_ranges(chunks[name], offset_indexes[name], row_mask)]
+            buffers = read_ranges(f, [byte_range for _, _, byte_range in planned], max_gap, max_read_size, report['io'])
+            page_buffers = {name: {} for name in projection}
+            for (name, key, byte_range), buffer in zip(planned, buffers):
+                page_buffers[name][key] = buffer
+                report['bytes_read'] += byte_range[1]
+
+            arrays = {}
+            for name in projection:
+                arrow_type = arrow_schema.field(name).type
+                offset_index = offset_indexes[name]
+                array = None
+                if offset_index is not None:
+                    try:
+                        array = decode_selected_pages(chunks[name], offset_index, row_mask, page_buffers[name], max_definition_levels[name], arrow_type, report)
+                    except NotImplementedError:
+                        pass # Encoding/codec this demo decoder does not handle
+                if array is None:
+                    # No offset index, or pages we cannot decode: read the whole chunk via PyArrow
+                    column = parquet_file_handle.read_row_group(i, columns=[name]).column(0).combine_chunks()
+                    array = column.filter(pa.array(row_mask))
+                    report['bytes_read'] += chunks[name]['total_compressed_size']
+                arrays[name] = array
+            result_tables.append(pa.table(arrays))
+
+    if result_tables:
+        table = pa.concat_tables(result_tables)
+        if predicates:
+            table = table.filter(predicates_to_expression(predicates))
+    else:
+        table = arrow_schema.empty_table().select(projection)
+    report['rows_matched'] = table.num_rows
+    return table, report
+
+
+def print_report(report, duration):
+    print(f"   Row Groups: {report['row_groups_total']} total, {report['row_groups_pruned_stats']} pruned by statistics, "
+          f"{report['row_groups_pruned_bloom']} pruned by Bloom filters")
+    print(f"   Pages read: {report['pages_read']}, pages skipped by page index: {report['pages_skipped']}")
+    print(f"   Bytes read (pages):                        {report['bytes_read'] / 1024:.2f} KB")
+    print(f"   Bytes a chunk-level reader would read:     {report['bytes_chunk_level'] / 1024:.2f} KB")
+    print(f"   Bytes avoided vs chunk-level reads:        {(report['bytes_chunk_level'] - report['bytes_read']) / 1024:.2f} KB")
+    print(f"   Bytes avoided vs all projected chunks:     {(report['bytes_projected_total'] - report['bytes_read']) / 1024:.2f} KB")
+    print(f"   Index / Bloom filter bytes read:           {report['index_bytes_read'] / 1024:.2f} KB")
+    io = report['io']
+    if io.get('ranges'):
+        print(f"   Page reads: {io['reads']} coalesced reads for {io['ranges']} page ranges "
+              f"({(io['bytes_read'] - io['bytes_requested']) / 1024:.2f} KB of gaps read through)")
+    print(f"   Rows matched: {report['rows_matched']}")
+    print(f"   Time taken: {duration:.4f} seconds")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Point lookups / range scans using the Parquet page index and Bloom filters.")
+    parser.add_argument('file', nargs='?', default=parquet_file)
+    parser.add_argument('--where', action='append', default=None,
+                        help="Predicate such as 'id=4242', 'timestamp>=2023-01-01 10:00:00'. Repeat to AND.")
+    parser.add_argument('--columns', default=','.join(default_columns), help="Comma separated projection.")
+    parser.add_argument('--max-gap', type=int, default=DEFAULT_MAX_GAP,
+                        help="Merge page reads separated by at most this many bytes (default %(default)s).")
+    parser.add_argument('--max-read-size', type=int, default=DEFAULT_MAX_READ_SIZE,
+                        help="Upper bound for one merged read in bytes (default %(default)s).")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        print(f"Error: {args.file} not found. Please run the generation script first.")
+        raise SystemExit(1)
+
+    arrow_schema = pq.read_schema(args.file)
+    predicate_texts = args.where if args.where is not None else default_predicates
+    predicates = [parse_predicate(text, arrow_schema) for text in predicate_texts]
+    columns = [c for c in args.columns.split(',') if c]
+
+    print(f"\n--- Page Index Query on '{args.file}' ---")
+    print(f"   Predicates: {' AND '.join(predicate_texts) or '(none)'}")
+    print(f"   Projection: {columns}")
+
+    start_time = time.time()
+    result_table, report = query_with_page_index(args.file, predicates, columns, args.max_gap, args.max_read_size)
+    duration = time.time() - start_time
+
+    print_report(report, duration)
+    print("\n   First matching rows:")
+    print(result_table.slice(0, 5).to_pandas())
@@ -0,0 +1,391 @@
+import os
+import struct
+
+import numpy as np
+import pyarrow as pa
+
+from thrift_compact import read_struct
+
+# Low-level access to the parts of a Parquet file PyArrow does not expose:
+# raw footer fields (page index / Bloom filter locations), page headers, page
+# decoding for flat columns, and Bloom filter probing.
+# Field ids below follow parquet-format's parquet.thrift.
+
+PARQUET_MAGIC = b'PAR1'
+
+PHYSICAL_TYPES = {0: 'BOOLEAN', 1: 'INT32', 2: 'INT64', 3: 'INT96', 4: 'FLOAT', 5: 'DOUBLE', 6: 'BYTE_ARRAY', 7: 'FIXED_LEN_BYTE_ARRAY'}
+ENCODINGS = {0: 'PLAIN', 2: 'PLAIN_DICTIONARY', 3: 'RLE', 4: 'BIT_PACKED', 5: 'DELTA_BINARY_PACKED',
+             6: 'DELTA_LENGTH_BYTE_ARRAY', 7: 'DELTA_BYTE_ARRAY', 8: 'RLE_DICTIONARY', 9: 'BYTE_STREAM_SPLIT'}
+CODECS = {0: 'UNCOMPRESSED', 1: 'SNAPPY', 2: 'GZIP', 3: 'LZO', 4: 'BROTLI', 5: 'LZ4', 6: 'ZSTD', 7: 'LZ4_RAW'}
+PAGE_TYPES = {0: 'DATA_PAGE', 1: 'INDEX_PAGE', 2: 'DICTIONARY_PAGE', 3: 'DATA_PAGE_V2'}
+
+# Parquet codec -> pyarrow.decompress codec name
+ARROW_CODECS = {'SNAPPY': 'snappy', 'GZIP': 'gzip', 'BROTLI': 'brotli', 'ZSTD': 'zstd', 'LZ4_RAW': 'lz4_raw'}
+
+# Physical type -> (struct format, arrow type) for fixed-width plain values
+PLAIN_FIXED = {
+    'INT32': ('<i4', pa.int32()),
+    'INT64': ('<i8', pa.int64()),
+    'FLOAT': ('<f4', pa.float32()),
+    'DOUBLE': ('<f8', pa.float64()),
+}
+DICTIONARY_ENCODINGS = ('PLAIN_DICTIONARY', 'RLE_DICTIONARY')
+
+
+# --- Footer ---
+
+def read_raw_footer(filename):
+    """Read and decode FileMetaData straight from the file tail (footer length + 'PAR1')."""
+    with open(filename, 'rb') as f:
+        f.seek(-8, os.SEEK_END)
+        footer_length, magic = struct.unpack('<I4s', f.read(8))
+        if magic != PARQUET_MAGIC:
+            raise ValueError(f"'{filename}' is not a Parquet file (bad footer magic).")
+        f.seek(-(8 + footer_length), os.SEEK_END)
+        footer_bytes = f.read(footer_length)
+    file_metadata, _ = read_struct(footer_bytes)
+    return file_metadata
+
+
+def column_chunk_locations(file_metadata):
+    """
+    Flatten the raw footer into one dict per (row group, column chunk) with the byte
+    locations we need: data/dictionary pages, page index and Bloom filter.
+    Returns a list (per row group) of {'num_rows', 'columns': {name: chunk_dict}}.
+    """
+    row_groups = []
+    for rg in file_metadata.get(4, []):
+        columns = {}
+        for chunk in rg.get(1, []):
+            meta = chunk.get(3, {})
+            name = '.'.join(p.decode('utf-8') for p in meta.get(3, []))
+            columns[name] = {
+                'physical_type': PHYSICAL_TYPES.get(meta.get(1)),
+                'encodings': [ENCODINGS.get(e, str(e)) for e in meta.get(2, [])],
+                'codec': CODECS.get(meta.get(4, 0)),
+                'num_values': meta.get(5),
+                'total_uncompressed_size': meta.get(6),
+                'total_compressed_size': meta.get(7),
+                'data_page_offset': meta.get(9),
+                'dictionary_page_offset': meta.get(11),
+                'encoding_stats': [
+                    {'page_type': PAGE_TYPES.get(s.get(1)), 'encoding': ENCODINGS.get(s.get(2)), 'count': s.get(3)}
+                    for s in meta.get(13, [])
+                ],
+                'bloom_filter_offset': meta.get(14),
+                'bloom_filter_length': meta.get(15),
+                'offset_index_offset': chunk.get(4),
+                'offset_index_length': chunk.get(5),
+                'column_index_offset': chunk.get(6),
+                'column_index_length': chunk.get(7),
+            }
+        row_groups.append({'num_rows': rg.get(3), 'columns': columns})
+    return row_groups
+
+
+def chunk_start_offset(chunk):
+    """A chunk starts at its dictionary page if it has one, else at its first data page."""
+    dictionary_offset = chunk['dictionary_page_offset']
+    if dictionary_offset is not None and 0 < dictionary_offset < chunk['data_page_offset']:
+        return dictionary_offset
+    return chunk['data_page_offset']
+
+
+# --- Page Index ---
+
+def read_offset_index(f, chunk):
+    """Returns [{'offset', 'compressed_page_size', 'first_row_index'}] or None if absent."""
+    if chunk['offset_index_offset'] is None:
+        return None
+    f.seek(chunk['offset_index_offset'])
+    offset_index, _ = read_struct(f.read(chunk['offset_index_length']))
+    return [{'offset': loc[1], 'compressed_page_size': loc[2], 'first_row_index': loc[3]} for loc in offset_index.get(1, [])]
+
+
+def read_column_index(f, chunk):
+    """Returns {'null_pages', 'min_values', 'max_values', 'null_counts'} (raw plain bytes) or None."""
+    if chunk['column_index_offset'] is None:
+        return None
+    f.seek(chunk['column_index_offset'])
+    column_index, _ = read_struct(f.read(chunk['column_index_length']))
+    return {
+        'null_pages': column_index.get(1, []),
+        'min_values': column_index.get(2, []),
+        'max_values': column_index.get(3, []),
+        'null_counts': column_index.get(5),
+    }
+
+
+def decode_stat_value(raw, physical_type, arrow_type):
+    """Decode a plain-encoded min/max (column index or page stats) to the column's logical Python value."""
+    if raw is None:
+        return None
+    try:
+        if physical_type in PLAIN_FIXED:
+            fmt, physical_arrow_type = PLAIN_FIXED[physical_type]
+            value = np.frombuffer(raw, dtype=fmt, count=1)[0].item()
+        elif physical_type == 'BOOLEAN':
+            value, physical_arrow_type = bool(raw[0]), pa.bool_()
+        elif physical_type == 'BYTE_ARRAY':
+            value, physical_arrow_type = raw, pa.binary()
+        else:
+            return None
+        return pa.array([value], physical_arrow_type).cast(arrow_type)[0].as_py()
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError, ValueError):
+        return None # e.g. a truncated UTF-8 string -> treat as "no stats"
+
+
+# --- Page Decoding ---
+
+def read_page_header(buf, pos=0):
+    """Decode a PageHeader at buf[pos:]. Returns (header_dict, header_length)."""
+    header, end = read_struct(buf, pos)
+    page = {
+        'type': PAGE_TYPES.get(header.get(1)),
+        'uncompressed_page_size': header.get(2),
+        'compressed_page_size': header.get(3),
+    }
+    if 5 in header: # DataPageHeader
+        h = header[5]
+        page.update({'num_values': h.get(1), 'encoding': ENCODINGS.get(h.get(2)), 'statistics': h.get(5)})
+    elif 7 in header: # DictionaryPageHeader
+        h = header[7]
+        page.update({'num_values': h.get(1), 'encoding': ENCODINGS.get(h.get(2))})
+    elif 8 in header: # DataPageHeaderV2
+        h = header[8]
+        page.update({
+            'num_values': h.get(1), 'num_nulls': h.get(2), 'num_rows': h.get(3),
+            'encoding': ENCODINGS.get(h.get(4)),
+            'definition_levels_byte_length': h.get(5), 'repetition_levels_byte_length': h.get(6),
+            'is_compressed': h.get(7, True), 'statistics': h.get(8),
+        })
+    return page, end - pos
+
+
+def decompress(payload, codec, uncompressed_size):
+    if codec in (None, 'UNCOMPRESSED'):
+        return payload
+    arrow_codec = ARROW_CODECS.get(codec)
+    if arrow_codec is None:
+        raise NotImplementedError(f"Codec {codec} is not supported by this reader.")
+    return pa.decompress(payload, decompressed_size=uncompressed_size, codec=arrow_codec, asbytes=True)
+
+
+def read_uleb128(buf, pos):
+    result = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def decode_rle_bitpacked_hybrid(buf, pos, bit_width, count):
+    """Decode `count` values of the RLE / bit-packing hybrid used for levels and dictionary indices."""
+    out = np.zeros(count, dtype=np.int64)
+    filled = 0
+    byte_width = (bit_width + 7) // 8
+    weights = (1 << np.arange(bit_width, dtype=np.int64)) if bit_width else None
+    while filled < count:
+        header, pos = read_uleb128(buf, pos)
+        if header & 1: # Bit-packed run of groups of 8 values
+            num_values = (header >> 1) * 8
+            num_bytes = (header >> 1) * bit_width
+            take = min(num_values, count - filled)
+            if bit_width:
+                bits = np.unpackbits(np.frombuffer(buf, dtype=np.uint8, count=num_bytes, offset=pos), bitorder='little')
+                out[filled:filled + take] = (bits.reshape(-1, bit_width).astype(np.int64) @ weights)[:take]
+            pos += num_bytes
+        else: # RLE run: one value repeated
+            run_length = header >> 1
+            value = int.from_bytes(buf[pos:pos + byte_width], 'little')
+            pos += byte_width
+            take = min(run_length, count - filled)
+            out[filled:filled + take] = value
+        filled += take
+    return out, pos
+
+
+def decode_plain(buf, pos, physical_type, count):
+    """Decode `count` PLAIN values as a physical-typed pyarrow Array."""
+    if physical_type in PLAIN_FIXED:
+        fmt, arrow_type = PLAIN_FIXED[physical_type]
+        return pa.array(np.frombuffer(buf, dtype=fmt, count=count, offset=pos), arrow_type)
+    if physical_type == 'BOOLEAN':
+        bits = np.unpackbits(np.frombuffer(buf, dtype=np.uint8, count=(count + 7) // 8, offset=pos), bitorder='little')
+        return pa.array(bits[:count].astype(bool))
+    if physical_type == 'BYTE_ARRAY':
+        values = []
+        view = memoryview(buf)
+        for _ in range(count):
+            length = struct.unpack_from('<I', buf, pos)[0]
+            pos += 4
+            values.append(bytes(view[pos:pos + length]))
+            pos += length
+        return pa.array(values, pa.binary())
+    raise NotImplementedError(f"PLAIN decoding of {physical_type} is not supported by this reader.")
+
+
+def decode_dictionary_page(page, payload, physical_type, codec):
+    data = decompress(payload, codec, page['uncompressed_page_size'])
+    return decode_plain(data, 0, physical_type, page['num_values'])
+
+
+def decode_data_page(page, payload, physical_type, codec, max_definition_level, dictionary=None):
+    """
+    Decode one flat (non-repeated) data page, V1 or V2, into a physical-typed pyarrow Array
+    with nulls restored from the definition levels.
+    """
+    num_values = page['num_values']
+    if page['type'] == 'DATA_PAGE_V2':
+        levels_length = page['definition_levels_byte_length'] + page['repetition_levels_byte_length']
+        levels = payload[:levels_length]
+        values_bytes = payload[levels_length:]
+        if page['is_compressed']:
+            values_bytes = decompress(values_bytes, codec, page['uncompressed_page_size'] - levels_length)
+        data = levels + values_bytes
+        pos = page['repetition_levels_byte_length']
+        def_levels_end = levels_length
+    else:
+        data = decompress(payload, codec, page['uncompressed_page_size'])
+        pos = 0
+        def_levels_end = None
+
+    defined = None
+    if max_definition_level > 0:
+        if def_levels_end is None: # V1: levels are prefixed by their 4-byte length
+            levels_length = struct.unpack_from('<I', data, pos)[0]
+            pos += 4
+            def_levels_end = pos + levels_length
+        levels, _ = decode_rle_bitpacked_hybrid(data, pos, max_definition_level.bit_length(), num_values)
+        defined = levels == max_definition_level
+        pos = def_levels_end
+    num_non_null = int(defined.sum()) if defined is not None else num_values
+
+    encoding = page['encoding']
+    if encoding in DICTIONARY_ENCODINGS:
+        if dictionary is None:
+            raise ValueError("Dictionary-encoded page without a dictionary page.")
+        bit_width = data[pos]
+        indices, _ = decode_rle_bitpacked_hybrid(data, pos + 1, bit_width, num_non_null)
+        values = dictionary.take(pa.array(indices))
+    elif encoding == 'PLAIN':
+        values = decode_plain(data, pos, physical_type, num_non_null)
+    else:
+        raise NotImplementedError(f"Encoding {encoding} is not supported by this reader.")
+
+    if defined is None or num_non_null == num_values:
+        return values
+    # Spread the non-null values back out: null slots take a null index
+    positions = np.cumsum(defined) - 1
+    return values.take(pa.array(positions, mask=~defined))
+
+
+# --- Bloom Filters ---
+
+XXH_PRIME64_1 = 11400714785074694791
+XXH_PRIME64_2 = 14029467366897019727
+XXH_PRIME64_3 = 1609587929392839161
+XXH_PRIME64_4 = 9650029242287828579
+XXH_PRIME64_5 = 2870177450012600261
+MASK64 = 0xFFFFFFFFFFFFFFFF
+
+# Salts for the split-block Bloom filter (parquet-format BloomFilter.md)
+BLOOM_SALT = (0x47b6137b, 0x44974d91, 0x8824ad5b, 0xa2b7289d, 0x705495c7, 0x2df1424b, 0x9efc4947, 0x5c6bfb31)
+
+
+def _rotl64(x, r):
+    return ((x << r) | (x >> (64 - r))) & MASK64
+
+
+def _xxh64_round(acc, lane):
+    acc = (acc + lane * XXH_PRIME64_2) & MASK64
+    return (_rotl64(acc, 31) * XXH_PRIME64_1) & MASK64
+
+
+def _xxh64_merge(acc, value):
+    acc ^= _xxh64_round(0, value)
+    return (acc * XXH_PRIME64_1 + XXH_PRIME64_4) & MASK64
+
+
+def xxhash64(data, seed=0):
+    """Pure Python XXH64, the hash Parquet Bloom filters use."""
+    length = len(data)
+    pos = 0
+    if length >= 32:
+        v1 = (seed + XXH_PRIME64_1 + XXH_PRIME64_2) & MASK64
+        v2 = (seed + XXH_PRIME64_2) & MASK64
+        v3 = seed
+        v4 = (seed - XXH_PRIME64_1) & MASK64
+        while pos + 32 <= length:
+            l1, l2, l3, l4 = struct.unpack_from('<4Q', data, pos)
+            v1, v2, v3, v4 = _xxh64_round(v1, l1), _xxh64_round(v2, l2), _xxh64_round(v3, l3), _xxh64_round(v4, l4)
+            pos += 32
+        h = (_rotl64(v1, 1) + _rotl64(v2, 7) + _rotl64(v3, 12) + _rotl64(v4, 18)) & MASK64
+        for v in (v1, v2, v3, v4):
+            h = _xxh64_merge(h, v)
+    else:
+        h = (seed + XXH_PRIME64_5) & MASK64
+    h = (h + length) & MASK64
+
+    while pos + 8 <= length:
+        h ^= _xxh64_round(0, struct.unpack_from('<Q', data, pos)[0])
+        h = (_rotl64(h, 27) * XXH_PRIME64_1 + XXH_PRIME64_4) & MASK64
+        pos += 8
+    if pos + 4 <= length:
+        h ^= (struct.unpack_from('<I', data, pos)[0] * XXH_PRIME64_1) & MASK64
+        h = (_rotl64(h, 23) * XXH_PRIME64_2 + XXH_PRIME64_3) & MASK64
+        pos += 4
+    while pos < length:
+        h ^= (data[pos] * XXH_PRIME64_5) & MASK64
+        h = (_rotl64(h, 11) * XXH_PRIME64_1) & MASK64
+        pos += 1
+
+    h ^= h >> 33
+    h = (h * XXH_PRIME64_2) & MASK64
+    h ^= h >> 29
+    h = (h * XXH_PRIME64_3) & MASK64
+    h ^= h >> 32
+    return h
+
+
+def read_bloom_filter(f, chunk):
+    """Returns the Bloom filter bitset bytes for a column chunk, or None if it has none."""
+    if chunk['bloom_filter_offset'] is None:
+        return None
+    f.seek(chunk['bloom_filter_offset'])
+    # Older writers omit bloom_filter_length; the header is small, so over-read and then trim
+    raw = f.read(chunk['bloom_filter_length'] or 256)
+    header, header_length = read_struct(raw)
+    num_bytes = header[1]
+    bitset = raw[header_length:header_length + num_bytes]
+    if len(bitset) < num_bytes:
+        bitset += f.read(num_bytes - len(bitset))
+    return bitset
+
+
+def plain_value_bytes(value, physical_type, arrow_type):
+    """PLAIN-encode one logical value the way the writer hashed it into the Bloom filter."""
+    if physical_type in PLAIN_FIXED:
+        fmt, physical_arrow_type = PLAIN_FIXED[physical_type]
+        physical_value = pa.scalar(value, arrow_type).cast(physical_arrow_type).as_py()
+        return np.array([physical_value], dtype=fmt).tobytes()
+    if physical_type == 'BYTE_ARRAY':
+        return pa.scalar(value, arrow_type).cast(pa.binary()).as_py()
+    raise NotImplementedError(f"Bloom filter probing of {physical_type} is not supported.")
+
+
+def bloom_filter_might_contain(bitset, value_bytes):
+    """Split-block Bloom filter probe. False means the value is definitely absent."""
+    h = xxhash64(value_bytes)
+    num_blocks = len(bitset) // 32
+    block_index = ((h >> 32) * num_blocks) >> 32
+    key = h & 0xFFFFFFFF
+    words = struct.unpack_from('<8I', bitset, block_index * 32)
+    for word, salt in zip(words, BLOOM_SALT):
+        bit = ((key * salt) & 0xFFFFFFFF) >> 27
+        if not (word >> bit) & 1:
+            return False
+    return True
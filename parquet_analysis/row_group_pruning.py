@@ -0,0 +1,219 @@
+import argparse
+import os
+import re
+import time
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# --- Configuration ---
+parquet_file = "my_concept_demo.parquet" # Written by complete_parquet.py
+default_predicates = ["id>=120000", "status=FAILED"] # Sorted 'id' prunes, random 'status' does not
+default_columns = ["amount"]
+
+# Supported comparison operators. 'in' takes a comma separated list of values.
+PREDICATE_PATTERN = re.compile(r"^\s*(\w+)\s*(<=|>=|!=|==|=|<|>|\s+in\s+)\s*(.+?)\s*$")
+
+
+# --- Predicates ---
+
+def parse_predicate(text, arrow_schema):
+    """Turn 'amount>500' into ('amount', '>', 500.0), typed like the column."""
+    match = PREDICATE_PATTERN.match(text)
+    if not match:
+        raise ValueError(f"Cannot parse predicate '{text}'. Expected e.g. 'status=FAILED' or 'category in CAT_1,CAT_2'.")
+    column, op, raw_value = match.group(1), match.group(2).strip(), match.group(3)
+    if op == '==':
+        op = '='
+    if arrow_schema.get_field_index(column) == -1:
+        raise ValueError(f"Column '{column}' not found in file schema.")
+    column_type = arrow_schema.field(column).type
+
+    def convert(value_str):
+        # Let Arrow do the string -> column type conversion so timestamps, ints etc. compare like the stats do
+        return pa.scalar(value_str.strip()).cast(column_type).as_py()
+
+    if op == 'in':
+        return (column, op, [convert(v) for v in raw_value.split(',')])
+    return (column, op, convert(raw_value))
+
+
+def column_stats_for_row_group(rg_metadata, schema):
+    """Collect {column: {'min','max','null_count','num_values'}} from one row group's footer entry."""
+    column_stats = {}
+    for j in range(rg_metadata.num_columns):
+        col_metadata = rg_metadata.column(j)
+        stats = col_metadata.statistics
+        entry = {'min': None, 'max': None, 'null_count': None, 'num_values': col_metadata.num_values}
+        if stats is not None:
+            if stats.has_min_max:
+                entry['min'] = stats.min
+                entry['max'] = stats.max
+            if stats.has_null_count:
+                entry['null_count'] = stats.null_count
+        column_stats[schema[j].name] = entry
+    return column_stats
+
+
+def stats_may_match(entry, predicate):
+    """Zone-map check for one predicate. Returns False only if NO row can match."""
+    _, op, value = predicate
+    if entry is None:
+        return True # No statistics -> cannot prune
+    if entry['null_count'] is not None and entry['null_count'] == entry['num_values']:
+        return False # All nulls never satisfy a comparison
+    col_min, col_max = entry['min'], entry['max']
+    if col_min is None or col_max is None:
+        return True
+
+    try:
+        if op == '=':
+            return col_min <= value <= col_max
+        if op == '!=':
+            return not (col_min == col_max == value)
+        if op == '<':
+            return col_min < value
+        if op == '<=':
+            return col_min <= value
+        if op == '>':
+            return col_max > value
+        if op == '>=':
+            return col_max >= value
+        if op == 'in':
+            return any(col_min <= v <= col_max for v in value)
+    except TypeError:
+        return True # Incomparable stats (e.g. mixed types) -> be safe and read
+    raise ValueError(f"Unsupported operator '{op}'.")
+
+
+def row_group_may_match(column_stats, predicates):
+    """All predicates are ANDed together, so any one that excludes the group prunes it."""
+    return all(stats_may_match(column_stats.get(predicate[0]), predicate) for predicate in predicates)
+
+
+def predicates_to_expression(predicates):
+    """Build the exact row-level filter applied after the surviving row groups are read."""
+    expression = None
+    for column, op, value in predicates:
+        field = pc.field(column)
+        if op == '=':
+            term = field == value
+        elif op == '!=':
+            term = field != value
+        elif op == '<':
+            term = field < value
+        elif op == '<=':
+            term = field <= value
+        elif op == '>':
+            term = field > value
+        elif op == '>=':
+            term = field >= value
+        else:
+            term = field.isin(value)
+        expression = term if expression is None else expression & term
+    return expression
+
+
+# --- Query ---
+
+def query_with_pruning(filename, predicates, columns):
+    """
+    Evaluate predicates against each row group's footer statistics and read only the
+    row groups that may match, projecting the requested + predicate columns.
+    Returns (filtered_table, report_dict).
+    """
+    parquet_file_handle = pq.ParquetFile(filename)
+    parquet_metadata = parquet_file_handle.metadata
+    schema = parquet_metadata.schema
+
+    predicate_columns = [p[0] for p in predicates]
+    projection = list(dict.fromkeys(list(columns) + predicate_columns)) # Keep order, drop duplicates
+
+    report = {
+        'row_groups_total': parquet_metadata.num_row_groups,
+        'row_groups_read': 0,
+        'row_groups_skipped': 0,
+        'bytes_read': 0,           # Compressed bytes of projected chunks in matching row groups
+        'bytes_skipped_pruning': 0,   # Compressed bytes of projected chunks in pruned row groups
+        'bytes_skipped_projection': 0, # Compressed bytes of columns outside the projection
+        'rows_scanned': 0,
+        'rows_matched': 0,
+    }
+
+    matching_row_groups = []
+    for i in range(parquet_metadata.num_row_groups):
+        rg_metadata = parquet_metadata.row_group(i)
+        column_stats = column_stats_for_row_group(rg_metadata, schema)
+        may_match = row_group_may_match(column_stats, predicates)
+
+        projected_bytes = 0
+        for j in range(rg_metadata.num_columns):
+            chunk_size = rg_metadata.column(j).total_compressed_size
+            if schema[j].name in projection:
+                projected_bytes += chunk_size
+            else:
+                report['bytes_skipped_projection'] += chunk_size
+
+        if may_match:
+            matching_row_groups.append(i)
+            report['row_groups_read'] += 1
+            report['bytes_read'] += projected_bytes
+            report['rows_scanned'] += rg_metadata.num_rows
+        else:
+            report['row_groups_skipped'] += 1
+            report['bytes_skipped_pruning'] += projected_bytes
+
+    if matching_row_groups:
+        table = parquet_file_handle.read_row_groups(matching_row_groups, columns=projection)
+        if predicates:
+            table = table.filter(predicates_to_expression(predicates))
+    else:
+        table = parquet_file_handle.schema_arrow.empty_table().select(projection)
+
+    report['rows_matched'] = table.num_rows
+    report['matching_row_groups'] = matching_row_groups
+    return table, report
+
+
+def print_report(report, duration):
+    total_bytes = report['bytes_read'] + report['bytes_skipped_pruning'] + report['bytes_skipped_projection']
+    print(f"   Row Groups: {report['row_groups_total']} total, {report['row_groups_read']} read, {report['row_groups_skipped']} skipped by statistics")
+    print(f"   Row Groups read: {report['matching_row_groups']}")
+    print(f"   Bytes read (compressed, projected chunks): {report['bytes_read'] / 1024:.2f} KB")
+    print(f"   Bytes skipped by row-group pruning:       {report['bytes_skipped_pruning'] / 1024:.2f} KB")
+    print(f"   Bytes skipped by column projection:       {report['bytes_skipped_projection'] / 1024:.2f} KB")
+    if total_bytes:
+        print(f"   Fraction of column data read: {report['bytes_read'] / total_bytes * 100:.1f}%")
+    print(f"   Rows scanned: {report['rows_scanned']}, rows matched: {report['rows_matched']}")
+    print(f"   Time taken: {duration:.4f} seconds")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Query a Parquet file, pruning row groups with footer statistics.")
+    parser.add_argument('file', nargs='?', default=parquet_file)
+    parser.add_argument('--where', action='append', default=None,
+                        help="Predicate such as 'status=FAILED', 'amount>500' or 'category in CAT_1,CAT_2'. Repeat to AND.")
+    parser.add_argument('--columns', default=','.join(default_columns), help="Comma separated projection.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        print(f"Error: {args.file} not found. Please run the generation script first.")
+        raise SystemExit(1)
+
+    arrow_schema = pq.read_schema(args.file)
+    predicate_texts = args.where if args.where is not None else default_predicates
+    predicates = [parse_predicate(text, arrow_schema) for text in predicate_texts]
+    columns = [c for c in args.columns.split(',') if c]
+
+    print(f"\n--- Row Group Pruning Query on '{args.file}' ---")
+    print(f"   Predicates: {' AND '.join(predicate_texts) or '(none)'}")
+    print(f"   Projection: {columns}")
+
+    start_time = time.time()
+    result_table, report = query_with_pruning(args.file, predicates, columns)
+    duration = time.time() - start_time
+
+    print_report(report, duration)
+    print("\n   First matching rows:")
+    print(result_table.slice(0, 5).to_pandas())
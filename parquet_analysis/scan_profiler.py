@@ -0,0 +1,336 @@
+import argparse
+import collections
+import os
+import struct
+import time
+
+import numpy as np
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from page_index_reader import page_mask_for_predicate, query_with_page_index, selected_page_ranges
+from parquet_pages import (
+    DICTIONARY_ENCODINGS, chunk_start_offset, column_chunk_locations, read_column_index, read_offset_index,
+    read_page_header, read_raw_footer,
+)
+from row_group_pruning import column_stats_for_row_group, parse_predicate, query_with_pruning, row_group_may_match
+
+# --- Configuration ---
+parquet_file = "my_concept_demo.parquet" # Written by complete_parquet.py
+default_predicates = ["status=FAILED"]
+default_columns = ["amount"]
+header_window = 1024            # First guess at a page header's size; grown when a header does not fit
+max_row_group_mb = 512          # Compressed row groups above this are flagged (memory, parallelism)
+min_row_group_mb = 1            # ...and below this, when a file has several (per-row-group overhead)
+low_cardinality_ratio = 0.1     # distinct / rows below this: a dictionary fallback was a size limit, not uniqueness
+
+
+# --- Pages ---
+
+def read_page_headers(f, chunk):
+    """
+    Walk a column chunk's pages by their headers only (payloads are skipped).
+    Returns [{'offset', 'header_size', 'type', 'encoding', 'compressed_page_size', ...}].
+    """
+    pages = []
+    pos = chunk_start_offset(chunk)
+    end = pos + chunk['total_compressed_size']
+    while pos < end:
+        window = header_window
+        while True:
+            f.seek(pos)
+            buf = f.read(min(window, end - pos))
+            try:
+                page, header_size = read_page_header(buf)
+                if header_size <= len(buf):
+                    break
+            except (IndexError, struct.error):
+                pass
+            if window >= end - pos:
+                raise ValueError(f"Truncated page header at offset {pos}.")
+            window *= 4 # Large min/max statistics in the header
+        page.update({'offset': pos, 'header_size': header_size, 'has_statistics': bool(page.get('statistics'))})
+        pages.append(page)
+        pos += header_size + page['compressed_page_size']
+    return pages
+
+
+def profile_chunk(pages):
+    """Page counts, sizes and encodings of one chunk, and whether dictionary encoding fell back."""
+    profile = {
+        'data_pages': 0,
+        'dictionary_pages': 0,
+        'dictionary_bytes': 0,      # Compressed, header included
+        'dictionary_entries': 0,
+        'dictionary_values': 0,     # Values stored as dictionary indices
+        'encodings': collections.Counter(), # Data page encoding -> page count
+        'page_bytes': [],           # Compressed size (header included) of each data page
+        'pages_with_statistics': 0,
+        'header_bytes': 0,
+    }
+    for page in pages:
+        profile['header_bytes'] += page['header_size']
+        if page['type'] == 'DICTIONARY_PAGE':
+            profile['dictionary_pages'] += 1
+            profile['dictionary_bytes'] += page['header_size'] + page['compressed_page_size']
+            profile['dictionary_entries'] += page['num_values']
+            continue
+        profile['data_pages'] += 1
+        profile['encodings'][page['encoding']] += 1
+        profile['page_bytes'].append(page['header_size'] + page['compressed_page_size'])
+        profile['pages_with_statistics'] += page['has_statistics']
+        if page['encoding'] in DICTIONARY_ENCODINGS:
+            profile['dictionary_values'] += page['num_values']
+    # Writers switch to a non-dictionary encoding once the dictionary outgrows its page limit
+    profile['fallback'] = bool(profile['dictionary_pages']) and any(
+        encoding not in DICTIONARY_ENCODINGS for encoding in profile['encodings'])
+    return profile
+
+
+def profile_file(filename):
+    """
+    Page-level profile of every column chunk: {'num_rows', 'file_bytes', 'footer_bytes', 'row_groups':
+    [{'num_rows', 'compressed', 'uncompressed', 'columns': {name: chunk location + page profile}}]}.
+    """
+    metadata = pq.read_metadata(filename)
+    chunk_locations = column_chunk_locations(read_raw_footer(filename))
+    with open(filename, 'rb') as f:
+        f.seek(-8, os.SEEK_END)
+        footer_bytes = struct.unpack('<I', f.read(4))[0] + 8
+        row_groups = []
+        for i, location in enumerate(chunk_locations):
+            rg_metadata = metadata.row_group(i)
+            columns = {}
+            for j in range(rg_metadata.num_columns):
+                chunk = location['columns'][rg_metadata.column(j).path_in_schema]
+                statistics = rg_metadata.column(j).statistics
+                columns[rg_metadata.column(j).path_in_schema] = {
+                    **chunk,
+                    **profile_chunk(read_page_headers(f, chunk)),
+                    'has_statistics': statistics is not None and statistics.has_min_max,
+                    'has_page_index': chunk['column_index_offset'] is not None and chunk['offset_index_offset'] is not None,
+                }
+            row_groups.append({
+                'num_rows': location['num_rows'],
+                'compressed': sum(c['total_compressed_size'] for c in columns.values()),
+                'uncompressed': sum(c['total_uncompressed_size'] for c in columns.values()),
+                'columns': columns,
+            })
+    return {'num_rows': metadata.num_rows, 'file_bytes': os.path.getsize(filename), 'footer_bytes': footer_bytes,
+            'row_groups': row_groups}
+
+
+# --- Scan Cost ---
+
+def estimate_scan(filename, profile, predicates, columns):
+    """
+    Bytes a query would read (compressed) and decode (uncompressed) without running it:
+    at chunk granularity after row group pruning by footer statistics (what pq.ParquetFile
+    reads), and at page granularity where predicate columns carry a page index
+    (what page_index_reader.py reads).
+    """
+    parquet_file_handle = pq.ParquetFile(filename)
+    metadata = parquet_file_handle.metadata
+    arrow_schema = parquet_file_handle.schema_arrow
+    projection = list(dict.fromkeys(list(columns) + [p[0] for p in predicates]))
+    estimate = {
+        'row_groups_total': len(profile['row_groups']),
+        'row_groups_read': 0,
+        'rows_scanned': 0,
+        'bytes_read': 0,           # Chunk granularity
+        'bytes_decoded': 0,
+        'pages_read': 0,
+        'pages_total': 0,
+        'page_bytes_read': 0,      # Page granularity (dictionary pages always count)
+        'page_bytes_decoded': 0,
+        'footer_bytes': profile['footer_bytes'],
+    }
+    with open(filename, 'rb') as f:
+        for i, rg in enumerate(profile['row_groups']):
+            chunks = rg['columns']
+            estimate['pages_total'] += sum(chunks[name]['data_pages'] for name in projection)
+            if not row_group_may_match(column_stats_for_row_group(metadata.row_group(i), metadata.schema), predicates):
+                continue
+            estimate['row_groups_read'] += 1
+            estimate['rows_scanned'] += rg['num_rows']
+            estimate['bytes_read'] += sum(chunks[name]['total_compressed_size'] for name in projection)
+            estimate['bytes_decoded'] += sum(chunks[name]['total_uncompressed_size'] for name in projection)
+
+            row_mask = np.ones(rg['num_rows'], dtype=bool)
+            offset_indexes = {name: read_offset_index(f, chunks[name]) for name in projection}
+            for predicate in predicates:
+                chunk = chunks[predicate[0]]
+                column_index = read_column_index(f, chunk)
+                if column_index is not None and offset_indexes[predicate[0]] is not None:
+                    row_mask &= page_mask_for_predicate(column_index, offset_indexes[predicate[0]], rg['num_rows'],
+                                                        predicate, chunk['physical_type'], arrow_schema.field(predicate[0]).type)
+            if not row_mask.any():
+                continue
+            for name in projection:
+                chunk = chunks[name]
+                if offset_indexes[name] is None: # No page locations: the whole chunk is read
+                    estimate['pages_read'] += chunk['data_pages']
+                    estimate['page_bytes_read'] += chunk['total_compressed_size']
+                    estimate['page_bytes_decoded'] += chunk['total_uncompressed_size']
+                    continue
+                uncompressed = {page['offset']: page['header_size'] + page['uncompressed_page_size']
+                                for page in read_page_headers(f, chunk)}
+                for key, (offset, size) in selected_page_ranges(chunk, offset_indexes[name], row_mask):
+                    estimate['pages_read'] += key != 'dictionary'
+                    estimate['page_bytes_read'] += size
+                    estimate['page_bytes_decoded'] += uncompressed.get(offset, size)
+    return estimate
+
+
+def distinct_ratio(filename, row_group, column):
+    """Distinct values / rows of one column chunk (reads and decodes the chunk)."""
+    values = pq.ParquetFile(filename).read_row_group(row_group, columns=[column]).column(0)
+    return pc.count_distinct(values).as_py() / max(len(values), 1)
+
+
+def layout_problems(filename, profile, predicates=()):
+    """[(severity, message)] for layouts that make scans slow or pruning impossible."""
+    problems = []
+    sizes = [rg['compressed'] for rg in profile['row_groups']]
+    oversized = [i for i, size in enumerate(sizes) if size > max_row_group_mb * 1024 * 1024]
+    if oversized:
+        problems.append(('warning', f"{len(oversized)} row groups above {max_row_group_mb} MB compressed (e.g. #{oversized[0]}, "
+                                    f"{sizes[oversized[0]] / (1024 * 1024):.0f} MB): little parallelism and large read buffers"))
+    undersized = [i for i, size in enumerate(sizes) if size < min_row_group_mb * 1024 * 1024]
+    if len(sizes) > 1 and len(undersized) > 1:
+        problems.append(('info', f"{len(undersized)} of {len(sizes)} row groups below {min_row_group_mb} MB compressed: "
+                                 f"footer and per-chunk seek overhead dominate; compact them"))
+
+    predicate_columns = {p[0] for p in predicates}
+    for name in profile['row_groups'][0]['columns'] if profile['row_groups'] else []:
+        chunks = [rg['columns'][name] for rg in profile['row_groups']]
+        fallbacks = [i for i, chunk in enumerate(chunks) if chunk['fallback']]
+        if fallbacks:
+            ratio = distinct_ratio(filename, fallbacks[0], name)
+            if ratio < low_cardinality_ratio:
+                problems.append(('warning', f"'{name}': dictionary encoding fell back to plain in {len(fallbacks)} chunks although "
+                                            f"only {ratio:.1%} of values are distinct: raise dictionary_pagesize_limit"))
+            else:
+                problems.append(('info', f"'{name}': dictionary encoding fell back in {len(fallbacks)} chunks ({ratio:.0%} distinct): "
+                                         f"write it without a dictionary to skip the wasted dictionary page"))
+        missing = sum(not chunk['has_statistics'] for chunk in chunks)
+        if missing:
+            problems.append(('warning' if name in predicate_columns else 'info',
+                             f"'{name}': {missing} of {len(chunks)} chunks have no min/max statistics: row groups cannot be pruned on it"))
+        if name in predicate_columns and not all(chunk['has_page_index'] for chunk in chunks):
+            problems.append(('info', f"'{name}': no page index on every chunk: filters on it cannot skip pages"))
+    return problems
+
+
+class CountingFile:
+    """Read-only file wrapper that counts the bytes PyArrow actually reads through it."""
+
+    def __init__(self, path):
+        self.f = open(path, 'rb')
+        self.bytes_read = 0
+        self.reads = 0
+
+    def read(self, size=-1):
+        data = self.f.read(size)
+        self.bytes_read += len(data)
+        self.reads += 1
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self.f, name) # seek / tell / close / seekable ...
+
+
+def measure_scan(filename, predicates, columns, use_page_index=False):
+    """Run the query for real: (seconds, bytes read from the file, rows matched)."""
+    start_time = time.perf_counter()
+    if use_page_index:
+        table, report = query_with_page_index(filename, predicates, columns)
+        bytes_read = report['io'].get('bytes_read', 0) + report['index_bytes_read']
+    else:
+        counting = CountingFile(filename)
+        try:
+            table, report = query_with_pruning(counting, predicates, columns)
+        finally:
+            counting.close()
+        bytes_read = counting.bytes_read
+    return time.perf_counter() - start_time, bytes_read, table.num_rows
+
+
+# --- Report ---
+
+def print_profile(profile):
+    mb = 1024 * 1024
+    print(f"   File: {profile['file_bytes'] / mb:.2f} MB, {profile['num_rows']} rows, {len(profile['row_groups'])} row groups, "
+          f"footer {profile['footer_bytes'] / 1024:.1f} KB")
+    sizes = [rg['compressed'] for rg in profile['row_groups']]
+    if sizes:
+        print(f"   Row group size (compressed): min {min(sizes) / mb:.2f} MB, max {max(sizes) / mb:.2f} MB")
+    print(f"\n   {'column':<14}{'pages':>7}{'avg KB':>9}{'dict KB':>9}{'fallback':>10}{'stats':>7}{'comp MB':>9}{'raw MB':>9}  encodings / codec")
+    for name in profile['row_groups'][0]['columns'] if profile['row_groups'] else []:
+        chunks = [rg['columns'][name] for rg in profile['row_groups']]
+        page_bytes = [size for chunk in chunks for size in chunk['page_bytes']]
+        encodings = collections.Counter()
+        for chunk in chunks:
+            encodings.update(chunk['encodings'])
+        encoding_text = ', '.join(f"{encoding} x{count}" for encoding, count in encodings.most_common())
+        print(f"   {name:<14}{len(page_bytes):>7}{np.mean(page_bytes) / 1024 if page_bytes else 0:>9.1f}"
+              f"{sum(c['dictionary_bytes'] for c in chunks) / 1024:>9.1f}"
+              f"{sum(c['fallback'] for c in chunks):>6}/{len(chunks):<3}"
+              f"{sum(c['has_statistics'] for c in chunks) * 100 // max(len(chunks), 1):>6}%"
+              f"{sum(c['total_compressed_size'] for c in chunks) / mb:>9.2f}{sum(c['total_uncompressed_size'] for c in chunks) / mb:>9.2f}"
+              f"  {encoding_text} / {chunks[0]['codec']}")
+
+
+def print_estimate(estimate):
+    kb = 1024
+    print(f"   Row groups read: {estimate['row_groups_read']} of {estimate['row_groups_total']} ({estimate['rows_scanned']} rows)")
+    print(f"   Chunk-level read:  {estimate['bytes_read'] / kb:.1f} KB read, {estimate['bytes_decoded'] / kb:.1f} KB decoded")
+    print(f"   Page-level read:   {estimate['page_bytes_read'] / kb:.1f} KB read, {estimate['page_bytes_decoded'] / kb:.1f} KB decoded "
+          f"({estimate['pages_read']} of {estimate['pages_total']} data pages)")
+    print(f"   Plus the footer:   {estimate['footer_bytes'] / kb:.1f} KB")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Profile a Parquet file's pages and encodings and estimate what a query reads.")
+    parser.add_argument('file', nargs='?', default=parquet_file)
+    parser.add_argument('--where', action='append', default=None,
+                        help="Predicate such as 'status=FAILED' or 'amount>500'. Repeat to AND.")
+    parser.add_argument('--columns', default=','.join(default_columns), help="Comma separated projection.")
+    parser.add_argument('--no-run', action='store_true', help="Only estimate; do not time the query.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        print(f"Error: {args.file} not found. Please run the generation script first.")
+        raise SystemExit(1)
+
+    arrow_schema = pq.read_schema(args.file)
+    predicate_texts = args.where if args.where is not None else default_predicates
+    predicates = [parse_predicate(text, arrow_schema) for text in predicate_texts]
+    columns = [c for c in args.columns.split(',') if c]
+
+    print(f"\n--- Scan Cost Profile of '{args.file}' ---")
+    start_time = time.time()
+    profile = profile_file(args.file)
+    print_profile(profile)
+    print(f"   Profile time: {time.time() - start_time:.2f} seconds")
+
+    print(f"\n--- Estimated Cost: {' AND '.join(predicate_texts) or '(no predicates)'}, projection {columns} ---")
+    estimate = estimate_scan(args.file, profile, predicates, columns)
+    print_estimate(estimate)
+
+    print("\n--- Layout Problems ---")
+    problems = layout_problems(args.file, profile, predicates)
+    for severity, message in problems:
+        print(f"   [{severity}] {message}")
+    if not problems:
+        print("   None found.")
+
+    if not args.no_run:
+        print("\n--- Measured ---")
+        seconds, bytes_read, rows = measure_scan(args.file, predicates, columns)
+        print(f"   PyArrow row group reader: {seconds * 1000:.1f} ms, {bytes_read / 1024:.1f} KB read "
+              f"(estimate {(estimate['bytes_read'] + estimate['footer_bytes']) / 1024:.1f} KB with footer), {rows} rows")
+        if any(chunk['has_page_index'] for rg in profile['row_groups'] for chunk in rg['columns'].values()):
+            seconds, bytes_read, rows = measure_scan(args.file, predicates, columns, use_page_index=True)
+            print(f"   Page index reader:        {seconds * 1000:.1f} ms, {bytes_read / 1024:.1f} KB read incl. indexes "
+                  f"(estimate {estimate['page_bytes_read'] / 1024:.1f} KB of pages), {rows} rows")
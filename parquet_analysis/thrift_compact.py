@@ -0,0 +1,121 @@
+import struct
+
+# Minimal decoder for the Thrift Compact Protocol, which is how Parquet serializes its
+# footer (FileMetaData), page headers, page indexes and Bloom filter headers.
+# PyArrow exposes most of the footer, but not the page index / Bloom filter locations
+# or the page headers, so we decode those structures ourselves.
+#
+# Structs are returned as plain dicts keyed by Thrift field id, e.g. {1: 3, 2: [...]}.
+# Callers pick the field ids they need from the Parquet thrift definition.
+
+# Compact protocol type ids
+CT_STOP = 0
+CT_BOOLEAN_TRUE = 1
+CT_BOOLEAN_FALSE = 2
+CT_BYTE = 3
+CT_I16 = 4
+CT_I32 = 5
+CT_I64 = 6
+CT_DOUBLE = 7
+CT_BINARY = 8
+CT_LIST = 9
+CT_SET = 10
+CT_MAP = 11
+CT_STRUCT = 12
+
+
+class CompactProtocolReader:
+    def __init__(self, buf, pos=0):
+        self.buf = memoryview(buf)
+        self.pos = pos
+
+    def read_byte(self):
+        value = self.buf[self.pos]
+        self.pos += 1
+        return value
+
+    def read_varint(self):
+        result = 0
+        shift = 0
+        while True:
+            byte = self.read_byte()
+            result |= (byte & 0x7F) << shift
+            if not byte & 0x80:
+                return result
+            shift += 7
+
+    def read_zigzag(self):
+        n = self.read_varint()
+        return (n >> 1) ^ -(n & 1)
+
+    def read_binary(self):
+        length = self.read_varint()
+        value = bytes(self.buf[self.pos:self.pos + length])
+        self.pos += length
+        return value
+
+    def read_double(self):
+        value = struct.unpack_from('<d', self.buf, self.pos)[0]
+        self.pos += 8
+        return value
+
+    def read_value(self, type_id):
+        if type_id == CT_BOOLEAN_TRUE:
+            return True
+        if type_id == CT_BOOLEAN_FALSE:
+            return False
+        if type_id == CT_BYTE:
+            value = self.read_byte()
+            return value - 256 if value > 127 else value
+        if type_id in (CT_I16, CT_I32, CT_I64):
+            return self.read_zigzag()
+        if type_id == CT_DOUBLE:
+            return self.read_double()
+        if type_id == CT_BINARY:
+            return self.read_binary()
+        if type_id in (CT_LIST, CT_SET):
+            return self.read_list()
+        if type_id == CT_MAP:
+            return self.read_map()
+        if type_id == CT_STRUCT:
+            return self.read_struct()
+        raise ValueError(f"Unknown thrift compact type id {type_id} at offset {self.pos}.")
+
+    def read_list(self):
+        header = self.read_byte()
+        size = header >> 4
+        element_type = header & 0x0F
+        if size == 15:
+            size = self.read_varint()
+        if element_type in (CT_BOOLEAN_TRUE, CT_BOOLEAN_FALSE):
+            # Inside collections booleans are written as one byte each
+            return [self.read_byte() == CT_BOOLEAN_TRUE for _ in range(size)]
+        return [self.read_value(element_type) for _ in range(size)]
+
+    def read_map(self):
+        size = self.read_varint()
+        if size == 0:
+            return {}
+        types = self.read_byte()
+        key_type, value_type = types >> 4, types & 0x0F
+        return {self.read_value(key_type): self.read_value(value_type) for _ in range(size)}
+
+    def read_struct(self):
+        fields = {}
+        last_field_id = 0
+        while True:
+            header = self.read_byte()
+            type_id = header & 0x0F
+            if type_id == CT_STOP:
+                return fields
+            delta = header >> 4
+            field_id = last_field_id + delta if delta else self.read_zigzag()
+            fields[field_id] = self.read_value(type_id)
+            last_field_id = field_id
+
+
+def read_struct(buf, pos=0):
+    """Decode one struct from buf starting at pos. Returns (struct_dict, end_pos)."""
+    reader = CompactProtocolReader(buf, pos)
+    value = reader.read_struct()
+    return value, reader.pos
@@ -1,46 +1,46 @@
-import csv
 import os
+import sys
+
+# The shared vectorized generator lives with the binary format code
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'toy_parquet_format'))
+from datagen import Column, DatasetSpec, Cycle, FixedDecimal, FloorDiv, Modular, Override, Sequence, Template, ZeroPad, generate
 
 # --- Configuration ---
 base_filename = 'daily_transactions'
 num_rows_per_day = 500 # Small number for quick file creation
+random_seed = 42
+
+def txn_id(day):
+    return Template('txn_', Sequence(), f'_{day}')
+
+def product(modulus):
+    return Template('product_', Modular(modulus))
+
+def clock(date_hour, rows_per_minute):
+    # e.g. '2023-01-01 08:MM:SS' with minutes = i // n, seconds = i % n
+    return Template(date_hour, ZeroPad(FloorDiv(rows_per_minute), 2), ':', ZeroPad(Modular(rows_per_minute), 2))
 
 # --- Create Day 1 File (Base Schema V1) ---
 filename_day1 = f'{base_filename}_2023_01_01.csv'
 headers_v1 = ['transaction_id', 'product_name', 'amount', 'currency', 'timestamp']
-
-print(f"Creating '{filename_day1}' (Schema V1)...")
-with open(filename_day1, 'w', newline='') as csvfile:
-    writer = csv.writer(csvfile)
-    writer.writerow(headers_v1)
-    for i in range(num_rows_per_day):
-        writer.writerow([
-            f'txn_{i}_day1',
-            f'product_{(i % 20)}',
-            f'{10 + (i % 100) * 0.75:.2f}', # Amount (should be float)
-            'USD',
-            f'2023-01-01 08:{i // 60:02d}:{i % 60:02d}'
-        ])
-print(f"'{filename_day1}' created.")
+day1 = DatasetSpec([
+    Column('transaction_id', 'string', txn_id('day1')),
+    Column('product_name', 'string', product(20)),
+    Column('amount', 'float', Modular(100, offset=10, scale=0.75), decimals=2), # Amount (should be float)
+    Column('currency', 'string', Template('USD')),
+    Column('timestamp', 'string', clock('2023-01-01 08:', 60)),
+], num_rows_per_day, seed=random_seed)
 
 # --- Create Day 2 File (Same Schema V1 - should work fine) ---
 filename_day2 = f'{base_filename}_2023_01_02.csv'
 # headers_v1 are the same
-
-print(f"Creating '{filename_day2}' (Schema V1 again)...")
-with open(filename_day2, 'w', newline='') as csvfile:
-    writer = csv.writer(csvfile)
-    writer.writerow(headers_v1)
-    for i in range(num_rows_per_day):
-         writer.writerow([
-            f'txn_{i}_day2',
-            f'product_{(i % 25)}',
-            f'{15 + (i % 80) * 1.1:.2f}', # Amount (should be float)
-            'USD',
-            f'2023-01-02 09:{i // 50:02d}:{i % 50:02d}'
-        ])
-print(f"'{filename_day2}' created.")
-
+day2 = DatasetSpec([
+    Column('transaction_id', 'string', txn_id('day2')),
+    Column('product_name', 'string', product(25)),
+    Column('amount', 'float', Modular(80, offset=15, scale=1.1), decimals=2), # Amount (should be float)
+    Column('currency', 'string', Template('USD')),
+    Column('timestamp', 'string', clock('2023-01-02 09:', 50)),
+], num_rows_per_day, seed=random_seed)
 
 # --- Create Day 3 File (Schema V2 - introduce inconsistencies) ---
 filename_day3 = f'{base_filename}_2023_01_03.csv'
@@ -49,23 +49,28 @@ filename_day3 = f'{base_filename}_2023_01_03.csv'
 # 2. A new column 'payment_method' added
 # 3. Some rows have invalid data in the 'amount' column
 headers_v2 = ['transaction_id', 'product_name', 'amount', 'timestamp', 'currency', 'payment_method'] # Swapped timestamp/currency, added payment_method
-
-print(f"Creating '{filename_day3}' (Schema V2 - with inconsistencies)...")
 payment_methods = ['Credit Card', 'Debit Card', 'PayPal']
-with open(filename_day3, 'w', newline='') as csvfile:
-    writer = csv.writer(csvfile)
-    writer.writerow(headers_v2)
-    for i in range(num_rows_per_day):
-        row = [
-            f'txn_{i}_day3',
-            f'product_{(i % 30)}',
-            # Amount - introduce invalid data
-            'SEE_NOTES' if i % 50 == 0 else ('' if i % 30 == 5 else f'{20 + (i % 60) * 0.9:.2f}'),
-            f'2023-01-03 10:{i // 40:02d}:{i % 40:02d}', # Timestamp (now in the wrong column relative to V1!)
-            'EUR' if i % 10 == 0 else 'USD',          # Currency (now in the wrong column relative to V1!)
-            payment_methods[i % len(payment_methods)] # New column
-        ]
-        writer.writerow(row)
-print(f"'{filename_day3}' created.")
+day3 = DatasetSpec([
+    Column('transaction_id', 'string', txn_id('day3')),
+    Column('product_name', 'string', product(30)),
+    # Amount - introduce invalid data
+    Column('amount', 'string', Override(FixedDecimal(Modular(60, offset=20, scale=0.9), 2), [(50, 0, 'SEE_NOTES'), (30, 5, '')])),
+    Column('timestamp', 'string', clock('2023-01-03 10:', 40)), # Timestamp (now in the wrong column relative to V1!)
+    Column('currency', 'string', Override(Template('USD'), [(10, 0, 'EUR')])), # Currency (now in the wrong column relative to V1!)
+    Column('payment_method', 'string', Cycle(payment_methods)), # New column
+], num_rows_per_day, seed=random_seed)
+
+assert [col.name for col in day1.columns] == headers_v1 == [col.name for col in day2.columns]
+assert [col.name for col in day3.columns] == headers_v2
+
+if __name__ == '__main__':
+    for filename, spec, label in [
+        (filename_day1, day1, 'Schema V1'),
+        (filename_day2, day2, 'Schema V1 again'),
+        (filename_day3, day3, 'Schema V2 - with inconsistencies'),
+    ]:
+        print(f"Creating '{filename}' ({label})...")
+        generate(spec, {'csv': filename}, workers=1, progress=False)
+        print(f"'{filename}' created.")
 
-print("\nCSV files created.")
\ No newline at end of file
+    print("\nCSV files created.")
@@ -0,0 +1,131 @@
+import argparse
+import collections
+import os
+import threading
+import time
+
+from metadata_query import aggregate_columnar_file, parse_aggregate
+from mycol import read_footer
+from selection import filter_columnar_file, parse_predicate
+
+# --- Decoded Chunk Cache ---
+# Dashboards re-run the same small queries every few seconds over the same recent row groups,
+# so reading and decoding the `status` / `value` chunks again each time is wasted work.
+# ChunkCache keeps decoded ChunkViews (selection.py: NumPy values + validity for int/float,
+# dictionary codes for strings) keyed by (file identity, row group, column), where the file
+# identity is (path, device, inode, size, mtime_ns) of the descriptor the chunks are read
+# through: a rewritten or replaced file never serves stale chunks, its old entries simply age
+# out. Entries are evicted least recently used first to stay within a byte budget.
+# filter_columnar_file / aggregate_columnar_file take it as `cache=`.
+
+# --- Configuration ---
+columnar_binary_file = 'columnar_data.bin' # Written by main.py (Step 3)
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+default_rounds = 5
+
+
+class ChunkCache:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = collections.OrderedDict() # key -> (view, nbytes), least recently used first
+        self.bytes = 0
+        self.lock = threading.Lock() # Shared by concurrent queries (service.py)
+        self.counters = dict.fromkeys(('hits', 'misses', 'inserts', 'evictions', 'too_large'), 0)
+
+    @staticmethod
+    def file_id(path, fd):
+        """Identity of the file open as `fd`: from fstat, so it names the bytes actually read, not whatever `path` is now."""
+        stat = os.fstat(fd)
+        return (os.path.abspath(path), stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    def get(self, key):
+        """The cached view for key (file_id, row_group, column), or None."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.counters['misses'] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.counters['hits'] += 1
+            return entry[0]
+
+    def put(self, key, view):
+        """Decode the view fully and cache it (evicting LRU entries over budget). Returns the view."""
+        view.decode()
+        nbytes = view.nbytes()
+        with self.lock:
+            if nbytes > self.max_bytes:
+                self.counters['too_large'] += 1
+                return view
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[1]
+            self.entries[key] = (view, nbytes)
+            self.bytes += nbytes
+            self.counters['inserts'] += 1
+            while self.bytes > self.max_bytes:
+                _, (_, evicted_bytes) = self.entries.popitem(last=False)
+                self.bytes -= evicted_bytes
+                self.counters['evictions'] += 1
+        return view
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.counters['hits'] + self.counters['misses']
+            return {
+                **self.counters,
+                'entries': len(self.entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hit_rate': self.counters['hits'] / lookups if lookups else None,
+            }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Re-run a dashboard's queries with and without the decoded chunk cache.")
+    parser.add_argument('file', nargs='?', default=columnar_binary_file)
+    parser.add_argument('--rounds', type=int, default=default_rounds, help="Dashboard refreshes to simulate")
+    parser.add_argument('--max-mb', type=float, default=DEFAULT_MAX_BYTES / (1024 * 1024), help="Cache budget in MB")
+    parser.add_argument('--recent', type=float, default=0.25, help="Fraction of the file (newest ids) the dashboard looks at")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        print(f"Error: {args.file} not found. Run main.py (steps 1-3) first.")
+        raise SystemExit(1)
+
+    with open(args.file, 'rb') as f:
+        metadata = read_footer(f)
+    col_types = dict(tuple(col) for col in metadata['columns'])
+    recent = f"id >= {int(metadata['num_rows'] * (1 - args.recent))}"
+    panels = [
+        ('filter', [parse_predicate(recent, col_types), parse_predicate("status = FAILED", col_types)], ['value']),
+        ('filter', [parse_predicate(recent, col_types), parse_predicate("value > 900", col_types)], ['id', 'status']),
+        ('aggregate', [parse_aggregate(a, col_types) for a in ('count(*)', 'avg(value)', 'max(value)')],
+         [parse_predicate(recent, col_types), parse_predicate("status != PROCESSED", col_types)]),
+    ]
+
+    def refresh(cache):
+        for kind, first, second in panels:
+            if kind == 'filter':
+                filter_columnar_file(args.file, first, second, cache=cache)
+            else:
+                aggregate_columnar_file(args.file, first, second, cache=cache)
+
+    print(f"\n--- {len(panels)} dashboard panels over '{recent}', {args.rounds} refreshes ---")
+    for label, cache in (("No cache", None), ("Chunk cache", ChunkCache(int(args.max_mb * 1024 * 1024)))):
+        timings = []
+        for _ in range(args.rounds):
+            start_time = time.perf_counter()
+            refresh(cache)
+            timings.append(time.perf_counter() - start_time)
+        print(f"\n  {label}: first refresh {timings[0] * 1000:.1f} ms, "
+              f"later refreshes {sum(timings[1:]) / max(len(timings) - 1, 1) * 1000:.1f} ms on average")
+        if cache is not None:
+            stats = cache.stats()
+            print(f"    {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.1%} hit rate), "
+                  f"{stats['evictions']} evictions; {stats['entries']} chunks, {stats['bytes'] / (1024 * 1024):.1f} MB cached")
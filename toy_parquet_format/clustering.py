@@ -0,0 +1,137 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+from mycol import ColumnarWriter, iter_record_batches, read_footer, storage_options
+
+# --- Clustered Writes ---
+# Rows written in arrival order spread every key value over every row group, so neither zone
+# maps nor binary search can skip anything. Clustering rewrites the rows ordered by chosen key
+# columns, in one of two modes:
+#   'sort'   - full external sort: sorted runs of memory_rows rows are spilled to Arrow IPC files
+#              and merged, so the whole file is ordered (footer scope 'file').
+#   'window' - sort each buffered window of window_rows rows independently; cheaper, but only
+#              the rows inside each row group are ordered (footer scope 'row_group').
+# Nulls sort last. The order is recorded in the footer as {'columns': [...], 'scope': ...}.
+
+RUN_COLUMN = '__run'   # Which spilled run a buffered row came from (merge bookkeeping)
+LAST_COLUMN = '__last' # Marks the last buffered row of a run that still has unread blocks
+
+
+def sort_keys(columns):
+    return [(name, 'ascending') for name in columns]
+
+
+def rebatch(tables, num_rows):
+    """Regroup a stream of tables into tables of exactly num_rows rows (the last may be shorter)."""
+    pending = []
+    pending_rows = 0
+    for table in tables:
+        pending.append(table)
+        pending_rows += table.num_rows
+        while pending_rows >= num_rows:
+            combined = pa.concat_tables(pending)
+            yield combined.slice(0, num_rows)
+            pending = [combined.slice(num_rows)]
+            pending_rows -= num_rows
+    if pending_rows:
+        yield pa.concat_tables(pending)
+
+
+def spill_sorted_runs(batches, by, memory_rows, block_rows, spill_dir):
+    """Sort consecutive runs of memory_rows rows and write each to an Arrow IPC file. Returns the paths."""
+    paths = []
+    for run in rebatch((pa.Table.from_batches([batch]) for batch in batches), memory_rows):
+        path = os.path.join(spill_dir, f'run_{len(paths):05d}.arrow')
+        with ipc.new_file(path, run.schema) as sink:
+            for block in run.sort_by(sort_keys(by)).to_batches(max_chunksize=block_rows):
+                sink.write_batch(block)
+        paths.append(path)
+    return paths
+
+
+def merge_sorted_runs(paths, by):
+    """
+    K-way merge of sorted IPC runs, one block per run in memory plus a sorted carry-over.
+    Each round sorts the carry-over together with the newly loaded blocks, emits every row up to
+    the first 'last buffered row' of a run with more blocks (nothing unread can sort before it),
+    and refills only that run.
+    """
+    readers = [ipc.open_file(pa.memory_map(path)) for path in paths]
+    next_block = [0] * len(readers)
+    refill = list(range(len(readers)))
+    carry = None
+    while True:
+        parts = [carry] if carry is not None and carry.num_rows else []
+        for run in refill:
+            reader = readers[run]
+            if next_block[run] >= reader.num_record_batches:
+                continue
+            block = pa.Table.from_batches([reader.get_batch(next_block[run])])
+            next_block[run] += 1
+            last = np.zeros(block.num_rows, dtype=bool)
+            if next_block[run] < reader.num_record_batches:
+                last[-1] = True
+            block = block.append_column(RUN_COLUMN, pa.array(np.full(block.num_rows, run, dtype=np.int32)))
+            parts.append(block.append_column(LAST_COLUMN, pa.array(last)))
+        if not parts:
+            return
+        merged = pa.concat_tables(parts).sort_by(sort_keys(by))
+        marks = np.flatnonzero(merged.column(LAST_COLUMN).to_numpy(zero_copy_only=False))
+        if not len(marks): # Every run is fully loaded: the rest is in order
+            yield merged.drop_columns([RUN_COLUMN, LAST_COLUMN])
+            return
+        cut = int(marks[0]) + 1
+        yield merged.slice(0, cut).drop_columns([RUN_COLUMN, LAST_COLUMN])
+        carry = merged.slice(cut)
+        refill = [merged.column(RUN_COLUMN)[int(marks[0])].as_py()]
+
+
+def write_clustered(batches, path, column_definitions, by, mode='sort', rows_per_row_group=50000,
+                    memory_rows=1000000, window_rows=500000, spill_dir=None, float_encoding='plain', codec=None,
+                    string_encoding='plain'):
+    """
+    Write record batches to a new MYCOL1 file clustered by the `by` columns (see module comment).
+    memory_rows bounds the rows sorted in memory at once in 'sort' mode; window_rows is the
+    window size in 'window' mode. float_encoding / codec / string_encoding are passed to the
+    ColumnarWriter. Returns the number of spilled runs (0 in window mode).
+    """
+    if mode not in ('sort', 'window'):
+        raise ValueError(f"Unknown clustering mode: {mode!r}")
+    scope = 'file' if mode == 'sort' else 'row_group'
+    with ColumnarWriter(path, column_definitions, sort_order={'columns': list(by), 'scope': scope},
+                        float_encoding=float_encoding, codec=codec, string_encoding=string_encoding) as writer:
+        if mode == 'window':
+            windows = rebatch((pa.Table.from_batches([batch]) for batch in batches), window_rows)
+            for window in windows:
+                for table in rebatch([window.sort_by(sort_keys(by))], rows_per_row_group):
+                    writer.write_table(table)
+            return 0
+
+        run_dir = tempfile.mkdtemp(prefix='mycol_sort_', dir=spill_dir)
+        try:
+            paths = spill_sorted_runs(batches, by, memory_rows, min(rows_per_row_group, memory_rows), run_dir)
+            for table in rebatch(merge_sorted_runs(paths, by), rows_per_row_group):
+                writer.write_table(table)
+            return len(paths)
+        finally:
+            shutil.rmtree(run_dir, ignore_errors=True)
+
+
+def cluster_file(source, destination, by, mode='sort', rows_per_row_group=None, **options):
+    """
+    Rewrite a MYCOL1 file clustered by `by`, stored like the source (float / string encoding, codec).
+    Row group size defaults to the source's first row group.
+    """
+    with open(source, 'rb') as f:
+        metadata = read_footer(f)
+    if rows_per_row_group is None:
+        rows_per_row_group = metadata['row_groups'][0]['num_rows_in_group'] if metadata['row_groups'] else 50000
+    float_encoding, codec, string_encoding = storage_options(metadata)
+    return write_clustered(iter_record_batches(source), destination, metadata['columns'], by, mode,
+                           rows_per_row_group, float_encoding=float_encoding, codec=codec,
+                           string_encoding=string_encoding, **options)
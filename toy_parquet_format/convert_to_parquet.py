@@ -0,0 +1,58 @@
+import argparse
+import os
+import time
+
+import pyarrow.parquet as pq
+
+from mycol import arrow_schema, iter_record_batches, read_footer
+
+# --- Configuration ---
+columnar_binary_file = 'columnar_data.bin' # Written by main.py (Step 3)
+parquet_output_file = 'columnar_data.parquet'
+
+
+def convert(source, destination, columns=None, compression='snappy', read_ahead=2):
+    """
+    Stream a MYCOL1 file into Parquet, one Parquet row group per MYCOL1 row group.
+    Only one row group (plus the read-ahead) is held in memory at a time.
+    Returns (num_rows, num_row_groups).
+    """
+    with open(source, 'rb') as f:
+        metadata = read_footer(f)
+    column_definitions = [tuple(col) for col in metadata['columns']]
+    if columns is not None:
+        types = dict(column_definitions)
+        column_definitions = [(name, types[name]) for name in columns]
+
+    num_rows = 0
+    num_row_groups = 0
+    with pq.ParquetWriter(destination, arrow_schema(column_definitions), compression=compression) as writer:
+        for batch in iter_record_batches(source, columns, read_ahead=read_ahead):
+            writer.write_batch(batch, row_group_size=batch.num_rows)
+            num_rows += batch.num_rows
+            num_row_groups += 1
+    return num_rows, num_row_groups
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Convert a MYCOL1 columnar file to Parquet.")
+    parser.add_argument('source', nargs='?', default=columnar_binary_file)
+    parser.add_argument('destination', nargs='?', default=parquet_output_file)
+    parser.add_argument('--columns', default=None, help="Comma separated subset of columns to convert.")
+    parser.add_argument('--compression', default='snappy', help="Parquet codec (snappy, zstd, gzip, none ...).")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.source):
+        print(f"Error: {args.source} not found. Run main.py (steps 1-3) first.")
+        raise SystemExit(1)
+
+    columns = [c for c in args.columns.split(',') if c] if args.columns else None
+    print(f"\nConverting '{args.source}' -> '{args.destination}' ({args.compression})...")
+    start_time = time.time()
+    num_rows, num_row_groups = convert(args.source, args.destination, columns, args.compression)
+    duration = time.time() - start_time
+
+    print(f"  Rows: {num_rows}, row groups: {num_row_groups}")
+    print(f"  MYCOL1 size:  {os.path.getsize(args.source) / (1024*1024):.2f} MB")
+    print(f"  Parquet size: {os.path.getsize(args.destination) / (1024*1024):.2f} MB")
+    print(f"  Conversion time: {duration:.2f} seconds")
@@ -0,0 +1,417 @@
+import concurrent.futures
+import multiprocessing
+import os
+import time
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from mycol import ColumnarWriter, chunk_aggregates, chunk_sketch, encode_chunk, joined_data
+from row_format import encode_rows
+
+# --- Shared synthetic data generation ---
+# Columns are built with NumPy / Arrow kernels one block of rows at a time. Every block
+# (and every column within it) gets its own RNG seeded from (seed, block, column), so the
+# output is byte-for-byte identical whatever the number of worker processes.
+#
+#   spec = DatasetSpec([Column('id', 'int', Sequence()), ...], num_rows=1_000_000, seed=42)
+#   generate(spec, {'csv': 'data.csv', 'mycol': 'data.bin'}, workers=4)
+#
+# Column generators are small picklable objects called as generator(row_ids, rng) and
+# returning a NumPy array (numbers) or an Arrow string array.
+
+ARROW_TYPES = {'int': pa.int64(), 'float': pa.float64(), 'string': pa.string()}
+
+
+# --- Column Generators ---
+
+class Constant:
+    def __init__(self, value):
+        self.value = value
+
+    def __call__(self, ids, rng):
+        return np.full(len(ids), self.value)
+
+
+class Sequence:
+    """start + row_id * step"""
+    def __init__(self, start=0, step=1):
+        self.start, self.step = start, step
+
+    def __call__(self, ids, rng):
+        return self.start + ids * self.step
+
+
+class Modular:
+    """(row_id % modulus) * scale + offset -- repeating numeric patterns like prices."""
+    def __init__(self, modulus, offset=0, scale=1):
+        self.modulus, self.offset, self.scale = modulus, offset, scale
+
+    def __call__(self, ids, rng):
+        return (ids % self.modulus) * self.scale + self.offset
+
+
+class FloorDiv:
+    """row_id // divisor, optionally wrapped by modulus (e.g. minutes from a row counter)."""
+    def __init__(self, divisor, modulus=None):
+        self.divisor, self.modulus = divisor, modulus
+
+    def __call__(self, ids, rng):
+        values = ids // self.divisor
+        return values % self.modulus if self.modulus else values
+
+
+class Cycle:
+    """values[row_id % len(values)] -- deterministic low-cardinality columns."""
+    def __init__(self, values):
+        self.values = list(values)
+
+    def __call__(self, ids, rng):
+        return pa.array(self.values).take(pa.array(ids % len(self.values)))
+
+
+class RandomChoice:
+    def __init__(self, values):
+        self.values = list(values)
+
+    def __call__(self, ids, rng):
+        return pa.array(self.values).take(pa.array(rng.integers(0, len(self.values), len(ids))))
+
+
+class Uniform:
+    def __init__(self, low=0.0, high=1.0):
+        self.low, self.high = low, high
+
+    def __call__(self, ids, rng):
+        return rng.uniform(self.low, self.high, len(ids))
+
+
+class RandomInt:
+    """Integers in [low, high)."""
+    def __init__(self, low, high):
+        self.low, self.high = low, high
+
+    def __call__(self, ids, rng):
+        return rng.integers(self.low, self.high, len(ids), dtype=np.int64)
+
+
+class Add:
+    def __init__(self, *parts):
+        self.parts = parts
+
+    def __call__(self, ids, rng):
+        return sum(part(ids, rng) for part in self.parts)
+
+
+class Multiply:
+    def __init__(self, *parts):
+        self.parts = parts
+
+    def __call__(self, ids, rng):
+        result = self.parts[0](ids, rng)
+        for part in self.parts[1:]:
+            result = result * part(ids, rng)
+        return result
+
+
+class RepeatChar:
+    """char * (row_id % modulus) -- variable-length padding."""
+    def __init__(self, char, modulus):
+        self.char, self.modulus = char, modulus
+
+    def __call__(self, ids, rng):
+        return pa.array([self.char * k for k in range(self.modulus)]).take(pa.array(ids % self.modulus))
+
+
+class FixedDecimal:
+    """Format a numeric part with a fixed number of decimals, like f'{x:.2f}'."""
+    def __init__(self, part, decimals):
+        self.part, self.decimals = part, decimals
+
+    def __call__(self, ids, rng):
+        return format_fixed(self.part(ids, rng), self.decimals)
+
+
+class ZeroPad:
+    """Zero-pad a numeric part to width, like f'{x:02d}'."""
+    def __init__(self, part, width):
+        self.part, self.width = part, width
+
+    def __call__(self, ids, rng):
+        return pc.utf8_lpad(as_text(self.part(ids, rng)), self.width, '0')
+
+
+class Template:
+    """Concatenate literal strings and generated parts, like an f-string per row."""
+    def __init__(self, *parts):
+        self.parts = parts
+
+    def __call__(self, ids, rng):
+        pieces = [part if isinstance(part, str) else as_text(part(ids, rng)) for part in self.parts]
+        if all(isinstance(piece, str) for piece in pieces):
+            return pa.array([''.join(pieces)] * len(ids))
+        return pc.binary_join_element_wise(*pieces, '')
+
+
+class Override:
+    """Replace the base value with a literal where row_id % modulus == remainder (first rule wins)."""
+    def __init__(self, base, rules):
+        self.base, self.rules = base, rules
+
+    def __call__(self, ids, rng):
+        values = as_text(self.base(ids, rng))
+        for modulus, remainder, literal in reversed(self.rules):
+            values = pc.if_else(pa.array(ids % modulus == remainder), literal, values)
+        return values
+
+
+def as_text(values):
+    if isinstance(values, (pa.Array, pa.ChunkedArray)):
+        return values if pa.types.is_string(values.type) else values.cast(pa.string())
+    return pa.array(values).cast(pa.string())
+
+
+def format_fixed(values, decimals):
+    """
+    Vectorized '%.{decimals}f' formatting of a NumPy float array, identical to Python's.
+    Rounding the scaled product is exact except where it lands within a few ulps of a tie
+    (1.115 * 100 = 111.5 although 1.115 is stored just below it): those values, and
+    non-finite or huge ones, are formatted by Python.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    scale = 10 ** decimals
+    with np.errstate(invalid='ignore', over='ignore'):
+        product = np.abs(values) * scale
+        fallback = ~np.isfinite(product) | (product >= 2.0 ** 62)
+        product[fallback] = 0
+        near_tie = np.abs(product - np.floor(product) - 0.5) <= 4 * np.spacing(product)
+    fallback |= near_tie
+    scaled = np.round(product).astype(np.int64)
+    text = as_text(scaled // scale)
+    if decimals:
+        fraction = pc.utf8_lpad(as_text(scaled % scale), decimals, '0')
+        text = pc.binary_join_element_wise(text, fraction, '.')
+    negative = np.signbit(values) # Python keeps the sign of -0.0 and of negatives that round to zero
+    if negative.any():
+        text = pc.if_else(pa.array(negative), pc.binary_join_element_wise('-', text, ''), text)
+    if fallback.any():
+        exact = pa.array([f'{value:.{decimals}f}' for value in values[fallback]], pa.string())
+        text = pc.replace_with_mask(text, pa.array(fallback), exact)
+    return text
+
+
+# --- Dataset Specification ---
+
+class Column:
+    def __init__(self, name, col_type, generator, decimals=None):
+        """col_type is 'int', 'float' or 'string'; decimals fixes the CSV text of float columns."""
+        self.name, self.col_type, self.generator, self.decimals = name, col_type, generator, decimals
+
+
+class DatasetSpec:
+    def __init__(self, columns, num_rows, seed=0, block_rows=50000):
+        self.columns = columns
+        self.num_rows = num_rows
+        self.seed = seed
+        self.block_rows = block_rows # Also the MYCOL1 / Parquet row group size
+
+    @property
+    def column_definitions(self):
+        return [(col.name, col.col_type) for col in self.columns]
+
+    @property
+    def schema(self):
+        return pa.schema([(col.name, ARROW_TYPES[col.col_type]) for col in self.columns])
+
+    @property
+    def num_blocks(self):
+        return (self.num_rows + self.block_rows - 1) // self.block_rows
+
+
+def generate_block(spec, block_index):
+    """Build one block of rows as a RecordBatch. Depends only on (spec, block_index)."""
+    start = block_index * spec.block_rows
+    ids = np.arange(start, min(start + spec.block_rows, spec.num_rows), dtype=np.int64)
+    arrays = []
+    for column_index, col in enumerate(spec.columns):
+        rng = np.random.default_rng([spec.seed, block_index, column_index])
+        values = col.generator(ids, rng)
+        if isinstance(values, pa.ChunkedArray):
+            values = values.combine_chunks()
+        if col.col_type == 'string':
+            values = as_text(values)
+        elif isinstance(values, pa.Array):
+            values = values.cast(ARROW_TYPES[col.col_type])
+        else:
+            values = pa.array(np.broadcast_to(values, ids.shape), ARROW_TYPES[col.col_type])
+        arrays.append(values)
+    return pa.record_batch(arrays, schema=spec.schema)
+
+
+# --- Block Encoders (run in the worker processes) ---
+
+def csv_text(values):
+    """Quote only the values that need it, like csv.writer's QUOTE_MINIMAL."""
+    values = values.fill_null('')
+    needs_quote = pc.match_substring_regex(values, '[",\r\n]')
+    if pc.any(needs_quote).as_py():
+        quoted = pc.binary_join_element_wise('"', pc.replace_substring(values, '"', '""'), '"', '')
+        values = pc.if_else(needs_quote, quoted, values)
+    return values
+
+
+def encode_csv_block(spec, batch):
+    fields = []
+    for col, values in zip(spec.columns, batch.columns):
+        if col.col_type == 'float' and col.decimals is not None:
+            values = format_fixed(values.to_numpy(zero_copy_only=False), col.decimals)
+        fields.append(csv_text(as_text(values)))
+    lines = pc.binary_join_element_wise(*fields, ',') if len(fields) > 1 else fields[0]
+    lines = pc.binary_join_element_wise(lines, '\r\n', '') # csv.writer's default line terminator
+    return bytes(joined_data(lines))
+
+
+def encode_row_binary_block(spec, batch):
+    return encode_rows({name: batch.column(name) for name in batch.schema.names}, spec.column_definitions)
+
+
+def encode_columnar_block(spec, batch):
+    # Footer aggregates and sketches are computed here too, so the parent process only writes bytes
+    chunks = {col.name: encode_chunk(col.col_type, batch.column(col.name)) for col in spec.columns}
+    stats = {
+        col.name: chunk_aggregates(col.col_type, chunks[col.name], batch.num_rows, batch.column(col.name))
+        for col in spec.columns
+    }
+    sketches = {
+        col.name: chunk_sketch(col.col_type, chunks[col.name], batch.num_rows, batch.column(col.name))
+        for col in spec.columns
+    }
+    return chunks, stats, sketches
+
+
+def encode_parquet_block(spec, batch):
+    return batch # ParquetWriter does the encoding; Arrow batches pickle cheaply between processes
+
+
+BLOCK_ENCODERS = {
+    'csv': encode_csv_block,
+    'row_binary': encode_row_binary_block,
+    'mycol': encode_columnar_block,
+    'parquet': encode_parquet_block,
+}
+
+
+def produce_block(spec, formats, block_index):
+    batch = generate_block(spec, block_index)
+    return batch.num_rows, {fmt: BLOCK_ENCODERS[fmt](spec, batch) for fmt in formats}
+
+
+# --- Sinks (run in the parent, in block order) ---
+
+class CsvSink:
+    def __init__(self, path, spec):
+        self.f = open(path, 'wb')
+        self.f.write((','.join(col.name for col in spec.columns) + '\r\n').encode('utf-8')) # Header
+
+    def write(self, num_rows, payload):
+        self.f.write(payload)
+
+    def close(self):
+        self.f.close()
+
+
+class RowBinarySink:
+    def __init__(self, path, spec):
+        self.f = open(path, 'wb')
+
+    def write(self, num_rows, payload):
+        self.f.write(payload)
+
+    def close(self):
+        self.f.close()
+
+
+class ColumnarSink:
+    def __init__(self, path, spec):
+        self.writer = ColumnarWriter(path, spec.column_definitions)
+
+    def write(self, num_rows, payload):
+        chunks, stats, sketches = payload
+        self.writer.write_row_group(num_rows, chunks, stats, sketches)
+
+    def close(self):
+        self.writer.close()
+
+
+class ParquetSink:
+    def __init__(self, path, spec, **writer_kwargs):
+        self.writer = pq.ParquetWriter(path, spec.schema, **writer_kwargs)
+
+    def write(self, num_rows, payload):
+        self.writer.write_batch(payload, row_group_size=num_rows)
+
+    def close(self):
+        self.writer.close()
+
+
+SINKS = {
+    'csv': CsvSink,
+    'row_binary': RowBinarySink,
+    'mycol': ColumnarSink,
+    'parquet': ParquetSink,
+}
+
+
+# --- Driver ---
+
+def iter_blocks(spec, formats, workers):
+    """Yield (num_rows, payloads) for every block in order, using up to `workers` processes."""
+    if workers <= 1:
+        for block_index in range(spec.num_blocks):
+            yield produce_block(spec, formats, block_index)
+        return
+
+    # Fork avoids re-importing the calling script in the workers where it is available
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+    max_in_flight = workers * 2 # Bounds memory held by finished-but-unwritten blocks
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        pending = []
+        next_block = 0
+        while next_block < spec.num_blocks or pending:
+            while next_block < spec.num_blocks and len(pending) < max_in_flight:
+                pending.append(executor.submit(produce_block, spec, formats, next_block))
+                next_block += 1
+            yield pending.pop(0).result() # Results are consumed strictly in block order
+
+
+def generate(spec, outputs, workers=None, parquet_options=None, progress=True):
+    """
+    Generate `spec` once and write it to every requested output.
+    outputs: {'csv' | 'row_binary' | 'mycol' | 'parquet': path}
+    """
+    workers = workers or os.cpu_count() or 1
+    formats = list(outputs)
+    sinks = {}
+    for fmt, path in outputs.items():
+        if fmt == 'parquet':
+            sinks[fmt] = ParquetSink(path, spec, **(parquet_options or {}))
+        else:
+            sinks[fmt] = SINKS[fmt](path, spec)
+
+    start_time = time.time()
+    rows_written = 0
+    report_every = max(1, spec.num_blocks // 10)
+    try:
+        for block_index, (num_rows, payloads) in enumerate(iter_blocks(spec, formats, workers)):
+            for fmt, payload in payloads.items():
+                sinks[fmt].write(num_rows, payload)
+            rows_written += num_rows
+            if progress and ((block_index + 1) % report_every == 0 or rows_written == spec.num_rows):
+                print(f"  {rows_written}/{spec.num_rows} rows written ({time.time() - start_time:.1f}s, {workers} workers)...")
+    finally:
+        for sink in sinks.values():
+            sink.close()
+    return rows_written
@@ -0,0 +1,354 @@
+import argparse
+import json
+import os
+import shutil
+import time
+
+import pyarrow as pa
+
+from metadata_query import combine, finish, footer_partial, has_aggregates, parse_aggregate
+from mycol import (
+    COLUMNAR_MAGIC, ColumnarWriter, arrow_schema, merge_aggregates, read_footer, read_table, storage_options,
+)
+from selection import parse_predicate, zone_covers, zone_may_match
+from service import ColumnarFileService
+
+try:
+    import fcntl # Serializes concurrent manifest updates (POSIX)
+except ImportError:
+    fcntl = None
+
+# --- Multi-File Datasets ---
+# A dataset is a directory of MYCOL1 files (e.g. one per hour) plus a manifest, _manifest.json,
+# holding the shared schema and, per file, its size / mtime, row count and column stats (the
+# row group aggregates of its footer merged per column). Queries read only the manifest to
+# decide which files can hold matching rows (the same zone map checks as row groups, one level
+# up); files whose stats cover every predicate answer aggregates from the manifest too. The
+# remaining files are scanned in parallel through a ColumnarFileService.
+# Manifest updates are read-modify-write under a lock file and land with an atomic rename,
+# so readers see either the old or the new manifest, never a partial one.
+
+# --- Configuration ---
+MANIFEST_NAME = '_manifest.json'
+LOCK_NAME = '_manifest.lock'
+MANIFEST_VERSION = 1
+default_workers = os.cpu_count() or 1
+
+
+def empty_manifest():
+    return {'version': MANIFEST_VERSION, 'columns': None, 'num_rows': 0, 'files': {}}
+
+
+def file_entry(path):
+    """Manifest entry for one MYCOL1 file, from its footer."""
+    stat = os.stat(path)
+    with open(path, 'rb') as f:
+        metadata = read_footer(f)
+    return {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'num_rows': metadata['num_rows'],
+        'num_row_groups': len(metadata['row_groups']),
+        'columns': [list(col) for col in metadata['columns']],
+        'stats': {
+            name: merge_aggregates([rg['column_chunks'][name] for rg in metadata['row_groups']])
+            for name, _ in metadata['columns']
+        },
+    }
+
+
+def is_data_file(path):
+    name = os.path.basename(path)
+    if name.startswith(('_', '.')) or not os.path.isfile(path):
+        return False
+    with open(path, 'rb') as f:
+        return f.read(len(COLUMNAR_MAGIC)) == COLUMNAR_MAGIC
+
+
+class Dataset:
+    """
+    A directory of MYCOL1 files queried as one table:
+
+        dataset = Dataset('events/')
+        dataset.add(['2024-05-01T13.bin'])          # copied in, manifest updated atomically
+        table, report = dataset.filter(predicates, ['id', 'value'])
+        results, report = dataset.aggregate(aggregates, predicates)
+
+    Predicates and aggregates are parsed tuples (selection.parse_predicate, parse_aggregate).
+    """
+
+    def __init__(self, directory, workers=default_workers):
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, MANIFEST_NAME)
+        self.workers = workers
+        self.service = None
+        self.manifest = self.load()
+
+    # --- Manifest ---
+
+    def load(self):
+        if not os.path.exists(self.manifest_path):
+            return empty_manifest()
+        with open(self.manifest_path, 'r') as f:
+            manifest = json.load(f)
+        if manifest.get('version') != MANIFEST_VERSION:
+            raise ValueError(f"Unsupported manifest version in '{self.manifest_path}': {manifest.get('version')!r}")
+        return manifest
+
+    def update(self, change):
+        """Apply change(manifest) to the latest manifest on disk and replace it atomically."""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, LOCK_NAME), 'w') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX) # Another process may be adding files too
+            manifest = self.load()
+            change(manifest)
+            manifest['num_rows'] = sum(entry['num_rows'] for entry in manifest['files'].values())
+            temporary = f"{self.manifest_path}.tmp.{os.getpid()}"
+            with open(temporary, 'w') as f:
+                json.dump(manifest, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporary, self.manifest_path)
+            if hasattr(os, 'O_DIRECTORY'): # Make the rename itself durable
+                directory_fd = os.open(self.directory, os.O_RDONLY | os.O_DIRECTORY)
+                try:
+                    os.fsync(directory_fd)
+                finally:
+                    os.close(directory_fd)
+        self.manifest = manifest
+        return manifest
+
+    def register(self, manifest, name):
+        entry = file_entry(os.path.join(self.directory, name))
+        columns = entry.pop('columns')
+        if manifest['columns'] is None:
+            manifest['columns'] = columns
+        elif columns != manifest['columns']:
+            raise ValueError(f"Schema of '{name}' {columns} does not match the dataset's {manifest['columns']}")
+        manifest['files'][name] = entry
+
+    def add(self, paths):
+        """Copy MYCOL1 files into the dataset directory (unless already there) and record them."""
+        os.makedirs(self.directory, exist_ok=True)
+        names = []
+        for path in paths:
+            name = os.path.basename(path)
+            destination = os.path.join(self.directory, name)
+            if os.path.abspath(path) != os.path.abspath(destination):
+                if os.path.exists(destination):
+                    raise ValueError(f"'{name}' already exists in '{self.directory}'")
+                temporary = os.path.join(self.directory, f".{name}.tmp") # Not a data file until renamed
+                shutil.copyfile(path, temporary)
+                os.replace(temporary, destination)
+            names.append(name)
+
+        def change(manifest):
+            for name in names:
+                self.register(manifest, name)
+        return self.update(change)
+
+    def sync(self):
+        """Record new or changed files found in the directory and forget deleted ones (reads only those footers)."""
+        added, removed = [], []
+
+        def change(manifest):
+            present = {name for name in os.listdir(self.directory) if is_data_file(os.path.join(self.directory, name))}
+            for name in sorted(set(manifest['files']) - present):
+                del manifest['files'][name]
+                removed.append(name)
+            for name in sorted(present):
+                stat = os.stat(os.path.join(self.directory, name))
+                entry = manifest['files'].get(name)
+                if entry is None or (entry['size'], entry['mtime_ns']) != (stat.st_size, stat.st_mtime_ns):
+                    self.register(manifest, name)
+                    added.append(name)
+            if not manifest['files']:
+                manifest['columns'] = None
+        self.update(change)
+        return added, removed
+
+    @property
+    def col_types(self):
+        return dict(tuple(col) for col in self.manifest['columns'] or [])
+
+    def files(self):
+        return sorted(self.manifest['files']) # Hourly file names sort chronologically
+
+    # --- Pruning ---
+
+    def prune(self, predicates):
+        """
+        Split the files by the manifest stats: (scan, covered, report). `covered` files hold only
+        matching rows; files in neither list cannot hold any.
+        """
+        scan, covered = [], []
+        for name in self.files():
+            stats = self.manifest['files'][name]['stats']
+            if not all(zone_may_match(stats[p[0]], p) for p in predicates):
+                continue
+            (covered if all(zone_covers(stats[p[0]], p) for p in predicates) else scan).append(name)
+        report = {
+            'files': len(self.manifest['files']),
+            'files_pruned': len(self.manifest['files']) - len(scan) - len(covered),
+            'files_covered': len(covered),
+            'files_scanned': 0,
+        }
+        return scan, covered, report
+
+    def paths(self, predicates=()):
+        """Paths of the files that may hold rows matching the predicates."""
+        scan, covered, _ = self.prune(predicates)
+        return [os.path.join(self.directory, name) for name in sorted(scan + covered)]
+
+    # --- Queries ---
+
+    def query_service(self):
+        if self.service is None:
+            self.service = ColumnarFileService(max_concurrency=self.workers)
+        return self.service
+
+    def filter(self, predicates, columns):
+        """SELECT columns WHERE predicates over the surviving files, in file order. Returns (pyarrow.Table, report)."""
+        scan, covered, report = self.prune(predicates)
+        names = sorted(scan + covered)
+        report['files_covered'] = 0 # Selected rows still have to be read
+        report['files_scanned'] = len(names)
+        service = self.query_service()
+        futures = [service.submit('filter', os.path.join(self.directory, name), predicates, columns) for name in names]
+        tables = []
+        for future in futures:
+            table, file_report = future.result()
+            tables.append(table)
+            for key in ('rows_selected', 'bytes_read', 'row_groups', 'row_groups_pruned_zone_map'):
+                report[key] = report.get(key, 0) + file_report[key]
+        if not tables:
+            types = self.col_types
+            return arrow_schema([(name, types[name]) for name in columns]).empty_table(), report
+        return pa.concat_tables(tables), report
+
+    def aggregate(self, aggregates, predicates=()):
+        """
+        Aggregates over the rows matching the predicates. Covered files are answered from the
+        manifest; the others are scanned in parallel. Returns ({aggregate: value}, report).
+        """
+        scan, covered, report = self.prune(predicates)
+        columns = list(dict.fromkeys(column for _, column in aggregates if column is not None))
+        states = {column: None for column in columns}
+        rows_matched = 0
+        report['bytes_read'] = 0
+
+        answered = 0
+        for name in covered:
+            entry = self.manifest['files'][name]
+            if not all(has_aggregates(entry['stats'][column]) for column in columns):
+                scan.append(name) # Written without footer aggregates: aggregate it by reading
+                continue
+            answered += 1
+            rows_matched += entry['num_rows']
+            for column in columns:
+                states[column] = combine(states[column], footer_partial(entry['stats'][column], entry['num_rows']))
+        report['files_covered'] = answered
+
+        service = self.query_service()
+        futures = [service.submit('aggregate_states', os.path.join(self.directory, name), aggregates, predicates) for name in sorted(scan)]
+        for future in futures:
+            file_states, file_rows, file_report = future.result()
+            rows_matched += file_rows
+            report['bytes_read'] += file_report['bytes_read']
+            for column in columns:
+                if file_states[column] is not None:
+                    states[column] = combine(states[column], file_states[column])
+        report['files_scanned'] = len(scan)
+        report['rows_matched'] = rows_matched
+        results = {(function, column): finish(function, column, states[column] if column else None, rows_matched)
+                   for function, column in aggregates}
+        return results, report
+
+    def close(self):
+        if self.service is not None:
+            self.service.close()
+            self.service = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def split_file(source, directory, num_files, prefix='part'):
+    """
+    Write the rows of one MYCOL1 file as `num_files` consecutive files (e.g. to simulate hourly
+    files), stored like the source (float / string encoding, codec).
+    """
+    table = read_table(source)
+    with open(source, 'rb') as f:
+        metadata = read_footer(f)
+    float_encoding, codec, string_encoding = storage_options(metadata)
+    os.makedirs(directory, exist_ok=True)
+    rows_per_file = -(-table.num_rows // num_files)
+    paths = []
+    for index, start in enumerate(range(0, table.num_rows, rows_per_file)):
+        path = os.path.join(directory, f"{prefix}-{index:05d}.bin")
+        with ColumnarWriter(path, metadata['columns'], float_encoding=float_encoding, codec=codec,
+                            string_encoding=string_encoding) as writer:
+            writer.write_table(table.slice(start, rows_per_file))
+        paths.append(path)
+    return paths
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Multi-file MYCOL1 datasets: a directory of files plus a manifest.")
+    parser.add_argument('directory')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('info', help="Show the manifest summary.")
+    add_parser = subparsers.add_parser('add', help="Copy MYCOL1 files into the dataset and record them.")
+    add_parser.add_argument('files', nargs='+')
+    subparsers.add_parser('sync', help="Record new / changed files in the directory, forget deleted ones.")
+    split_parser = subparsers.add_parser('split', help="Split one MYCOL1 file into many dataset files.")
+    split_parser.add_argument('source')
+    split_parser.add_argument('--files', type=int, default=24)
+
+    query_parser = subparsers.add_parser('query', help="Aggregate or select over the dataset.")
+    query_parser.add_argument('--where', action='append', default=[], help="Predicate such as 'id < 5000'. Repeat to AND.")
+    query_parser.add_argument('--agg', action='append', default=[], help="Aggregate such as 'sum(value)'. Repeatable.")
+    query_parser.add_argument('--select', default=None, help="Comma separated columns to return instead of aggregates.")
+    query_parser.add_argument('--workers', type=int, default=default_workers)
+    args = parser.parse_args()
+    start_time = time.time()
+
+    if args.command == 'split':
+        paths = split_file(args.source, args.directory, args.files)
+        Dataset(args.directory).sync()
+        print(f"  Wrote {len(paths)} files to '{args.directory}' in {time.time() - start_time:.2f} seconds.")
+    elif args.command == 'add':
+        manifest = Dataset(args.directory).add(args.files)
+        print(f"  Added {len(args.files)} files; the dataset now has {len(manifest['files'])} files, {manifest['num_rows']} rows.")
+    elif args.command == 'sync':
+        added, removed = Dataset(args.directory).sync()
+        print(f"  {len(added)} files recorded, {len(removed)} forgotten ({time.time() - start_time:.2f} seconds).")
+    elif args.command == 'info':
+        manifest = Dataset(args.directory).manifest
+        print(f"  Directory: {args.directory}")
+        print(f"  Files: {len(manifest['files'])}, rows: {manifest['num_rows']}")
+        print(f"  Columns: {', '.join(f'{name} ({col_type})' for name, col_type in manifest['columns'] or [])}")
+    else:
+        with Dataset(args.directory, args.workers) as dataset:
+            predicates = [parse_predicate(text, dataset.col_types) for text in args.where]
+            print(f"\n--- Query on dataset '{args.directory}' ({len(dataset.files())} files) ---")
+            print(f"   Where: {' AND '.join(args.where) or '(none)'}")
+            if args.select:
+                table, report = dataset.filter(predicates, [c for c in args.select.split(',') if c])
+                print(f"   Rows selected: {table.num_rows}")
+            else:
+                aggregate_texts = args.agg or ['count(*)']
+                aggregates = [parse_aggregate(t, dataset.col_types) for t in aggregate_texts]
+                results, report = dataset.aggregate(aggregates, predicates)
+                for text, aggregate in zip(aggregate_texts, aggregates): # Repeated aggregates share one result
+                    print(f"   {text}: {results[aggregate]}")
+            print(f"   Files: {report['files']} total, {report['files_pruned']} pruned by the manifest, "
+                  f"{report['files_covered']} answered from the manifest, {report['files_scanned']} scanned")
+            print(f"   Bytes of data read: {report.get('bytes_read', 0)}")
+            print(f"   Time taken: {(time.time() - start_time) * 1000:.2f} ms")
@@ -0,0 +1,315 @@
+import argparse
+import concurrent.futures
+import multiprocessing
+import os
+import time
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+import tracing
+from metadata_query import aggregate_columnar_file, parse_aggregate
+from mycol import ARROW_TYPES, COLUMNAR_MAGIC, chunk_to_arrow, read_chunks, read_footer
+
+# --- Vectorized GROUP BY ---
+# SELECT keys..., aggregates... FROM files GROUP BY keys, in one scan instead of one filtered
+# scan per key combination. Every row group becomes a partial result independently:
+#   1. factorize: each key column is dictionary-encoded (Arrow), the codes are combined into
+#      one dense group id per row (a lookup table when the code space is small, np.unique otherwise);
+#   2. aggregate: per-group states with np.bincount / ufunc.at - row counts, non-null counts,
+#      sums, and min/max (strings via the rank of their dictionary entry).
+# A partial is a small Arrow table (keys + states), so partials from worker processes merge by
+# running the same two steps over their concatenation. MYCOL1 and Parquet inputs both work.
+
+# --- Configuration ---
+columnar_binary_file = 'columnar_data.bin' # Written by main.py (Step 3)
+default_keys = ['status', 'category']
+default_aggregates = ['count(*)', 'sum(value)', 'avg(value)', 'max(value)']
+DENSE_GROUP_LIMIT = 1 << 22 # Combined code spaces up to this size use a lookup table instead of np.unique
+MERGE_BATCH = 16 # Partials merged at once while results stream in (bounds memory for many row groups)
+
+ARROW_COL_TYPES = {'int': pa.types.is_integer, 'float': pa.types.is_floating}
+
+
+# --- Kernels ---
+
+def factorize(key_arrays, num_rows):
+    """
+    Dense group id (int64) per row for the key columns (Arrow arrays; null is a key value too).
+    Returns (ids, first_rows): first_rows[g] is a row holding group g's key.
+    """
+    ids = np.zeros(num_rows, dtype=np.int64)
+    num_groups = 1 if num_rows else 0
+    for array in key_arrays:
+        encoded = array if pa.types.is_dictionary(array.type) else array.dictionary_encode()
+        size = len(encoded.dictionary) + 1 # Last code = null
+        codes = encoded.indices.fill_null(size - 1).to_numpy(zero_copy_only=False).astype(np.int64)
+        combined = ids * size + codes
+        if num_groups * size <= DENSE_GROUP_LIMIT:
+            present = np.zeros(num_groups * size, dtype=bool)
+            present[combined] = True
+            remap = np.cumsum(present) - 1
+            ids, num_groups = remap[combined], int(remap[-1]) + 1 if len(remap) else 0
+        else:
+            _, ids = np.unique(combined, return_inverse=True)
+            num_groups = int(ids.max()) + 1 if num_rows else 0
+    first_rows = np.full(num_groups, num_rows, dtype=np.int64)
+    np.minimum.at(first_rows, ids, np.arange(num_rows, dtype=np.int64))
+    return ids, first_rows
+
+
+def valid_mask(values):
+    return values.is_valid().to_numpy(zero_copy_only=False)
+
+
+def group_count(ids, num_groups, values=None):
+    """Rows per group, or non-null values per group."""
+    if values is not None and values.null_count:
+        ids = ids[valid_mask(values)]
+    return pa.array(np.bincount(ids, minlength=num_groups), pa.int64())
+
+
+def group_sum(ids, num_groups, values):
+    """Per-group sum of a numeric Arrow array (nulls count as 0)."""
+    numbers = values.fill_null(0).to_numpy(zero_copy_only=False)
+    if pa.types.is_integer(values.type):
+        sums = np.zeros(num_groups, dtype=np.int64) # Exact, unlike bincount's float64 weights
+        np.add.at(sums, ids, numbers)
+        return pa.array(sums, pa.int64())
+    return pa.array(np.bincount(ids, weights=numbers, minlength=num_groups), pa.float64())
+
+
+def group_extreme(function, ids, num_groups, values):
+    """Per-group min or max of an Arrow array, nulls ignored (null for all-null groups)."""
+    valid = valid_mask(values)
+    ids = ids[valid]
+    if pa.types.is_string(values.type) or pa.types.is_large_string(values.type):
+        # Compare ranks of the dictionary entries, then map the winning ranks back to strings
+        encoded = values.dictionary_encode()
+        order = pc.array_sort_indices(encoded.dictionary).to_numpy(zero_copy_only=False)
+        ranks = np.empty(len(order), dtype=np.int64)
+        ranks[order] = np.arange(len(order))
+        keys = ranks[encoded.indices.fill_null(0).to_numpy(zero_copy_only=False)[valid]]
+        lookup = encoded.dictionary.take(pa.array(order))
+    else:
+        keys = values.fill_null(0).to_numpy(zero_copy_only=False)[valid]
+        lookup = None
+    limits = np.iinfo(keys.dtype) if keys.dtype.kind in 'iu' else np.finfo(keys.dtype)
+    result = np.full(num_groups, limits.max if function == 'min' else limits.min, dtype=keys.dtype)
+    (np.minimum if function == 'min' else np.maximum).at(result, ids, keys)
+    empty = np.bincount(ids, minlength=num_groups) == 0
+    if lookup is not None:
+        return lookup.take(pa.array(np.where(empty, 0, result), mask=empty))
+    return pa.array(result, mask=empty, type=values.type)
+
+
+# --- Partial Aggregates ---
+
+def state_columns(aggregates):
+    """(state name, function, source column) needed for the aggregates; states merge with `function`."""
+    states = {'count(*)': ('count', None)}
+    for function, column in aggregates:
+        if column is None:
+            continue
+        states[f'non_null({column})'] = ('count', column)
+        if function in ('sum', 'avg'):
+            states[f'sum({column})'] = ('sum', column)
+        elif function in ('min', 'max'):
+            states[f'{function}({column})'] = (function, column)
+    return states
+
+
+def partial_aggregate(table, keys, aggregates):
+    """Arrow table of keys + aggregate states for one batch of rows (a row group)."""
+    columns = {name: table.column(name).combine_chunks() if isinstance(table.column(name), pa.ChunkedArray)
+               else table.column(name) for name in table.column_names}
+    ids, first_rows = factorize([columns[name] for name in keys], table.num_rows)
+    num_groups = len(first_rows)
+    result = {name: columns[name].take(pa.array(first_rows)) for name in keys}
+    for state, (function, column) in state_columns(aggregates).items():
+        if function == 'count':
+            result[state] = group_count(ids, num_groups, columns[column] if column else None)
+        elif function == 'sum':
+            result[state] = group_sum(ids, num_groups, columns[column])
+        else:
+            result[state] = group_extreme(function, ids, num_groups, columns[column])
+    return pa.table(result)
+
+
+def merge_partials(partials, keys, aggregates):
+    """Combine partial tables (from any row groups / workers) into one partial."""
+    combined = pa.concat_tables(partials).combine_chunks()
+    ids, first_rows = factorize([combined.column(name).combine_chunks() for name in keys], combined.num_rows)
+    num_groups = len(first_rows)
+    result = {name: combined.column(name).take(pa.array(first_rows)) for name in keys}
+    for state, (function, _) in state_columns(aggregates).items():
+        values = combined.column(state).combine_chunks()
+        # Counts and sums add up; min / max of the partial minima / maxima
+        result[state] = group_sum(ids, num_groups, values) if function in ('count', 'sum') \
+            else group_extreme(function, ids, num_groups, values)
+    return pa.table(result)
+
+
+def finish(partial, keys, aggregates, labels):
+    """Final GROUP BY table: key columns + one column per aggregate, sorted by the keys."""
+    result = {name: partial.column(name) for name in keys}
+    for label, (function, column) in zip(labels, aggregates):
+        if column is None:
+            result[label] = partial.column('count(*)')
+            continue
+        non_null = partial.column(f'non_null({column})')
+        if function == 'count':
+            result[label] = non_null
+        elif function in ('min', 'max'):
+            result[label] = partial.column(f'{function}({column})')
+        else:
+            total = partial.column(f'sum({column})')
+            if function == 'avg':
+                total = pc.divide(pc.cast(total, pa.float64()), pc.cast(non_null, pa.float64()))
+            result[label] = pc.if_else(pc.greater(non_null, 0), total, pa.scalar(None, total.type))
+    table = pa.table(result)
+    return table.sort_by([(name, 'ascending') for name in keys]) if keys else table
+
+
+# --- Inputs ---
+
+def file_format(path):
+    with open(path, 'rb') as f:
+        magic = f.read(len(COLUMNAR_MAGIC))
+    if magic == COLUMNAR_MAGIC:
+        return 'mycol'
+    if magic[:4] == b'PAR1':
+        return 'parquet'
+    raise ValueError(f"'{path}' is neither a MYCOL1 nor a Parquet file.")
+
+
+def file_schema(path):
+    """({column: 'int' | 'float' | 'string'}, number of row groups) of a MYCOL1 or Parquet file."""
+    if file_format(path) == 'mycol':
+        with open(path, 'rb') as f:
+            metadata = read_footer(f)
+        return dict(tuple(col) for col in metadata['columns']), len(metadata['row_groups'])
+    parquet_file = pq.ParquetFile(path)
+    col_types = {}
+    for field in parquet_file.schema_arrow:
+        col_types[field.name] = next((name for name, test in ARROW_COL_TYPES.items() if test(field.type)), 'string')
+    return col_types, parquet_file.num_row_groups
+
+
+def read_row_group(path, rg_index, columns):
+    """The given columns of one row group as an Arrow table."""
+    if file_format(path) == 'parquet':
+        return pq.ParquetFile(path).read_row_group(rg_index, columns=columns)
+    with open(path, 'rb') as f:
+        metadata = read_footer(f)
+        rg = metadata['row_groups'][rg_index]
+        col_types = dict(tuple(col) for col in metadata['columns'])
+        chunks = read_chunks(f, [rg['column_chunks'][name] for name in columns])
+    num_rows = rg['num_rows_in_group']
+    return pa.table({name: chunk_to_arrow(col_types[name], chunk, num_rows) for name, chunk in zip(columns, chunks)})
+
+
+def row_group_partial(path, rg_index, keys, aggregates):
+    """Worker task: read one row group and aggregate it."""
+    columns = list(dict.fromkeys(keys + [column for _, column in aggregates if column is not None]))
+    with tracing.span('read', row_group=rg_index):
+        table = read_row_group(path, rg_index, columns)
+    with tracing.span('aggregate', row_group=rg_index, rows=table.num_rows):
+        return partial_aggregate(table, keys, aggregates)
+
+
+# --- Query ---
+
+def group_by(paths, keys, aggregates, workers=1):
+    """
+    GROUP BY `keys` over one or more MYCOL1 / Parquet files with the same columns.
+    aggregates: texts such as 'sum(value)', 'count(*)', 'min(status)'.
+    Row groups are aggregated in up to `workers` processes and their partials merged.
+    Returns (pyarrow.Table, report).
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    col_types, _ = file_schema(paths[0])
+    for name in keys:
+        if name not in col_types:
+            raise ValueError(f"Unknown GROUP BY column: {name!r}")
+    parsed = [parse_aggregate(text, col_types) for text in aggregates]
+    tasks = [(path, rg_index) for path in paths for rg_index in range(file_schema(path)[1])]
+
+    report = {'files': len(paths), 'row_groups': len(tasks), 'partial_groups': 0, 'workers': workers}
+    pending = []
+    merged = []
+
+    def collect(partial):
+        report['partial_groups'] += partial.num_rows
+        pending.append(partial)
+        if len(pending) >= MERGE_BATCH:
+            merged.append(merge_partials(merged[-1:] + pending, keys, parsed))
+            del merged[:-1]
+            pending.clear()
+
+    if workers <= 1:
+        for path, rg_index in tasks:
+            collect(row_group_partial(path, rg_index, keys, parsed))
+    else:
+        # Fork avoids re-importing the calling script in the workers where it is available
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            futures = [executor.submit(row_group_partial, path, rg_index, keys, parsed) for path, rg_index in tasks]
+            for future in concurrent.futures.as_completed(futures):
+                collect(future.result())
+
+    if not merged and not pending: # No row groups at all: aggregate an empty table of the right types
+        columns = list(dict.fromkeys(keys + [column for _, column in parsed if column is not None]))
+        collect(partial_aggregate(pa.table({name: pa.array([], ARROW_TYPES[col_types[name]]) for name in columns}), keys, parsed))
+    with tracing.span('aggregate', merge=True):
+        result = merge_partials(merged + pending, keys, parsed)
+    report['groups'] = result.num_rows
+    return finish(result, keys, parsed, aggregates), report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Vectorized GROUP BY over MYCOL1 or Parquet files.")
+    parser.add_argument('files', nargs='*', default=[columnar_binary_file])
+    parser.add_argument('--by', default=','.join(default_keys), help="Comma separated key columns, e.g. status,category")
+    parser.add_argument('--agg', action='append', default=None, help="Aggregate such as 'sum(value)'. Repeatable.")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--compare-scans', action='store_true',
+                        help="Also answer every group with its own filtered scan (MYCOL1, one file) and check the results.")
+    args = parser.parse_args()
+
+    for path in args.files:
+        if not os.path.exists(path):
+            print(f"Error: {path} not found. Run main.py (steps 1-3) first.")
+            raise SystemExit(1)
+
+    keys = [name for name in args.by.split(',') if name]
+    aggregate_texts = args.agg or default_aggregates
+    print(f"\n--- SELECT {', '.join(keys + aggregate_texts)} GROUP BY {', '.join(keys)} ---")
+    start_time = time.time()
+    result, report = group_by(args.files, keys, aggregate_texts, args.workers)
+    duration = time.time() - start_time
+    print(result.to_pandas().to_string(index=False, max_rows=60))
+    print(f"\n   {report.get('groups', 0)} groups from {report['row_groups']} row groups in {len(args.files)} file(s) "
+          f"({report['partial_groups']} partial groups merged, {args.workers} workers)")
+    print(f"   Time taken: {duration * 1000:.2f} ms")
+
+    if args.compare_scans:
+        path = args.files[0]
+        col_types, _ = file_schema(path)
+        parsed = [parse_aggregate(text, col_types) for text in aggregate_texts]
+        start_time = time.time()
+        mismatches = 0
+        for row in result.to_pylist():
+            if any(row[name] is None for name in keys):
+                continue # '=' never matches null keys
+            values, _ = aggregate_columnar_file(path, parsed, [(name, '=', row[name]) for name in keys])
+            for text, key in zip(aggregate_texts, parsed):
+                expected, actual = values[key], row[text]
+                if expected != actual and not (isinstance(expected, float) and abs(expected - actual) <= 1e-9 * max(1.0, abs(expected))):
+                    mismatches += 1
+        duration = time.time() - start_time
+        print(f"   One filtered scan per group: {result.num_rows} scans in {duration * 1000:.2f} ms, {mismatches} mismatching values")
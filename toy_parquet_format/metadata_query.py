@@ -0,0 +1,310 @@
+import argparse
+import os
+import re
+import time
+
+import numpy as np
+import pyarrow.compute as pc
+
+import hll
+import tracing
+from mycol import read_chunk, read_footer, read_sketch
+from selection import ChunkView, parse_predicate, zone_covers, zone_may_match
+
+# --- Metadata-Only Aggregates ---
+# The writer stores count / non_null / sum / min / max for every chunk in the footer, so
+# COUNT(*), MIN(col), MAX(col), SUM(col), AVG(col) over whole row groups need no data at all.
+# With a WHERE clause each row group is classified from the same footer numbers:
+#   excluded - some predicate cannot match any row  -> contributes nothing
+#   covered  - every predicate holds for every row  -> answered from the footer
+#   partial  - anything else                        -> only these row groups read data
+# Approximate COUNT(DISTINCT col) works the same way with the per-chunk HyperLogLog sketches
+# (hll.py): sketches of covered row groups, across any number of files, merge without reading data.
+
+# --- Configuration ---
+columnar_binary_file = 'columnar_data.bin' # Written by main.py (Step 3)
+default_aggregates = ['count(*)', 'min(timestamp_ms)', 'max(id)', 'sum(value)']
+
+AGGREGATE_PATTERN = re.compile(r'^\s*(count|min|max|sum|avg)\s*\(\s*(\*|\w+)\s*\)\s*$', re.IGNORECASE)
+
+
+def parse_aggregate(text, col_types):
+    """'count(*)', 'max(id)', 'avg(value)' -> (function, column or None)."""
+    match = AGGREGATE_PATTERN.match(text)
+    if not match:
+        raise ValueError(f"Cannot parse aggregate: {text!r}")
+    function, column = match.group(1).lower(), match.group(2)
+    if column == '*':
+        if function != 'count':
+            raise ValueError(f"Only count(*) takes '*': {text!r}")
+        return function, None
+    if column not in col_types:
+        raise ValueError(f"Unknown column in aggregate: {column!r}")
+    if function in ('sum', 'avg') and col_types[column] == 'string':
+        raise ValueError(f"{function}() needs a numeric column: {column!r}")
+    return function, column
+
+
+def has_aggregates(chunk_info):
+    return 'count' in chunk_info
+
+
+def footer_partial(chunk_info, num_rows):
+    """Partial aggregate state of one chunk, straight from its footer entry."""
+    return {
+        'rows': num_rows,
+        'non_null': chunk_info['non_null'],
+        'sum': chunk_info.get('sum'),
+        'min': chunk_info['min'],
+        'max': chunk_info['max'],
+    }
+
+
+def data_partial(view, rows):
+    """Partial aggregate state of the selected rows of a chunk, computed from its data."""
+    values = view.materialize(rows)
+    min_max = pc.min_max(values)
+    return {
+        'rows': len(rows),
+        'non_null': len(values) - values.null_count,
+        'sum': pc.sum(values, min_count=0).as_py() if view.col_type != 'string' else None,
+        'min': min_max['min'].as_py(),
+        'max': min_max['max'].as_py(),
+    }
+
+
+def combine(state, partial):
+    if state is None:
+        return dict(partial)
+    state['rows'] += partial['rows']
+    state['non_null'] += partial['non_null']
+    if state['sum'] is not None and partial['sum'] is not None:
+        state['sum'] += partial['sum']
+    for key, pick in (('min', min), ('max', max)):
+        candidates = [v for v in (state[key], partial[key]) if v is not None]
+        state[key] = pick(candidates) if candidates else None
+    return state
+
+
+def finish(function, column, state, rows_matched):
+    if function == 'count':
+        return rows_matched if column is None else (state['non_null'] if state else 0)
+    if state is None or not state['non_null']:
+        return None
+    if function == 'avg':
+        return state['sum'] / state['non_null']
+    return state[function]
+
+
+def aggregate_columnar_file(path, aggregates, predicates=(), metadata=None, read=None, cache=None, file_id=None):
+    """
+    Evaluate aggregates (from parse_aggregate) over the rows matching the ANDed predicates
+    (from selection.parse_predicate). Row groups are answered from footer aggregates when the
+    predicates exclude or fully cover them; only partially matching ones (or chunks written
+    without aggregates) are read. `metadata`, `read`, `cache` and `file_id` are as in filter_columnar_file.
+    Returns ({aggregate: value}, report).
+    """
+    states, rows_matched, report = aggregate_columnar_states(path, aggregates, predicates, metadata, read, cache, file_id)
+    results = {
+        (function, column): finish(function, column, states.get(column), rows_matched)
+        for function, column in aggregates
+    }
+    return results, report
+
+
+def aggregate_columnar_states(path, aggregates, predicates=(), metadata=None, read=None, cache=None, file_id=None):
+    """
+    aggregate_columnar_file before finishing: ({column: partial state}, rows_matched, report).
+    States of several files merge with combine() (see dataset.py).
+    """
+    if read is None:
+        with open(path, 'rb') as f:
+            return aggregate_columnar_states(path, aggregates, predicates, metadata or read_footer(f), lambda info: read_chunk(f, info),
+                                             cache, cache.file_id(path, f.fileno()) if cache is not None else None)
+
+    report = {
+        'row_groups': 0,
+        'row_groups_excluded': 0,
+        'row_groups_from_metadata': 0,
+        'row_groups_scanned': 0,
+        'chunks_cached': 0,
+        'bytes_read': 0,
+    }
+    columns = list(dict.fromkeys(column for _, column in aggregates if column is not None))
+    states = {column: None for column in columns}
+    rows_matched = 0
+    if cache is not None and file_id is None:
+        raise ValueError("A chunk cache needs the file_id of the descriptor `read` reads from")
+
+    col_types = dict(tuple(col) for col in metadata['columns'])
+    for rg_index, rg_metadata in enumerate(metadata['row_groups']):
+        report['row_groups'] += 1
+        num_rows = rg_metadata['num_rows_in_group']
+        chunks = rg_metadata['column_chunks']
+
+        if not all(zone_may_match(chunks[p[0]], p) for p in predicates):
+            report['row_groups_excluded'] += 1
+            continue
+        covered = all(zone_covers(chunks[p[0]], p) for p in predicates)
+        if covered and all(has_aggregates(chunks[column]) for column in columns):
+            report['row_groups_from_metadata'] += 1
+            rows_matched += num_rows
+            for column in columns:
+                with tracing.span('aggregate', row_group=rg_index, column=column, rows=num_rows, footer=True):
+                    states[column] = combine(states[column], footer_partial(chunks[column], num_rows))
+            continue
+
+        # Partially matching row group: read the predicate and aggregate columns
+        report['row_groups_scanned'] += 1
+        views = {}
+
+        def chunk(name):
+            if name not in views:
+                view = cache.get((file_id, rg_index, name)) if cache is not None else None
+                if view is not None:
+                    report['chunks_cached'] += 1
+                else:
+                    with tracing.span('read', row_group=rg_index, column=name, bytes=chunks[name]['size']):
+                        chunk_bytes = read(chunks[name])
+                    report['bytes_read'] += chunks[name]['size']
+                    view = ChunkView(col_types[name], chunk_bytes, num_rows)
+                    if cache is not None:
+                        cache.put((file_id, rg_index, name), view)
+                views[name] = view
+            return views[name]
+
+        rows = np.arange(num_rows, dtype=np.int64)
+        if not covered:
+            for predicate in predicates:
+                view = chunk(predicate[0])
+                with tracing.span('filter', row_group=rg_index, column=predicate[0], rows=len(rows)):
+                    rows = view.filter(predicate, rows)
+                if not len(rows):
+                    break
+        rows_matched += len(rows)
+        if len(rows):
+            for column in columns:
+                view = chunk(column)
+                with tracing.span('aggregate', row_group=rg_index, column=column, rows=len(rows)):
+                    states[column] = combine(states[column], data_partial(view, rows))
+
+    report['rows_matched'] = rows_matched
+    return states, rows_matched, report
+
+
+def count_distinct(paths, column, predicates=()):
+    """
+    Approximate number of distinct non-null values of `column` over the rows matching the
+    ANDed predicates in one or more MYCOL1 files. Covered row groups contribute their stored
+    sketch; partially matching ones (or chunks written without a sketch) sketch the selected
+    rows from their data. Returns (estimate, report).
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    report = {
+        'files': len(paths),
+        'row_groups': 0,
+        'row_groups_excluded': 0,
+        'row_groups_from_metadata': 0,
+        'row_groups_scanned': 0,
+        'bytes_read': 0,
+    }
+    registers = hll.new_sketch()
+
+    for path in paths:
+        with open(path, 'rb') as f:
+            metadata = read_footer(f)
+            col_types = dict(tuple(col) for col in metadata['columns'])
+            if column not in col_types:
+                raise ValueError(f"Unknown column {column!r} in '{path}'")
+            for rg_index, rg_metadata in enumerate(metadata['row_groups']):
+                report['row_groups'] += 1
+                num_rows = rg_metadata['num_rows_in_group']
+                chunks = rg_metadata['column_chunks']
+
+                if not all(zone_may_match(chunks[p[0]], p) for p in predicates):
+                    report['row_groups_excluded'] += 1
+                    continue
+                covered = all(zone_covers(chunks[p[0]], p) for p in predicates)
+                if covered and 'hll' in chunks[column]:
+                    report['row_groups_from_metadata'] += 1
+                    report['bytes_read'] += chunks[column]['hll']['size']
+                    with tracing.span('aggregate', row_group=rg_index, column=column, sketch=True):
+                        np.maximum(registers, read_sketch(f, chunks[column]), out=registers)
+                    continue
+
+                report['row_groups_scanned'] += 1
+                views = {}
+
+                def chunk(name):
+                    if name not in views:
+                        with tracing.span('read', row_group=rg_index, column=name, bytes=chunks[name]['size']):
+                            chunk_bytes = read_chunk(f, chunks[name])
+                        report['bytes_read'] += chunks[name]['size']
+                        views[name] = ChunkView(col_types[name], chunk_bytes, num_rows)
+                    return views[name]
+
+                rows = np.arange(num_rows, dtype=np.int64)
+                if not covered:
+                    for predicate in predicates:
+                        view = chunk(predicate[0])
+                        with tracing.span('filter', row_group=rg_index, column=predicate[0], rows=len(rows)):
+                            rows = view.filter(predicate, rows)
+                        if not len(rows):
+                            break
+                if len(rows):
+                    view = chunk(column)
+                    with tracing.span('aggregate', row_group=rg_index, column=column, rows=len(rows)):
+                        hll.add_hashes(registers, hll.hash_values(view.materialize(rows)))
+
+    return hll.estimate(registers), report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="COUNT/MIN/MAX/SUM/AVG over a MYCOL1 file, from footer metadata where possible.")
+    parser.add_argument('files', nargs='*', default=[columnar_binary_file])
+    parser.add_argument('--agg', action='append', default=None, help="Aggregate such as 'count(*)', 'max(id)'. Repeatable.")
+    parser.add_argument('--distinct', action='append', default=[],
+                        help="Column for an approximate COUNT(DISTINCT) over all given files. Repeatable.")
+    parser.add_argument('--where', action='append', default=[], help="Predicate such as 'status = FAILED'. Repeat to AND.")
+    args = parser.parse_args()
+
+    for path in args.files:
+        if not os.path.exists(path):
+            print(f"Error: {path} not found. Run main.py (steps 1-3) first.")
+            raise SystemExit(1)
+
+    with open(args.files[0], 'rb') as f:
+        col_types = dict(tuple(col) for col in read_footer(f)['columns'])
+    predicates = [parse_predicate(text, col_types) for text in args.where]
+
+    if args.distinct:
+        print(f"\n--- Approximate distinct counts on {', '.join(repr(path) for path in args.files)} ---")
+        print(f"   Where: {' AND '.join(args.where) or '(none)'}")
+        for column in args.distinct:
+            start_time = time.time()
+            distinct, report = count_distinct(args.files, column, predicates)
+            duration = time.time() - start_time
+            print(f"   count_distinct({column}): ~{distinct:,.0f}")
+            print(f"      Row groups: {report['row_groups']} total, {report['row_groups_excluded']} excluded, "
+                  f"{report['row_groups_from_metadata']} from sketches, {report['row_groups_scanned']} scanned")
+            print(f"      Bytes read: {report['bytes_read']}, time taken: {duration * 1000:.2f} ms")
+        if not args.agg:
+            raise SystemExit(0)
+
+    path = args.files[0]
+    aggregate_texts = args.agg or default_aggregates
+    aggregates = [parse_aggregate(text, col_types) for text in aggregate_texts]
+
+    print(f"\n--- Aggregates on '{path}' ---")
+    print(f"   Where: {' AND '.join(args.where) or '(none)'}")
+    start_time = time.time()
+    results, report = aggregate_columnar_file(path, aggregates, predicates)
+    duration = time.time() - start_time
+
+    for text, key in zip(aggregate_texts, aggregates):
+        print(f"   {text}: {results[key]}")
+    print(f"   Row groups: {report['row_groups']} total, {report['row_groups_excluded']} excluded, "
+          f"{report['row_groups_from_metadata']} answered from the footer, {report['row_groups_scanned']} scanned")
+    print(f"   Bytes of data read: {report['bytes_read']}")
+    print(f"   Time taken: {duration * 1000:.2f} ms")
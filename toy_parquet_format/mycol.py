@@ -0,0 +1,1037 @@
+import collections
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+import hll
+import tracing
+from range_reads import DEFAULT_MAX_GAP, DEFAULT_MAX_READ_SIZE, read_ranges
+
+# --- MYCOL1: our toy columnar file format ---
+# [ 'MYCOL1' ]
+# [ Row Group 1: column chunk 1 ... column chunk M ]
+# ...
+# [ Row Group P ]
+# [ Footer: metadata JSON ]
+# [ 8-byte offset of the footer JSON ][ 'MYCOLF' ]
+#
+# Column chunks use the same per-value encodings as the row-oriented binary file:
+# int = '<q', float = '<d', string = '<i' length prefix + UTF-8 bytes (-1 length = null).
+# Optionally (recorded per chunk in the footer) float chunks are stored byte-stream-split,
+# string chunks delta-length or front coded, and chunks are compressed; see "Chunk Storage" below.
+
+COLUMNAR_MAGIC = b'MYCOL1' # Simple 6-byte magic number
+FOOTER_MAGIC = b'MYCOLF'   # Footer magic number
+FOOTER_POINTER_SIZE = 8 + len(FOOTER_MAGIC)
+
+INT_NULL = -999999999999999999 # Simple placeholder for null int
+FLOAT_NULL_BYTES = b'\x00' * 8 # Simple placeholder for null float (not robust: 0.0 reads back as None)
+FIXED_WIDTH = {'int': 8, 'float': 8}
+LENGTH_PREFIX = struct.Struct('<i')
+EMPTY_BINARY = pa.scalar(b'', pa.large_binary()) # Separator / filler for large_binary joins
+
+
+# --- Helper Functions for Binary Encoding/Decoding ---
+
+# Simple length-prefixed string encoding
+def encode_string(s):
+    if s is None:
+        return struct.pack('<i', -1) # Use -1 length for None/null
+    s_bytes = s.encode('utf-8')
+    return struct.pack('<i', len(s_bytes)) + s_bytes
+
+def decode_string(f):
+    length = struct.unpack('<i', f.read(4))[0]
+    if length == -1:
+        return None
+    return f.read(length).decode('utf-8')
+
+# Simple float encoding/decoding (double precision)
+def encode_float(f_val):
+    if f_val is None:
+         # Represent None/null for float - using NaN or a specific large/small number is common
+         # For simplicity, let's use a specific pattern like packing a specific integer
+         # A more robust way involves a separate null mask bit, but let's keep it simple
+         # We'll just return a specific byte pattern that's unlikely for a float
+         return FLOAT_NULL_BYTES # Simple placeholder, not robust null handling
+    try:
+        return struct.pack('<d', float(f_val))
+    except (ValueError, TypeError):
+         return FLOAT_NULL_BYTES # Handle non-numeric input during encoding
+
+def decode_float(f):
+    bytes_val = f.read(8)
+    if bytes_val == FLOAT_NULL_BYTES: # Check for our simple null placeholder
+        return None
+    return struct.unpack('<d', bytes_val)[0]
+
+# Simple int encoding/decoding (signed long long)
+def encode_int(i_val):
+     if i_val is None:
+         return struct.pack('<q', INT_NULL) # Simple placeholder for null int
+     try:
+        return struct.pack('<q', int(i_val))
+     except (ValueError, TypeError):
+         return struct.pack('<q', INT_NULL) # Handle non-numeric input
+
+def decode_int(f):
+    bytes_val = f.read(8)
+    val = struct.unpack('<q', bytes_val)[0]
+    if val == INT_NULL: # Check for our simple null placeholder
+        return None
+    return val
+
+# Map types to encoder/decoder functions
+encoders = {
+    'string': encode_string,
+    'float': encode_float,
+    'int': encode_int
+}
+
+decoders = {
+    'string': decode_string,
+    'float': decode_float,
+    'int': decode_int
+}
+
+
+# --- Vectorized Column Chunk Encoding ---
+# Whole chunks are encoded with NumPy / Arrow kernels instead of one struct.pack per value.
+# The bytes are identical to concatenating encoders[col_type](value) for every value.
+
+def length_prefixes(lengths):
+    """int32 lengths -> Arrow binary array of 4-byte little-endian prefixes (no copy of the ints)."""
+    lengths = np.ascontiguousarray(lengths, dtype='<i4')
+    prefixes = pa.FixedSizeBinaryArray.from_buffers(pa.binary(4), len(lengths), [None, pa.py_buffer(lengths)])
+    return prefixes.cast(pa.large_binary())
+
+
+def joined_data(array):
+    """The contiguous data bytes of a (large_)binary/string Arrow array, honouring slicing."""
+    offsets_buffer, data_buffer = array.buffers()[1], array.buffers()[2]
+    offset_dtype = '<i8' if pa.types.is_large_binary(array.type) or pa.types.is_large_string(array.type) else '<i4'
+    offsets = np.frombuffer(offsets_buffer, dtype=offset_dtype)[array.offset:array.offset + len(array) + 1]
+    if data_buffer is None:
+        return b''
+    return data_buffer[int(offsets[0]):int(offsets[-1])]
+
+
+def encode_string_chunk(values):
+    """Length-prefixed strings for a whole chunk. `values` is an Arrow string array or a list of str/None."""
+    if not isinstance(values, (pa.Array, pa.ChunkedArray)):
+        values = pa.array(values, pa.string())
+    if isinstance(values, pa.ChunkedArray):
+        values = values.combine_chunks()
+    values = values.cast(pa.large_binary())
+    is_null = values.is_null()
+    lengths = pc.binary_length(values).fill_null(-1).to_numpy(zero_copy_only=False)
+    data = pc.if_else(is_null, EMPTY_BINARY, values) if values.null_count else values
+    # Glue each prefix to its value; the data buffer of the result is the encoded chunk
+    encoded = pc.binary_join_element_wise(length_prefixes(lengths), data, EMPTY_BINARY)
+    return joined_data(encoded)
+
+
+def encode_int_chunk(values):
+    if isinstance(values, (pa.Array, pa.ChunkedArray)):
+        values = values.fill_null(INT_NULL).to_numpy()
+    return np.ascontiguousarray(values, dtype='<i8').tobytes()
+
+
+def encode_float_chunk(values):
+    if isinstance(values, (pa.Array, pa.ChunkedArray)):
+        values = values.fill_null(0.0).to_numpy() # 0.0 is the (lossy) float null placeholder
+    return np.ascontiguousarray(values, dtype='<f8').tobytes()
+
+
+chunk_encoders = {
+    'string': encode_string_chunk,
+    'float': encode_float_chunk,
+    'int': encode_int_chunk
+}
+
+
+def encode_chunk(col_type, values):
+    return bytes(chunk_encoders[col_type](values))
+
+
+def decode_chunk(col_type, chunk_bytes, num_rows):
+    """
+    Decode a whole column chunk. int/float -> NumPy array (zero-copy view of chunk_bytes),
+    string -> list of str/None.
+    """
+    if col_type == 'int':
+        return np.frombuffer(chunk_bytes, dtype='<i8', count=num_rows)
+    if col_type == 'float':
+        return np.frombuffer(chunk_bytes, dtype='<f8', count=num_rows)
+    values = []
+    pos = 0
+    view = memoryview(chunk_bytes)
+    for _ in range(num_rows):
+        length = struct.unpack_from('<i', chunk_bytes, pos)[0]
+        pos += 4
+        if length == -1:
+            values.append(None)
+        else:
+            values.append(str(view[pos:pos + length], 'utf-8'))
+            pos += length
+    return values
+
+
+class PlainStrings(bytes):
+    """Plain string chunk bytes built by join_strings, keeping the (lengths, offsets, data) they came from."""
+    strings = None
+
+
+def string_positions(chunk_bytes, num_rows):
+    """Start of each string's bytes and its length (-1 = null), found by walking the length prefixes."""
+    if getattr(chunk_bytes, 'strings', None) is not None:
+        lengths, offsets, _ = chunk_bytes.strings
+        return offsets[:-1] + LENGTH_PREFIX.size * np.arange(1, num_rows + 1), lengths
+    starts = []
+    lengths = []
+    pos = 0
+    for _ in range(num_rows):
+        length = LENGTH_PREFIX.unpack_from(chunk_bytes, pos)[0]
+        pos += 4
+        starts.append(pos)
+        lengths.append(length)
+        if length > 0:
+            pos += length
+    return np.array(starts, dtype=np.int64), np.array(lengths, dtype=np.int64)
+
+
+def split_strings(chunk_bytes, num_rows):
+    """
+    (lengths, offsets, data) of a plain string chunk: lengths with -1 for nulls, Arrow-style
+    offsets (nulls are empty) and the value bytes without their prefixes as a uint8 array.
+    """
+    if getattr(chunk_bytes, 'strings', None) is not None:
+        return chunk_bytes.strings
+    starts, lengths = string_positions(chunk_bytes, num_rows)
+    sizes = np.where(lengths >= 0, lengths, 0)
+    offsets = np.zeros(num_rows + 1, dtype=np.int64)
+    np.cumsum(sizes, out=offsets[1:])
+    # Byte positions of every value byte in the chunk, i.e. the chunk minus the length prefixes
+    value_positions = np.repeat(starts - offsets[:-1], sizes) + np.arange(offsets[-1])
+    return lengths, offsets, np.frombuffer(chunk_bytes, dtype=np.uint8)[value_positions]
+
+
+def join_strings(lengths, offsets, data):
+    """Inverse of split_strings: the plain chunk bytes, as a PlainStrings that split_strings returns as is."""
+    num_rows = len(lengths)
+    starts = offsets[:-1] + LENGTH_PREFIX.size * np.arange(1, num_rows + 1)
+    chunk = np.empty(int(offsets[-1]) + LENGTH_PREFIX.size * num_rows, dtype=np.uint8)
+    prefix_positions = (starts - LENGTH_PREFIX.size)[:, None] + np.arange(LENGTH_PREFIX.size)
+    chunk[prefix_positions] = np.ascontiguousarray(lengths, dtype='<i4').view(np.uint8).reshape(-1, LENGTH_PREFIX.size)
+    chunk[np.repeat(starts - offsets[:-1], np.diff(offsets)) + np.arange(offsets[-1])] = data
+    chunk = PlainStrings(chunk.tobytes())
+    chunk.strings = (np.asarray(lengths, dtype=np.int64), offsets, data)
+    return chunk
+
+
+# --- Chunk Storage ---
+# A chunk's plain bytes (above) may be transformed before they hit the file:
+#   'encoding': 'byte_stream_split' (float chunks) - byte 0 of every value, then byte 1, ...
+#       Exponent and high mantissa bytes of similar doubles are alike, so after the split each
+#       stream is far more repetitive and compresses better; the size itself is unchanged.
+#   'encoding': 'delta_length' (string chunks) - all lengths, packed as narrow unsigned ints,
+#       then all value bytes: no 4-byte prefix per value, and alike bytes sit together.
+#   'encoding': 'delta_prefix' (string chunks) - front coding: per value the length of the
+#       prefix it shares with the previous value, the rest of its length, then only the
+#       unshared suffix bytes. Pays off for sorted or templated values ('data_col_0_17_YY').
+#   'codec': 'zlib' - the (possibly re-encoded) bytes are compressed; 'size' is the stored size.
+# These keys are absent for plain chunks. Readers call load_chunk on what they read, so all
+# decoding downstream keeps working on plain bytes (rebuilt with vectorized gathers; string
+# chunks rebuilt this way keep their split form, so decoding them skips the prefix walk).
+# The 'auto' string encoding picks, per chunk, whichever of plain / delta_length / delta_prefix
+# (plus the codec) is smallest on a sample of the chunk's rows.
+
+FLOAT_ENCODINGS = ('plain', 'byte_stream_split')
+STRING_ENCODINGS = ('plain', 'delta_length', 'delta_prefix', 'auto')
+CODECS = {
+    'zlib': (lambda data: zlib.compress(data, 6), zlib.decompress),
+}
+UINT_HEADER = struct.Struct('<BI') # Byte width, count of a packed unsigned int array
+SAMPLE_RUNS = 4                    # 'auto': runs of consecutive rows sampled per chunk...
+SAMPLE_RUN_ROWS = 256              # ...and rows per run (front coding needs neighbours)
+
+
+def byte_stream_split(chunk_bytes, width=FIXED_WIDTH['float']):
+    """Values of `width` bytes -> all their byte 0s, then all byte 1s, ..."""
+    return np.frombuffer(chunk_bytes, dtype=np.uint8).reshape(-1, width).T.tobytes()
+
+
+def byte_stream_merge(chunk_bytes, width=FIXED_WIDTH['float']):
+    """Inverse of byte_stream_split."""
+    return np.frombuffer(chunk_bytes, dtype=np.uint8).reshape(width, -1).T.tobytes()
+
+
+def pack_uints(values):
+    """Non-negative ints as the narrowest of uint8 / 16 / 32 / 64 that holds them, after a UINT_HEADER."""
+    values = np.asarray(values, dtype=np.int64)
+    top = int(values.max()) if len(values) else 0
+    width = next(width for width in (1, 2, 4, 8) if top < 1 << (8 * width))
+    return UINT_HEADER.pack(width, len(values)) + values.astype(f'<u{width}').tobytes()
+
+
+def unpack_uints(data, pos=0):
+    """(int64 values, position after them) of a pack_uints array starting at pos."""
+    width, count = UINT_HEADER.unpack_from(data, pos)
+    pos += UINT_HEADER.size
+    values = np.frombuffer(data, dtype=f'<u{width}', count=count, offset=pos).astype(np.int64)
+    return values, pos + width * count
+
+
+def encode_delta_length(lengths, offsets, data):
+    return pack_uints(lengths + 1) + data.tobytes() # +1 makes the null length -1 a 0
+
+
+def decode_delta_length(chunk):
+    lengths, pos = unpack_uints(chunk)
+    lengths -= 1
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(np.maximum(lengths, 0), out=offsets[1:])
+    return lengths, offsets, np.frombuffer(chunk, dtype=np.uint8, offset=pos)
+
+
+def common_prefix_lengths(offsets, data):
+    """Bytes each value shares with the start of the previous one (nulls count as empty)."""
+    sizes = np.diff(offsets)
+    prefixes = np.zeros(len(sizes), dtype=np.int64)
+    limits = np.minimum(sizes[:-1], sizes[1:]) # limits[i - 1] caps the prefix of value i
+    rows = np.flatnonzero(limits > 0) + 1
+    position = 0
+    while rows.size: # One byte position per pass, over the values still matching
+        rows = rows[data[offsets[rows - 1] + position] == data[offsets[rows] + position]]
+        position += 1
+        prefixes[rows] = position
+        rows = rows[limits[rows - 1] > position]
+    return prefixes
+
+
+def encode_delta_prefix(lengths, offsets, data):
+    prefixes = common_prefix_lengths(offsets, data)
+    suffix_sizes = np.diff(offsets) - prefixes
+    suffix_offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(suffix_sizes, out=suffix_offsets[1:])
+    suffix_positions = np.repeat(offsets[:-1] + prefixes - suffix_offsets[:-1], suffix_sizes) + np.arange(suffix_offsets[-1])
+    suffix_codes = np.where(lengths >= 0, suffix_sizes + 1, 0) # 0 = null
+    return pack_uints(prefixes) + pack_uints(suffix_codes) + data[suffix_positions].tobytes()
+
+
+def decode_delta_prefix(chunk):
+    prefixes, pos = unpack_uints(chunk)
+    suffix_codes, pos = unpack_uints(chunk, pos)
+    suffix_sizes = np.maximum(suffix_codes - 1, 0)
+    lengths = np.where(suffix_codes > 0, prefixes + suffix_sizes, -1)
+    offsets = np.zeros(len(prefixes) + 1, dtype=np.int64)
+    np.cumsum(prefixes + suffix_sizes, out=offsets[1:])
+    suffix_offsets = np.zeros(len(prefixes) + 1, dtype=np.int64)
+    np.cumsum(suffix_sizes, out=suffix_offsets[1:])
+    data = np.empty(offsets[-1], dtype=np.uint8)
+    data[np.repeat(offsets[:-1] + prefixes - suffix_offsets[:-1], suffix_sizes) + np.arange(suffix_offsets[-1])] = \
+        np.frombuffer(chunk, dtype=np.uint8, offset=pos)
+    # Byte j of a value with a longer shared prefix comes from the last value at or before it
+    # whose suffix wrote byte j (prefix <= j); fill one byte position at a time
+    rows = np.arange(len(prefixes))
+    for position in range(int(prefixes.max(initial=0))):
+        sources = np.maximum.accumulate(np.where(prefixes <= position, rows, 0))
+        shared = np.flatnonzero(prefixes > position)
+        data[offsets[shared] + position] = data[offsets[sources[shared]] + position]
+    return lengths, offsets, data
+
+
+STRING_CODERS = {
+    'plain': (join_strings, None),
+    'delta_length': (encode_delta_length, decode_delta_length),
+    'delta_prefix': (encode_delta_prefix, decode_delta_prefix),
+}
+
+
+def sample_strings(strings, num_runs=SAMPLE_RUNS, run_rows=SAMPLE_RUN_ROWS):
+    """(lengths, offsets, data) of `num_runs` evenly spaced runs of consecutive rows."""
+    lengths, offsets, data = strings
+    run_rows = min(run_rows, len(lengths))
+    run_starts = np.unique(np.linspace(0, len(lengths) - run_rows, num_runs).astype(np.int64))
+    rows = (run_starts[:, None] + np.arange(run_rows)).ravel()
+    sizes = np.diff(offsets)[rows]
+    sample_offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(sizes, out=sample_offsets[1:])
+    positions = np.repeat(offsets[rows] - sample_offsets[:-1], sizes) + np.arange(sample_offsets[-1])
+    return lengths[rows], sample_offsets, data[positions]
+
+
+def choose_string_encoding(strings, codec=None):
+    """The string encoding whose stored sample (after the codec) is smallest; ties favour plain."""
+    sample = sample_strings(strings)
+    compress = CODECS[codec][0] if codec is not None else bytes
+    sizes = {encoding: len(compress(encode(*sample))) for encoding, (encode, _) in STRING_CODERS.items()}
+    return min(sizes, key=sizes.get)
+
+
+def store_chunk(col_type, chunk_bytes, num_rows, float_encoding='plain', codec=None, string_encoding='plain'):
+    """(stored bytes, footer fields describing the transformation) for a plain chunk."""
+    fields = {}
+    if col_type == 'float' and float_encoding == 'byte_stream_split':
+        chunk_bytes = byte_stream_split(chunk_bytes)
+        fields['encoding'] = float_encoding
+    if col_type == 'string' and string_encoding != 'plain' and num_rows:
+        strings = split_strings(chunk_bytes, num_rows)
+        if string_encoding == 'auto':
+            string_encoding = choose_string_encoding(strings, codec)
+        if string_encoding != 'plain':
+            chunk_bytes = STRING_CODERS[string_encoding][0](*strings)
+            fields['encoding'] = string_encoding
+    if codec is not None:
+        chunk_bytes = CODECS[codec][0](chunk_bytes)
+        fields['codec'] = codec
+    return chunk_bytes, fields
+
+
+def load_chunk(chunk_info, data):
+    """Plain chunk bytes from the stored ones: undo the codec, then the float / string encoding."""
+    codec = chunk_info.get('codec')
+    if codec is not None:
+        data = CODECS[codec][1](data)
+    encoding = chunk_info.get('encoding')
+    if encoding == 'byte_stream_split':
+        data = byte_stream_merge(data)
+    elif encoding in STRING_CODERS:
+        data = join_strings(*STRING_CODERS[encoding][1](data))
+    return data
+
+
+def storage_options(metadata):
+    """
+    (float_encoding, codec, string_encoding) used by a file's first row group, to write more
+    chunks alike. String chunks stored with different encodings mean the file was written 'auto'.
+    """
+    float_encoding, codec = 'plain', None
+    string_encodings = set()
+    for rg in metadata['row_groups'][:1]:
+        for name, col_type in metadata['columns']:
+            chunk_info = rg['column_chunks'].get(name, {})
+            float_encoding = chunk_info.get('encoding', float_encoding) if col_type == 'float' else float_encoding
+            if col_type == 'string':
+                string_encodings.add(chunk_info.get('encoding', 'plain'))
+            codec = chunk_info.get('codec', codec)
+    string_encoding = string_encodings.pop() if len(string_encodings) == 1 else ('auto' if string_encodings else 'plain')
+    return float_encoding, codec, string_encoding
+
+
+# --- Arrow Export ---
+# Fixed-width chunks already have Arrow's memory layout (little-endian int64 / float64 values
+# back to back), so they are wrapped with pa.py_buffer without copying; only a validity bitmap
+# is built when the chunk holds null placeholders. String chunks interleave length prefixes
+# with the bytes, so their data is compacted with one vectorized gather into Arrow offsets + data.
+
+ARROW_TYPES = {'int': pa.int64(), 'float': pa.float64(), 'string': pa.string()}
+
+
+def arrow_schema(column_definitions):
+    return pa.schema([(name, ARROW_TYPES[col_type]) for name, col_type in column_definitions])
+
+
+def validity_buffer(valid):
+    """Arrow validity bitmap for a boolean NumPy mask, or None when every value is valid."""
+    if valid.all():
+        return None
+    return pa.py_buffer(np.packbits(valid, bitorder='little'))
+
+
+def chunk_to_arrow(col_type, chunk_bytes, num_rows):
+    """One column chunk as a pyarrow Array (zero copy of the values for int/float chunks)."""
+    if col_type in FIXED_WIDTH:
+        dtype = '<i8' if col_type == 'int' else '<f8'
+        values = np.frombuffer(chunk_bytes, dtype=dtype, count=num_rows)
+        valid = values != INT_NULL if col_type == 'int' else values.view('<u8') != 0 # All-zero bytes = null placeholder
+        return pa.Array.from_buffers(ARROW_TYPES[col_type], num_rows, [validity_buffer(valid), pa.py_buffer(chunk_bytes)])
+
+    lengths, offsets, data = split_strings(chunk_bytes, num_rows)
+    return pa.Array.from_buffers(pa.large_string(), num_rows, [validity_buffer(lengths >= 0), pa.py_buffer(offsets), pa.py_buffer(data)]).cast(pa.string())
+
+
+def chunk_aggregates(col_type, chunk_bytes, num_rows, values=None):
+    """
+    Footer aggregates of a chunk as a reader will decode it: count, non_null, min, max and
+    (int/float) sum. `values`, the Arrow column a string chunk was encoded from, saves
+    re-parsing its length prefixes; fixed-width chunks are always viewed through their bytes
+    so the lossy float null placeholder is accounted for.
+    """
+    if col_type == 'string' and values is not None:
+        array = values
+    else:
+        array = chunk_to_arrow(col_type, chunk_bytes, num_rows)
+    min_max = pc.min_max(array)
+    aggregates = {
+        'count': num_rows,
+        'non_null': num_rows - array.null_count,
+        'min': min_max['min'].as_py(),
+        'max': min_max['max'].as_py(),
+    }
+    if col_type != 'string':
+        aggregates['sum'] = pc.sum(array, min_count=0).as_py()
+    return aggregates
+
+
+def chunk_sketch(col_type, chunk_bytes, num_rows, values=None):
+    """HyperLogLog registers (hll.py) of a chunk's non-null values; `values` as in chunk_aggregates."""
+    if col_type == 'string' and values is not None:
+        return hll.sketch_array(values)
+    return hll.sketch_array(chunk_to_arrow(col_type, chunk_bytes, num_rows))
+
+
+def merge_aggregates(stats):
+    """Aggregates covering several chunks, or {} if any chunk has none."""
+    if not stats or any('count' not in s for s in stats):
+        return {}
+    mins = [s['min'] for s in stats if s['min'] is not None]
+    maxes = [s['max'] for s in stats if s['max'] is not None]
+    merged = {
+        'count': sum(s['count'] for s in stats),
+        'non_null': sum(s['non_null'] for s in stats),
+        'min': min(mins) if mins else None,
+        'max': max(maxes) if maxes else None,
+    }
+    if all('sum' in s for s in stats):
+        merged['sum'] = sum(s['sum'] for s in stats)
+    return merged
+
+
+def row_group_to_batch(rg_metadata, chunks, column_definitions, schema=None):
+    """Build a RecordBatch from {col_name: chunk_bytes} for the given (name, type) columns."""
+    num_rows = rg_metadata['num_rows_in_group']
+    arrays = [chunk_to_arrow(col_type, chunks[name], num_rows) for name, col_type in column_definitions]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema or arrow_schema(column_definitions))
+
+
+# --- Writer ---
+
+class ColumnarWriter:
+    """
+    Incremental MYCOL1 writer: append already-encoded row groups, then close() writes the footer.
+
+        with ColumnarWriter(path, column_definitions) as writer:
+            writer.write_row_group(num_rows, {'id': b'...', 'status': b'...'})
+
+    ColumnarWriter.append(path) reopens an existing file to add row groups to it. Leaving the
+    `with` block by an exception calls abort() instead of close(), so no footer is written.
+    float_encoding / codec / string_encoding choose how chunks are stored (see store_chunk).
+    """
+
+    def __init__(self, path, column_definitions, sort_order=None, float_encoding='plain', codec=None,
+                 string_encoding='plain'):
+        if float_encoding not in FLOAT_ENCODINGS:
+            raise ValueError(f"Unknown float encoding {float_encoding!r}; expected one of {FLOAT_ENCODINGS}")
+        if string_encoding not in STRING_ENCODINGS:
+            raise ValueError(f"Unknown string encoding {string_encoding!r}; expected one of {STRING_ENCODINGS}")
+        if codec is not None and codec not in CODECS:
+            raise ValueError(f"Unknown codec {codec!r}; expected one of {sorted(CODECS)}")
+        self.path = path
+        self.float_encoding = float_encoding
+        self.codec = codec
+        self.string_encoding = string_encoding
+        self.column_definitions = [tuple(col) for col in column_definitions]
+        self.metadata = {
+            'num_rows': 0,
+            'num_cols': len(self.column_definitions),
+            'columns': self.column_definitions, # List of (name, type)
+            'row_groups': [] # List of row group metadata
+        }
+        if sort_order is not None:
+            # {'columns': [...], 'scope': 'file' | 'row_group'}: rows are sorted ascending (nulls last)
+            # by these columns across the whole file, or only within each row group
+            self.metadata['sort_order'] = sort_order
+        self.f = open(path, 'wb')
+        self.f.write(COLUMNAR_MAGIC)
+        self.current_offset = len(COLUMNAR_MAGIC) # Start offset after magic number
+        self.append_offset = None # End of the existing file when appending (see abort)
+
+    def write_table(self, table):
+        """Encode an Arrow table (columns named as in the schema) as one row group."""
+        chunks = {}
+        stats = {}
+        sketches = {}
+        for name, col_type in self.column_definitions:
+            column = table.column(name)
+            chunks[name] = encode_chunk(col_type, column)
+            stats[name] = chunk_aggregates(col_type, chunks[name], table.num_rows, column)
+            sketches[name] = chunk_sketch(col_type, chunks[name], table.num_rows, column)
+        return self.write_row_group(table.num_rows, chunks, stats, sketches)
+
+    def write_row_group(self, num_rows, encoded_chunks, chunk_stats=None, sketches=None):
+        """
+        encoded_chunks: {col_name: bytes}, written in schema order.
+        chunk_stats: {col_name: chunk_aggregates(...)} stored with each chunk in the footer
+        (count / non_null / sum / min / max); computed from the bytes for columns not given.
+        sketches: {col_name: chunk_sketch(...)} distinct-count registers, written after the
+        row group's chunks and referenced from the footer as 'hll': {'offset', 'size'};
+        computed from the bytes for columns not given.
+        """
+        chunk_stats = dict(chunk_stats or {})
+        sketches = dict(sketches or {})
+        stored_chunks = {}
+        for col_name, col_type in self.column_definitions:
+            chunk_bytes = encoded_chunks[col_name]
+            if not chunk_stats.get(col_name):
+                chunk_stats[col_name] = chunk_aggregates(col_type, chunk_bytes, num_rows)
+            if sketches.get(col_name) is None:
+                sketches[col_name] = chunk_sketch(col_type, chunk_bytes, num_rows)
+            stored_chunks[col_name] = store_chunk(col_type, chunk_bytes, num_rows, self.float_encoding, self.codec,
+                                                  self.string_encoding)
+        return self.write_stored_row_group(num_rows, stored_chunks, chunk_stats, sketches)
+
+    def write_stored_row_group(self, num_rows, stored_chunks, chunk_stats, sketches):
+        """Append a row group whose chunks already went through store_chunk: {col_name: (bytes, fields)}."""
+        rg_metadata = {
+            'num_rows_in_group': num_rows,
+            'column_chunks': {} # Map col_name -> {'offset': ..., 'size': ..., 'count': ..., 'non_null': ..., 'min': ..., ...}
+        }
+        for col_name, _ in self.column_definitions:
+            chunk_bytes, fields = stored_chunks[col_name]
+            rg_metadata['column_chunks'][col_name] = {'offset': self.current_offset, 'size': len(chunk_bytes), **fields, **chunk_stats[col_name]}
+            self.f.write(chunk_bytes)
+            self.current_offset += len(chunk_bytes)
+        for col_name, _ in self.column_definitions:
+            sketch_bytes = hll.to_bytes(sketches[col_name])
+            rg_metadata['column_chunks'][col_name]['hll'] = {'offset': self.current_offset, 'size': len(sketch_bytes)}
+            self.f.write(sketch_bytes)
+            self.current_offset += len(sketch_bytes)
+        self.metadata['row_groups'].append(rg_metadata)
+        self.metadata['num_rows'] += num_rows
+        return rg_metadata
+
+    @classmethod
+    def append(cls, path):
+        """
+        Reopen an existing MYCOL1 file for appending row groups.
+
+        The new row groups are written after the current end of the file, followed by a merged
+        footer and pointer. The old footer is never overwritten: until the new pointer is on
+        disk, the file still ends in a torn tail behind which the old footer is intact, and
+        recover() truncates back to it. Each append leaves its predecessor's footer behind as
+        dead bytes; compact() drops them.
+        """
+        writer = cls.__new__(cls)
+        writer.path = path
+        writer.f = open(path, 'r+b')
+        writer.metadata = read_footer(writer.f)
+        writer.metadata.pop('sort_order', None) # Appended rows are not part of the existing order
+        writer.float_encoding, writer.codec, writer.string_encoding = storage_options(writer.metadata)
+        writer.column_definitions = [tuple(col) for col in writer.metadata['columns']]
+        writer.metadata['columns'] = writer.column_definitions
+        writer.current_offset = writer.f.seek(0, os.SEEK_END)
+        writer.append_offset = writer.current_offset
+        return writer
+
+    def close(self):
+        if self.f is None:
+            return
+        metadata_json = json.dumps(self.metadata).encode('utf-8')
+        self.f.write(metadata_json)
+        # Row groups and footer JSON must be durable before the pointer that makes them the
+        # file's footer: a single fsync does not order the writes, so a crash could leave a
+        # valid-looking pointer in front of data that never reached the disk
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        self.f.write(struct.pack('<q', self.current_offset)) # Footer pointer (offset to metadata)
+        self.f.write(FOOTER_MAGIC)
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        self.f.close()
+        self.f = None
+
+    def abort(self):
+        """
+        Give up without writing a footer: an append is truncated back to where it started (the
+        old footer is the file's footer again), a new file is removed.
+        """
+        if self.f is None:
+            return
+        if self.append_offset is not None:
+            self.f.truncate(self.append_offset)
+            self.f.flush()
+            os.fsync(self.f.fileno())
+        self.f.close()
+        self.f = None
+        if self.append_offset is None:
+            os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+# --- Parallel Encoding ---
+# Encoding a row group is independent per column, so ParallelColumnarWriter fans the chunks out
+# to a process pool (encode_column, then store_chunk's re-encoding / compression, run in the
+# workers) while the calling thread remains the
+# only one writing: row groups are appended strictly in submission order, and only
+# `max_in_flight` of them may be queued or encoded-but-unwritten at once, which bounds memory.
+
+def encode_column(col_type, values, num_rows):
+    """(chunk bytes, footer aggregates, sketch) of one column chunk from an Arrow array."""
+    chunk_bytes = encode_chunk(col_type, values)
+    return (chunk_bytes, chunk_aggregates(col_type, chunk_bytes, num_rows, values),
+            chunk_sketch(col_type, chunk_bytes, num_rows, values))
+
+
+def encode_and_store(encode, col_type, values, num_rows, float_encoding, codec, string_encoding):
+    chunk_bytes, stats, sketch = encode(col_type, values, num_rows)
+    return store_chunk(col_type, chunk_bytes, num_rows, float_encoding, codec, string_encoding), stats, sketch
+
+
+class ParallelColumnarWriter(ColumnarWriter):
+    """
+    ColumnarWriter that encodes column chunks in worker processes.
+
+        with ParallelColumnarWriter(path, column_definitions, workers=8) as writer:
+            writer.write_table(table)
+            writer.write_columns(num_rows, {'id': [...], ...}) # Any values `encode` accepts
+
+    `encode(col_type, values, num_rows) -> (chunk_bytes, aggregates, sketch)` must be a
+    module-level function (it is pickled to the workers); it defaults to encode_column.
+    ParallelColumnarWriter.append(path, workers=...) appends to an existing file.
+    """
+
+    def __init__(self, path, column_definitions, sort_order=None, float_encoding='plain', codec=None,
+                 string_encoding='plain', workers=None, max_in_flight=2, encode=encode_column):
+        super().__init__(path, column_definitions, sort_order, float_encoding, codec, string_encoding)
+        self.start_workers(workers, max_in_flight, encode)
+
+    @classmethod
+    def append(cls, path, workers=None, max_in_flight=2, encode=encode_column):
+        writer = super().append(path)
+        writer.start_workers(workers, max_in_flight, encode)
+        return writer
+
+    def start_workers(self, workers, max_in_flight, encode):
+        self.encode = encode
+        self.max_in_flight = max(1, max_in_flight)
+        self.pending = collections.deque() # (num_rows, {col_name: future}) in file order
+        # Fork avoids re-importing the calling script in the workers where it is available
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+        self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1, mp_context=context)
+
+    def write_columns(self, num_rows, columns):
+        """Queue one row group ({col_name: values}) for encoding; blocks while too many are in flight."""
+        futures = {name: self.executor.submit(encode_and_store, self.encode, col_type, columns[name], num_rows,
+                                              self.float_encoding, self.codec, self.string_encoding)
+                   for name, col_type in self.column_definitions}
+        self.pending.append((num_rows, futures))
+        while len(self.pending) > self.max_in_flight:
+            self.write_next()
+
+    def write_table(self, table):
+        self.write_columns(table.num_rows, {name: table.column(name) for name, _ in self.column_definitions})
+
+    def write_next(self):
+        """Wait for the oldest queued row group and append it to the file."""
+        num_rows, futures = self.pending.popleft()
+        results = {name: future.result() for name, future in futures.items()}
+        return self.write_stored_row_group(num_rows, *({name: result[i] for name, result in results.items()} for i in range(3)))
+
+    def write_row_group(self, num_rows, encoded_chunks, chunk_stats=None, sketches=None):
+        self.flush() # Already encoded row groups go after the queued ones
+        return super().write_row_group(num_rows, encoded_chunks, chunk_stats, sketches)
+
+    def flush(self):
+        while self.pending:
+            self.write_next()
+
+    def close(self):
+        if self.f is None:
+            return
+        try:
+            self.flush()
+        except BaseException: # A row group that failed to encode must not end up behind a footer
+            self.abort()
+            raise
+        self.executor.shutdown()
+        super().close()
+
+    def abort(self):
+        if self.f is None:
+            return
+        self.executor.shutdown(cancel_futures=True)
+        super().abort()
+
+
+# --- Reader ---
+
+def read_footer(f):
+    """Read the metadata JSON of an open MYCOL1 file."""
+    with tracing.span('footer') as span:
+        f.seek(0, os.SEEK_END)
+        file_size = f.tell()
+        f.seek(-FOOTER_POINTER_SIZE, os.SEEK_END)
+        footer_offset = struct.unpack('<q', f.read(8))[0]
+        if f.read(len(FOOTER_MAGIC)) != FOOTER_MAGIC:
+            raise ValueError("Invalid footer magic number.")
+        f.seek(footer_offset, os.SEEK_SET)
+        metadata_bytes = f.read(file_size - footer_offset - FOOTER_POINTER_SIZE)
+        span.set(bytes=len(metadata_bytes))
+        return json.loads(metadata_bytes.decode('utf-8'))
+
+
+def read_chunk(f, chunk_info):
+    """Plain bytes of one chunk (see load_chunk)."""
+    f.seek(chunk_info['offset'], os.SEEK_SET)
+    return load_chunk(chunk_info, f.read(chunk_info['size']))
+
+
+def read_sketch(f, chunk_info):
+    """Distinct-count registers of a chunk, or None if it was written without a sketch."""
+    if 'hll' not in chunk_info:
+        return None
+    f.seek(chunk_info['hll']['offset'], os.SEEK_SET)
+    return hll.from_bytes(f.read(chunk_info['hll']['size']))
+
+
+def find_last_footer(f, block_size=1024 * 1024):
+    """
+    Scan backwards for the last complete footer (magic preceded by a pointer to parseable
+    metadata JSON). Returns (end_offset, metadata), or (None, None) if there is none.
+    """
+    file_size = f.seek(0, os.SEEK_END)
+    block_end = file_size
+    while block_end > len(COLUMNAR_MAGIC):
+        block_start = max(block_end - block_size, 0)
+        f.seek(block_start)
+        # Overlap the next block by the magic length so a magic split across blocks is found
+        block = f.read(min(block_end + len(FOOTER_MAGIC) - 1, file_size) - block_start)
+        position = block.rfind(FOOTER_MAGIC)
+        while position != -1:
+            magic_offset = block_start + position
+            pointer_offset = magic_offset - 8
+            if pointer_offset > len(COLUMNAR_MAGIC):
+                f.seek(pointer_offset)
+                footer_offset = struct.unpack('<q', f.read(8))[0]
+                if len(COLUMNAR_MAGIC) <= footer_offset < pointer_offset:
+                    f.seek(footer_offset)
+                    try:
+                        metadata = json.loads(f.read(pointer_offset - footer_offset).decode('utf-8'))
+                    except ValueError: # Chunk bytes that happen to contain the magic
+                        metadata = None
+                    if isinstance(metadata, dict) and 'row_groups' in metadata:
+                        return magic_offset + len(FOOTER_MAGIC), metadata
+            position = block.rfind(FOOTER_MAGIC, 0, position)
+        block_end = block_start
+    return None, None
+
+
+def recover(path):
+    """
+    Truncate a torn append back to the last complete footer.
+    Returns the number of bytes removed (0 if the file was intact).
+    """
+    with open(path, 'r+b') as f:
+        file_size = f.seek(0, os.SEEK_END)
+        end_offset, _ = find_last_footer(f)
+        if end_offset is None:
+            raise ValueError(f"No complete MYCOL1 footer found in '{path}'.")
+        if end_offset < file_size:
+            f.truncate(end_offset)
+            f.flush()
+            os.fsync(f.fileno())
+        return file_size - end_offset
+
+
+def compact(path, target_rows, output=None, float_encoding=None, codec=None, string_encoding=None):
+    """
+    Merge runs of consecutive small row groups into row groups of up to target_rows rows
+    (larger ones are kept as they are) and drop footers left behind by appends. Footer
+    aggregates and distinct-count sketches are merged (or recomputed from the bytes for chunks
+    written without them).
+    Plain chunks are value sequences, so merging is a byte concatenation per column (stored
+    chunks are loaded first, and re-stored with float_encoding / codec / string_encoding, by
+    default the file's own).
+    Writes to a temporary file and atomically replaces `output` (by default `path`, which may
+    also be given as `output`) with it. Returns (row_groups_before, row_groups_after).
+    """
+    output = output or path
+    destination = output + '.compact.tmp'
+    with open(path, 'rb') as f:
+        metadata = read_footer(f)
+        runs = []
+        for rg in metadata['row_groups']:
+            if runs and sum(r['num_rows_in_group'] for r in runs[-1]) + rg['num_rows_in_group'] <= target_rows:
+                runs[-1].append(rg)
+            else:
+                runs.append([rg])
+        sort_order = metadata.get('sort_order')
+        if sort_order and sort_order['scope'] != 'file' and any(len(run) > 1 for run in runs):
+            sort_order = None # Concatenating row groups that were sorted separately loses the order
+        file_float_encoding, file_codec, file_string_encoding = storage_options(metadata)
+        float_encoding = float_encoding or file_float_encoding
+        codec = file_codec if codec is None else (None if codec == 'none' else codec)
+        string_encoding = string_encoding or file_string_encoding
+        with ColumnarWriter(destination, metadata['columns'], sort_order, float_encoding, codec, string_encoding) as writer:
+            for run in runs:
+                chunks = {
+                    name: b''.join(read_chunk(f, rg['column_chunks'][name]) for rg in run)
+                    for name, _ in writer.column_definitions
+                }
+                stats = {
+                    name: merge_aggregates([rg['column_chunks'][name] for rg in run])
+                    for name, _ in writer.column_definitions
+                }
+                sketches = {}
+                for name, _ in writer.column_definitions:
+                    run_sketches = [read_sketch(f, rg['column_chunks'][name]) for rg in run]
+                    if all(registers is not None for registers in run_sketches):
+                        sketches[name] = hll.merge(run_sketches)
+                writer.write_row_group(sum(rg['num_rows_in_group'] for rg in run), chunks, stats, sketches)
+    os.replace(destination, output)
+    return len(metadata['row_groups']), len(runs)
+
+
+def read_chunks(f, chunk_infos, max_gap=DEFAULT_MAX_GAP, max_read_size=DEFAULT_MAX_READ_SIZE, stats=None):
+    """
+    Read several chunks with coalesced reads (see range_reads.py).
+    Returns the plain bytes of each chunk, in order: memoryviews for chunks stored plain.
+    """
+    views = read_ranges(f, [(info['offset'], info['size']) for info in chunk_infos], max_gap, max_read_size, stats)
+    return [load_chunk(info, view) for info, view in zip(chunk_infos, views)]
+
+
+# --- Read-ahead Reader ---
+# A plain reader alternates seek/read and decode. Here a background thread walks the footer
+# plan and reads the projected chunks of the next few row groups while the caller decodes
+# the current one, so (on slow disks / network filesystems) I/O latency hides behind CPU work.
+
+def iter_row_group_chunks(path, column_names, read_ahead=2, max_buffered_bytes=64 * 1024 * 1024,
+                          metadata=None, stats=None, max_gap=DEFAULT_MAX_GAP, max_read_size=DEFAULT_MAX_READ_SIZE):
+    """
+    Yield (rg_metadata, {col_name: chunk_view}) for every row group, in file order.
+    Chunks are memoryviews; the projected chunks of a row group are fetched with coalesced
+    reads (max_gap / max_read_size, see range_reads.py).
+
+    At most `read_ahead` row groups are read ahead of the caller, and at most
+    `max_buffered_bytes` of chunk data is held by the reader at once (a row group bigger than
+    the budget is still read, on its own). read_ahead=0 reads synchronously.
+    Columns missing from a row group are simply absent from its dict.
+    If `stats` is a dict it receives 'wait_seconds' (time the caller spent blocked on I/O)
+    plus the read_ranges counters: 'ranges', 'reads', 'bytes_requested', 'bytes_read'.
+    """
+    if metadata is None:
+        with open(path, 'rb') as f:
+            metadata = read_footer(f)
+    if stats is None:
+        stats = {}
+    stats.update(wait_seconds=0.0, ranges=0, reads=0, bytes_requested=0, bytes_read=0)
+    row_groups = metadata['row_groups']
+
+    def projected(rg):
+        return [(name, rg['column_chunks'][name]) for name in column_names if name in rg['column_chunks']]
+
+    def read_projected(f, rg_index, chunk_infos):
+        with tracing.span('read', row_group=rg_index, bytes=sum(info['size'] for _, info in chunk_infos)):
+            views = read_chunks(f, [info for _, info in chunk_infos], max_gap, max_read_size, stats)
+        for name, info in chunk_infos:
+            tracing.count('read', rg_index, name, bytes=info['size'])
+        return {name: view for (name, _), view in zip(chunk_infos, views)}
+
+    if read_ahead <= 0:
+        with open(path, 'rb') as f:
+            for rg_index, rg in enumerate(row_groups):
+                wait_start = time.perf_counter()
+                chunks = read_projected(f, rg_index, projected(rg))
+                stats['wait_seconds'] += time.perf_counter() - wait_start
+                yield rg, chunks
+        return
+
+    ready = queue.Queue(maxsize=read_ahead) # Row groups read but not yet handed to the caller
+    budget = threading.Condition()
+    state = {'buffered': 0, 'stop': False}
+
+    def reader():
+        try:
+            with open(path, 'rb') as f:
+                for rg_index, rg in enumerate(row_groups):
+                    chunk_infos = projected(rg)
+                    size = sum(info['size'] for _, info in chunk_infos)
+                    with budget:
+                        budget.wait_for(lambda: state['stop'] or state['buffered'] == 0
+                                        or state['buffered'] + size <= max_buffered_bytes)
+                        if state['stop']:
+                            return
+                        state['buffered'] += size
+                    chunks = read_projected(f, rg_index, chunk_infos)
+                    ready.put((rg, chunks, size))
+            ready.put(None) # End of file
+        except BaseException as e: # Re-raised in the caller's thread
+            ready.put(e)
+
+    thread = threading.Thread(target=reader, name=f'mycol-read-ahead:{os.path.basename(path)}', daemon=True)
+    thread.start()
+    try:
+        while True:
+            wait_start = time.perf_counter()
+            item = ready.get()
+            stats['wait_seconds'] += time.perf_counter() - wait_start
+            if item is None:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            rg, chunks, size = item
+            yield rg, chunks
+            del chunks
+            with budget: # The caller is done with this row group: free its share of the budget
+                state['buffered'] -= size
+                budget.notify_all()
+    finally:
+        # Stop early (caller broke out or raised): wake the reader and drain so it can exit
+        with budget:
+            state['stop'] = True
+            budget.notify_all()
+        while thread.is_alive():
+            try:
+                ready.get(timeout=0.05)
+            except queue.Empty:
+                pass
+        thread.join()
+
+
+def iter_record_batches(path, columns=None, read_ahead=2, **read_options):
+    """
+    Yield one pyarrow.RecordBatch per row group (optionally only `columns`), using the
+    read-ahead, coalescing reader. Extra keyword arguments go to iter_row_group_chunks.
+    """
+    with open(path, 'rb') as f:
+        metadata = read_footer(f)
+    column_definitions = [tuple(col) for col in metadata['columns']]
+    if columns is not None:
+        types = dict(column_definitions)
+        column_definitions = [(name, types[name]) for name in columns]
+    schema = arrow_schema(column_definitions)
+    for rg_metadata, chunks in iter_row_group_chunks(path, [name for name, _ in column_definitions], read_ahead=read_ahead,
+                                                     metadata=metadata, **read_options):
+        with tracing.span('decode', rows=rg_metadata['num_rows_in_group']):
+            batch = row_group_to_batch(rg_metadata, chunks, column_definitions, schema)
+        yield batch
+
+
+def read_table(path, columns=None, **read_options):
+    """The whole MYCOL1 file (or `columns`) as a pyarrow.Table."""
+    with open(path, 'rb') as f:
+        metadata = read_footer(f)
+    types = dict(tuple(col) for col in metadata['columns'])
+    schema = arrow_schema([(name, types[name]) for name in (columns or types)])
+    return pa.Table.from_batches(list(iter_record_batches(path, columns, **read_options)), schema=schema)
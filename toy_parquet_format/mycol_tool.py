@@ -0,0 +1,165 @@
+import argparse
+import os
+import time
+
+import pyarrow.csv as pv
+
+from clustering import cluster_file
+from mycol import (ARROW_TYPES, CODECS, FLOAT_ENCODINGS, STRING_CODERS, STRING_ENCODINGS, ColumnarWriter,
+                   byte_stream_split, compact, read_chunk, read_footer, recover, split_strings, storage_options)
+
+# --- Configuration ---
+columnar_binary_file = 'columnar_data.bin' # Written by main.py (Step 3)
+rows_per_row_group = 50000                 # Same default as main.py
+
+
+def append_csv(path, csv_path, rows_per_row_group=rows_per_row_group):
+    """
+    Append the rows of a CSV (same header as the MYCOL1 schema) as new row groups.
+    Only the new rows are read and encoded; existing row groups are not touched.
+    Returns the number of rows appended.
+    """
+    with open(path, 'rb') as f:
+        column_definitions = [tuple(col) for col in read_footer(f)['columns']]
+    convert_options = pv.ConvertOptions(column_types={name: ARROW_TYPES[col_type] for name, col_type in column_definitions})
+    table = pv.read_csv(csv_path, convert_options=convert_options)
+    missing = [name for name, _ in column_definitions if name not in table.column_names]
+    if missing:
+        raise ValueError(f"CSV '{csv_path}' is missing columns: {missing}")
+
+    with ColumnarWriter.append(path) as writer:
+        for start in range(0, table.num_rows, rows_per_row_group):
+            writer.write_table(table.slice(start, rows_per_row_group))
+    return table.num_rows
+
+
+def print_info(path):
+    with open(path, 'rb') as f:
+        metadata = read_footer(f)
+    sizes = [rg['num_rows_in_group'] for rg in metadata['row_groups']]
+    print(f"  File: {path} ({os.path.getsize(path) / (1024*1024):.2f} MB)")
+    print(f"  Rows: {metadata['num_rows']}, columns: {metadata['num_cols']}")
+    print(f"  Row groups: {len(sizes)} (rows per group: min {min(sizes, default=0)}, max {max(sizes, default=0)})")
+    if metadata.get('sort_order'):
+        print(f"  Sorted by: {', '.join(metadata['sort_order']['columns'])} (scope: {metadata['sort_order']['scope']})")
+    float_encoding, codec, string_encoding = storage_options(metadata)
+    print(f"  Storage: float encoding {float_encoding}, string encoding {string_encoding}, codec {codec or 'none'}")
+
+
+def print_float_encodings(path, codec='zlib'):
+    """Compressed size of every float column stored plain vs byte-stream-split."""
+    compress = CODECS[codec][0]
+    with open(path, 'rb') as f:
+        metadata = read_footer(f)
+        print(f"  {'Column':<12}{'Plain MB':>12}{codec + ' MB':>12}{'split+' + codec + ' MB':>18}{'Saved':>8}")
+        for name, col_type in metadata['columns']:
+            if col_type != 'float':
+                continue
+            plain = compressed = split = 0
+            for rg in metadata['row_groups']:
+                chunk_bytes = read_chunk(f, rg['column_chunks'][name])
+                plain += len(chunk_bytes)
+                compressed += len(compress(chunk_bytes))
+                split += len(compress(byte_stream_split(chunk_bytes)))
+            mb = 1024 * 1024
+            print(f"  {name:<12}{plain / mb:>12.2f}{compressed / mb:>12.2f}{split / mb:>18.2f}"
+                  f"{1 - split / compressed if compressed else 0:>8.1%}")
+
+
+def print_string_encodings(path, codec=None):
+    """Stored size of every string column under each string encoding (and the codec, if any)."""
+    compress = CODECS[codec][0] if codec else bytes
+    with open(path, 'rb') as f:
+        metadata = read_footer(f)
+        print(f"  {'Column':<14}" + ''.join(f"{encoding + ' MB':>18}" for encoding in STRING_CODERS))
+        for name, col_type in metadata['columns']:
+            if col_type != 'string':
+                continue
+            sizes = dict.fromkeys(STRING_CODERS, 0)
+            for rg in metadata['row_groups']:
+                strings = split_strings(read_chunk(f, rg['column_chunks'][name]), rg['num_rows_in_group'])
+                for encoding, (encode, _) in STRING_CODERS.items():
+                    sizes[encoding] += len(compress(encode(*strings)))
+            print(f"  {name:<14}" + ''.join(f"{size / (1024 * 1024):>18.2f}" for size in sizes.values()))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Maintain MYCOL1 files: append, compact, recover, cluster.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    info_parser = subparsers.add_parser('info', help="Show row and row group counts.")
+    info_parser.add_argument('file', nargs='?', default=columnar_binary_file)
+
+    append_parser = subparsers.add_parser('append', help="Append the rows of a CSV as new row groups.")
+    append_parser.add_argument('csv')
+    append_parser.add_argument('file', nargs='?', default=columnar_binary_file)
+    append_parser.add_argument('--row-group-size', type=int, default=rows_per_row_group)
+
+    compact_parser = subparsers.add_parser('compact', help="Merge small row groups into right-sized ones.")
+    compact_parser.add_argument('file', nargs='?', default=columnar_binary_file)
+    compact_parser.add_argument('--target-rows', type=int, default=rows_per_row_group)
+    compact_parser.add_argument('--output', default=None, help="Write here instead of replacing the file.")
+    compact_parser.add_argument('--float-encoding', choices=FLOAT_ENCODINGS, default=None,
+                                help="How to store float chunks (default: as the file does now).")
+    compact_parser.add_argument('--codec', choices=sorted(CODECS) + ['none'], default=None,
+                                help="Chunk compression (default: as the file does now).")
+    compact_parser.add_argument('--string-encoding', choices=STRING_ENCODINGS, default=None,
+                                help="How to store string chunks (default: as the file does now).")
+
+    encodings_parser = subparsers.add_parser('float-encodings', help="Compare compressed float columns, plain vs byte-stream-split.")
+    encodings_parser.add_argument('file', nargs='?', default=columnar_binary_file)
+    encodings_parser.add_argument('--codec', choices=sorted(CODECS), default='zlib')
+
+    string_encodings_parser = subparsers.add_parser('string-encodings', help="Compare string column sizes per string encoding.")
+    string_encodings_parser.add_argument('file', nargs='?', default=columnar_binary_file)
+    string_encodings_parser.add_argument('--codec', choices=sorted(CODECS), default=None)
+
+    recover_parser = subparsers.add_parser('recover', help="Truncate a torn append back to the last complete footer.")
+    recover_parser.add_argument('file', nargs='?', default=columnar_binary_file)
+
+    cluster_parser = subparsers.add_parser('cluster', help="Rewrite a file with rows ordered by key columns.")
+    cluster_parser.add_argument('destination')
+    cluster_parser.add_argument('file', nargs='?', default=columnar_binary_file)
+    cluster_parser.add_argument('--by', required=True, help="Comma separated key columns, e.g. status,timestamp_ms")
+    cluster_parser.add_argument('--mode', choices=['sort', 'window'], default='sort',
+                                help="'sort': external sort of the whole file; 'window': sort each buffered window.")
+    cluster_parser.add_argument('--memory-rows', type=int, default=1000000, help="Rows sorted in memory per spilled run.")
+    cluster_parser.add_argument('--window-rows', type=int, default=500000, help="Window size in window mode.")
+
+    args = parser.parse_args()
+    start_time = time.time()
+
+    if args.command == 'info':
+        print_info(args.file)
+    elif args.command == 'append':
+        print(f"\nAppending '{args.csv}' to '{args.file}'...")
+        num_rows = append_csv(args.file, args.csv, args.row_group_size)
+        print(f"  Appended {num_rows} rows in {time.time() - start_time:.2f} seconds.")
+        print_info(args.file)
+    elif args.command == 'compact':
+        print(f"\nCompacting '{args.file}' to row groups of up to {args.target_rows} rows...")
+        size_before = os.path.getsize(args.file)
+        before, after = compact(args.file, args.target_rows, args.output, args.float_encoding, args.codec,
+                                args.string_encoding)
+        result_file = args.output or args.file
+        print(f"  Row groups: {before} -> {after}")
+        print(f"  Size: {size_before / (1024*1024):.2f} MB -> {os.path.getsize(result_file) / (1024*1024):.2f} MB")
+        print(f"  Compaction time: {time.time() - start_time:.2f} seconds")
+    elif args.command == 'cluster':
+        by = [c for c in args.by.split(',') if c]
+        print(f"\nClustering '{args.file}' -> '{args.destination}' by {by} ({args.mode})...")
+        runs = cluster_file(args.file, args.destination, by, args.mode,
+                            memory_rows=args.memory_rows, window_rows=args.window_rows)
+        if runs:
+            print(f"  Spilled and merged {runs} sorted runs.")
+        print(f"  Clustering time: {time.time() - start_time:.2f} seconds")
+        print_info(args.destination)
+    elif args.command == 'float-encodings':
+        print(f"\nFloat columns of '{args.file}' compressed with {args.codec}:")
+        print_float_encodings(args.file, args.codec)
+    elif args.command == 'string-encodings':
+        print(f"\nString columns of '{args.file}'" + (f" compressed with {args.codec}:" if args.codec else ":"))
+        print_string_encodings(args.file, args.codec)
+    elif args.command == 'recover':
+        removed = recover(args.file)
+        print(f"  Removed {removed} bytes of torn tail." if removed else "  File is intact.")
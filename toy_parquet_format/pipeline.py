@@ -0,0 +1,769 @@
+import csv
+import hashlib
+import inspect
+import json
+import os
+import random # For generating more varied string data
+import resource
+import struct
+import time
+
+import tracing
+
+# --- Benchmark Pipeline ---
+# The benchmark is split into steps that can be run separately (see main.py):
+#   generate - Step 1:      source CSV
+#   convert  - Steps 2-3b:  row-oriented binary, columnar binary, clustered columnar copy
+#   query    - Steps 4-5f:  the filtered / metadata / group-by queries, timings saved to query_results_file
+#   compare  - Step 6:      sizes and timings side by side
+# Every file-producing step records a fingerprint of its parameters, its own source code (plus that
+# of the pipeline.py helpers it hands work to) and the contents of its input files (including the
+# modules it calls) in state_file, and is skipped while that fingerprint is unchanged and its
+# outputs are exactly as it left them. Heavy modules
+# (NumPy, Arrow, the generator) are imported inside the steps that need them.
+
+# --- Configuration ---
+num_rows = 1000000 # 1 Million rows
+num_cols = 20     # Wide data
+source_data_csv = 'source_data.csv' # Intermediate CSV (could generate directly, but CSV is familiar)
+random_seed = 42 # Fixes the schema and the data, so benchmark runs are reproducible
+num_workers = os.cpu_count() # Processes used to generate the source data
+base_timestamp_ms = 1700000000000 # Fixed 'now' for timestamp_ms (was time.time())
+
+
+# Custom Binary Formats
+row_oriented_binary_file = 'row_oriented_data.bin'
+row_write_buffer_size = 1024 * 1024 # Step 2: packed rows are buffered and written in pieces of this size
+row_read_block_size = 4 * 1024 * 1024 # Step 4: the row reader streams the file in blocks of this size
+columnar_binary_file = 'columnar_data.bin'
+
+# Columnar Format Parameters
+rows_per_row_group = 50000 # 50k rows per group -> 20 row groups
+encode_workers = os.cpu_count() # Step 3: processes encoding column chunks in parallel
+encode_max_in_flight = 2 # Step 3: row groups queued or encoded but not yet written (bounds memory)
+columnar_float_encoding = 'plain' # Step 3: 'plain' or 'byte_stream_split' (compresses better with a codec)
+columnar_codec = None # Step 3: chunk compression, None or 'zlib'
+columnar_string_encoding = 'auto' # Step 3: 'plain', 'delta_length', 'delta_prefix' or 'auto' (smallest per chunk)
+read_ahead_row_groups = 4 # Row groups the Step 5 reader fetches ahead of decoding (0 = no read-ahead)
+read_ahead_max_bytes = 64 * 1024 * 1024 # Cap on chunk bytes held by the read-ahead reader
+coalesce_max_gap = 64 * 1024 # Projected chunks closer than this are fetched in one read
+coalesce_max_read_size = 16 * 1024 * 1024 # Upper bound for one merged read
+compound_predicates = ["status = FAILED", "category in C,D", "value > 100"] # Step 5b filter (ANDed)
+clustered_binary_file = 'columnar_clustered.bin' # Step 3b: same rows, sorted by cluster_by
+cluster_by = ['status', 'timestamp_ms'] # Query keys: status filters and time ranges
+dashboard_aggregates = ['count(*)', 'min(timestamp_ms)', 'max(id)', 'sum(value)'] # Step 5d
+distinct_columns = ['category', 'description'] # Step 5e: approximate COUNT(DISTINCT) from sketches
+group_by_keys = ['status', 'category'] # Step 5f: one vectorized GROUP BY scan instead of a scan per group
+group_by_aggregates = ['count(*)', 'sum(value)', 'avg(value)']
+
+# Pipeline bookkeeping
+state_file = '.pipeline_state.json' # Step fingerprints and cached file digests
+query_results_file = 'query_results.json' # Written by the query step, read by compare
+
+column_definitions = [
+    ('id', 'int'),
+    ('status', 'string'), # Low cardinality
+    ('value', 'float'),   # Numeric for aggregation
+    # Add more columns, mix types
+    ('category', 'string'),
+    ('timestamp_ms', 'int'),
+    ('is_active', 'int'), # Simulate boolean/tinyint
+    ('description', 'string'), # Higher cardinality string
+] + [(f'col_{i}', random.Random(random_seed + i).choice(['int', 'float', 'string'])) for i in range(num_cols - len(['id', 'status', 'value', 'category', 'timestamp_ms', 'is_active', 'description']))]
+
+# Ensure target query columns exist and are of expected type
+col_names = [col[0] for col in column_definitions]
+col_types = {col[0]: col[1] for col in column_definitions}
+assert 'id' in col_names and col_types['id'] == 'int'
+assert 'status' in col_names and col_types['status'] == 'string'
+assert 'value' in col_names and col_types['value'] == 'float'
+
+# Data generation parameters
+statuses = ['PENDING', 'PROCESSED', 'FAILED', 'CANCELLED', 'SHIPPED']
+categories = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J'] # Medium cardinality
+description_prefixes = ["Trans", "Order", "Item", "Process", "Event"]
+
+module_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+# --- Fingerprints ---
+
+def load_state():
+    try:
+        with open(state_file) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {'steps': {}, 'digests': {}}
+
+
+def save_state(state):
+    tmp_path = state_file + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, state_file)
+
+
+def file_digest(path, state, block_size=1024 * 1024):
+    """
+    BLAKE2b of a file's contents, or None if it does not exist. Digests are cached in the
+    state by (size, mtime), so an unchanged file is only hashed once.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    key = os.path.abspath(path)
+    cached = state['digests'].get(key)
+    if cached and cached['size'] == stat.st_size and cached['mtime_ns'] == stat.st_mtime_ns:
+        return cached['digest']
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        while block := f.read(block_size):
+            digest.update(block)
+    state['digests'][key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'digest': digest.hexdigest()}
+    return digest.hexdigest()
+
+
+def step_fingerprint(params, inputs, state):
+    """Fingerprint of a step: its parameters plus the content digests of its input files."""
+    payload = {'params': params, 'inputs': {path: file_digest(path, state) for path in inputs}}
+    return hashlib.blake2b(json.dumps(payload, sort_keys=True).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def module_files(*names):
+    """Source files of the modules a step runs, so code changes invalidate its outputs."""
+    return [os.path.join(module_dir, f'{name}.py') for name in names]
+
+
+def run_step(label, name, params, inputs, outputs, action, state, force=False):
+    """
+    Run action() unless the step's fingerprint matches the recorded one and every output still
+    has the digest recorded when the step last wrote it. Returns True if the step ran.
+    """
+    fingerprint = step_fingerprint({**params, 'code': inspect.getsource(action)}, inputs, state)
+    recorded = state['steps'].get(name)
+    if (not force and recorded and recorded['fingerprint'] == fingerprint
+            and all(recorded['outputs'].get(path) == file_digest(path, state) for path in outputs)):
+        print(f"\n{label}: {', '.join(repr(path) for path in outputs)} up to date (fingerprint {fingerprint[:12]}), skipping.")
+        return False
+    state['steps'].pop(name, None)
+    save_state(state) # A step interrupted half way must not look up to date
+    action()
+    state['steps'][name] = {'fingerprint': fingerprint, 'outputs': {path: file_digest(path, state) for path in outputs}}
+    save_state(state)
+    return True
+
+
+# --- Step 1: Create Source CSV Data ---
+# (Using CSV as a simple way to generate structured data, could generate directly)
+# Every column is described once and built with NumPy/Arrow in blocks (see datagen.py),
+# so the CSV is identical for a given seed whatever the number of workers.
+def source_dataset():
+    from datagen import (
+        Add, Column, Constant, Cycle, DatasetSpec, Modular, Multiply, RandomChoice, RandomInt, RepeatChar, Sequence,
+        Template, Uniform,
+    )
+
+    def source_column(col_name, col_type):
+        if col_name == 'id':
+            return Column(col_name, col_type, Sequence())
+        if col_name == 'status':
+            return Column(col_name, col_type, Cycle(statuses))
+        if col_name == 'value':
+            return Column(col_name, col_type, Multiply(Modular(1000, offset=0.75), Uniform(0, 10))) # More varied float
+        if col_name == 'category':
+            return Column(col_name, col_type, Cycle(categories))
+        if col_name == 'timestamp_ms':
+            return Column(col_name, col_type, Sequence(start=base_timestamp_ms - num_rows * 100, step=100)) # Recent timestamps
+        if col_name == 'is_active':
+            return Column(col_name, col_type, Cycle([0] + [1] * 9)) # Mostly active
+        if col_name == 'description':
+            # Varied string length
+            return Column(col_name, col_type, Template(RandomChoice(description_prefixes), ' number ', Sequence(), ' details ', RepeatChar('X', 20)))
+        # Generic columns
+        if col_type == 'int':
+            return Column(col_name, col_type, Add(Sequence(step=100), RandomInt(0, 100)))
+        if col_type == 'float':
+            return Column(col_name, col_type, Multiply(Add(Sequence(step=0.5), Uniform()), Constant(50)))
+        return Column(col_name, col_type, Template(f"data_{col_name}_", Sequence(), '_', RepeatChar('Y', 10)))
+
+    return DatasetSpec(
+        [source_column(col_name, col_type) for col_name, col_type in column_definitions],
+        num_rows, seed=random_seed, block_rows=rows_per_row_group,
+    )
+
+
+def write_source_csv():
+    from datagen import generate
+
+    print(f"\nStep 1: Creating source CSV data '{source_data_csv}'...")
+    start_time = time.time()
+
+    generate(source_dataset(), {'csv': source_data_csv}, workers=num_workers)
+
+    end_time = time.time()
+    print(f"Source CSV created in {end_time - start_time:.2f} seconds.")
+    print(f"Source CSV size: {os.path.getsize(source_data_csv) / (1024*1024):.2f} MB")
+
+
+# --- Step 2: Write Data to Simple Row-Oriented Binary Format ---
+def write_row_binary():
+    from row_format import RowWriter
+
+    print(f"\nStep 2: Writing data to simple row-oriented binary format '{row_oriented_binary_file}'...")
+    start_time = time.time()
+
+    with open(row_oriented_binary_file, 'wb') as f_bin:
+        with open(source_data_csv, 'r') as csvfile:
+            reader = csv.reader(csvfile)
+            header = next(reader) # Skip header
+            row_schema = [(col_name, col_types[col_name]) for col_name in header]
+
+            # Same bytes as encoders[col_type](value) per field, but each run of int/float columns is
+            # packed by one precompiled struct.Struct and rows are written out in large buffers
+            with RowWriter(f_bin, row_schema, row_write_buffer_size) as row_writer:
+                for row in reader:
+                    row_writer.write_row(row)
+
+    end_time = time.time()
+    print(f"Row-oriented binary file written in {end_time - start_time:.2f} seconds.")
+    print(f"Row-oriented binary file size: {os.path.getsize(row_oriented_binary_file) / (1024*1024):.2f} MB")
+
+
+# --- Step 3: Write Data to Simple Columnar Binary Format ---
+# Each row group's column chunks are encoded in parallel worker processes (encode_csv_column);
+# this process only reads the CSV and appends finished row groups to the file in order.
+def encode_csv_column(col_type, values, num_rows):
+    # The per-value encoders live in mycol.py so the generator and readers share them
+    from mycol import chunk_aggregates, chunk_sketch, encoders
+
+    # Encode all values for this column chunk (value_str is the string from CSV)
+    encoder = encoders[col_type]
+    encoded_chunk_bytes = b''.join(encoder(value_str) for value_str in values)
+    # Footer count / non_null / sum / min / max (so metadata-only queries can skip the data)
+    # and the HyperLogLog sketch for approximate COUNT(DISTINCT)
+    return (encoded_chunk_bytes, chunk_aggregates(col_type, encoded_chunk_bytes, num_rows),
+            chunk_sketch(col_type, encoded_chunk_bytes, num_rows))
+
+
+def write_columnar_binary():
+    from mycol import ParallelColumnarWriter
+
+    print(f"\nStep 3: Writing data to simple columnar binary format '{columnar_binary_file}' ({encode_workers} encoding workers)...")
+    start_time = time.time()
+
+    with ParallelColumnarWriter(columnar_binary_file, column_definitions, float_encoding=columnar_float_encoding,
+                                codec=columnar_codec, string_encoding=columnar_string_encoding, workers=encode_workers,
+                                max_in_flight=encode_max_in_flight, encode=encode_csv_column) as writer:
+        current_row_group_rows = []
+        current_row_group_index = 0
+
+        with open(source_data_csv, 'r') as csvfile:
+            reader = csv.reader(csvfile)
+            header = next(reader) # Skip header
+
+            for i, row in enumerate(reader):
+                current_row_group_rows.append(row)
+
+                # Check if Row Group buffer is full or it's the last row
+                if (i + 1) % rows_per_row_group == 0 or (i + 1) == num_rows:
+                    # Transpose the buffered rows into columns and hand them to the encoding workers
+                    cols_data = list(zip(*current_row_group_rows))
+                    writer.write_columns(len(current_row_group_rows), dict(zip(header, cols_data)))
+
+                    # Clear buffer and move to the next row group
+                    current_row_group_index += 1
+                    print(f"  Row Group {current_row_group_index} queued with {len(current_row_group_rows)} rows.")
+                    current_row_group_rows = []
+
+    end_time = time.time()
+    print(f"Columnar binary file written in {end_time - start_time:.2f} seconds.")
+    print(f"Columnar binary file size: {os.path.getsize(columnar_binary_file) / (1024*1024):.2f} MB")
+
+
+# --- Step 3b: Write a Clustered Copy of the Columnar File ---
+# Rows above are in CSV order, so every row group holds every status: nothing can be skipped.
+# Re-sorting by the query keys (external sort, spilled runs merged) groups equal keys together,
+# and the footer records the sort order plus per-chunk min/max zone maps.
+def write_clustered_binary():
+    from clustering import cluster_file
+
+    print(f"\nStep 3b: Writing '{clustered_binary_file}' clustered by {cluster_by}...")
+    start_time = time.time()
+    cluster_file(columnar_binary_file, clustered_binary_file, cluster_by, mode='sort', rows_per_row_group=rows_per_row_group)
+    end_time = time.time()
+    print(f"Clustered columnar file written in {end_time - start_time:.2f} seconds.")
+    print(f"Clustered columnar file size: {os.path.getsize(clustered_binary_file) / (1024*1024):.2f} MB")
+
+
+# --- Step 4: Read Data from Simple Row-Oriented Binary (Filtered Query) ---
+def query_row_binary():
+    from row_format import iter_row_blocks
+
+    print(f"\nStep 4: Reading '{row_oriented_binary_file}' (Row-Oriented Binary) for filtered query...")
+    print(">>> OBSERVE Activity Monitor (Disk & CPU) and ru_inblock output! <<<")
+
+    target_status = 'FAILED' # Filter condition
+    status_col_name = 'status'
+    value_col_name = 'value'
+
+    # Need to know the byte size of each column type for row-oriented reading
+    # This is fragile if types/encoding change!
+    def get_encoded_size(col_type, value_str=None):
+        if col_type == 'int': return 8
+        if col_type == 'float': return 8
+        if col_type == 'string':
+            # For row-oriented, we need to encode the string to know its size (+ 4 for length prefix)
+            return 4 + len((value_str or "").encode('utf-8')) # Estimate size if value_str is provided
+
+    # Calculate the fixed size of the non-string part of a row for easier seeking
+    # Or calculate total size of a row by encoding a sample row (simpler for this demo)
+    # Let's read the CSV header to get column order
+    header = []
+    with open(source_data_csv, 'r') as csvfile:
+        reader = csv.reader(csvfile)
+        header = next(reader)
+
+    # Calculate byte offset for status and value columns within a single row
+    status_col_byte_offset_in_row = 0
+    value_col_byte_offset_in_row = 0
+    row_byte_size_estimate = 0 # We'll calculate this based on a sample row
+
+    sample_row_from_csv = None
+    with open(source_data_csv, 'r') as csvfile:
+         reader = csv.reader(csvfile)
+         next(reader) # Skip header
+         sample_row_from_csv = next(reader) # Get the first data row
+
+    current_offset_in_row = 0
+    for col_name in header:
+        col_type = col_types[col_name]
+        # Estimate size using the sample row value for strings
+        col_byte_size = get_encoded_size(col_type, sample_row_from_csv[header.index(col_name)])
+
+        if col_name == status_col_name:
+             status_col_byte_offset_in_row = current_offset_in_row
+        if col_name == value_col_name:
+             value_col_byte_offset_in_row = current_offset_in_row
+
+        current_offset_in_row += col_byte_size
+
+    row_byte_size_estimate = current_offset_in_row # This is just an estimate due to variable string lengths!
+
+    print(f"  Estimated row byte size: {row_byte_size_estimate} bytes (Note: actual size varies due to strings)")
+    print(f"  Status column offset in row: {status_col_byte_offset_in_row} bytes")
+    print(f"  Value column offset in row: {value_col_byte_offset_in_row} bytes")
+
+
+    start_time = time.time()
+    start_rusage = resource.getrusage(resource.RUSAGE_SELF)
+
+    total_value_failed = 0
+    failed_count = 0
+    total_bytes_read = 0 # Track bytes read
+
+    try:
+        with open(row_oriented_binary_file, 'rb') as f_bin:
+            # In a true row-oriented binary read, you'd read row by row
+            # We need to read the status, apply filter, then read value if it matches
+            # This still requires reading past all the bytes of previous columns in the row
+
+            f_bin.seek(0, os.SEEK_END)
+            file_size = f_bin.tell()
+            f_bin.seek(0, os.SEEK_SET)
+
+            # There is no index: every field's length has to be parsed to find the next row, so the
+            # whole file is read even though the query needs two columns. The reader streams it in
+            # blocks of row_read_block_size bytes (memory stays bounded by the block size), parses
+            # each run of fixed-width fields with one precompiled struct.Struct, and skips the
+            # strings the query does not need without decoding them.
+            row_read_stats = {}
+            for rows in iter_row_blocks(f_bin, column_definitions, [status_col_name, value_col_name], row_read_block_size, row_read_stats):
+                for status_value, value_value in rows:
+                    if status_value == target_status:
+                        failed_count += 1
+                        if value_value is not None:
+                            total_value_failed += value_value
+            total_bytes_read = row_read_stats['bytes_read'] # The full file size
+
+    except FileNotFoundError:
+        print(f"Error: File '{row_oriented_binary_file}' not found.")
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+
+
+    end_time = time.time()
+    end_rusage = resource.getrusage(resource.RUSAGE_SELF)
+
+    duration = end_time - start_time
+    block_reads = end_rusage.ru_inblock - start_rusage.ru_inblock
+
+    average_value_failed = total_value_failed / failed_count if failed_count > 0 else 0
+
+    print(f"\nQuery complete (Row-Oriented Binary).")
+    print(f"  Total bytes read from file (simulated): {total_bytes_read}") # This is the full file size
+    print(f"  Transactions with status '{target_status}' found: {failed_count}")
+    print(f"  Sum of '{value_col_name}' for '{target_status}' transactions: {total_value_failed:.2f}")
+    print(f"Time taken for filtered query: {duration:.4f} seconds")
+    print(f"Disk read block operations (ru_inblock): {block_reads}")
+    return {'seconds': duration, 'bytes_read': total_bytes_read, 'block_reads': block_reads}
+
+
+# --- Step 5: Read Data from Simple Columnar Binary (Filtered Query) ---
+def query_columnar_binary():
+    from mycol import iter_row_group_chunks, read_footer
+
+    print(f"\nStep 5: Reading '{columnar_binary_file}' (Columnar Binary) for filtered query...")
+    print(">>> OBSERVE Activity Monitor (Disk & CPU) and ru_inblock output! <<<")
+
+    target_status = 'FAILED' # Filter condition
+    status_col_name = 'status'
+    value_col_name = 'value'
+
+    start_time = time.time()
+    start_rusage = resource.getrusage(resource.RUSAGE_SELF)
+
+    total_value_failed = 0
+    failed_count = 0
+    total_bytes_read_columnar = 0 # Track bytes read
+    read_ahead_stats = {} # Filled by the read-ahead reader: bytes_read, wait_seconds
+
+    try:
+        with open(columnar_binary_file, 'rb') as f_col:
+            # --- Read File Footer ---
+            read_metadata = read_footer(f_col)
+
+        print("  Metadata loaded successfully.")
+        print(f"  Number of Row Groups: {len(read_metadata['row_groups'])}")
+        print(f"  Reading ahead up to {read_ahead_row_groups} row groups / {read_ahead_max_bytes / (1024*1024):.0f} MB on a background thread")
+
+        # --- Process Row Groups ---
+        # The footer plan tells the read-ahead thread which chunks (status + value) to fetch for the
+        # next row groups while this loop decodes the current one.
+        for rg_index, (rg_metadata, rg_chunks) in enumerate(iter_row_group_chunks(
+                columnar_binary_file, [status_col_name, value_col_name], read_ahead=read_ahead_row_groups,
+                max_buffered_bytes=read_ahead_max_bytes, metadata=read_metadata, stats=read_ahead_stats,
+                max_gap=coalesce_max_gap, max_read_size=coalesce_max_read_size)):
+            # --- Predicate Pushdown Simulation ---
+            # Use ONLY the status column chunk for this row group
+            status_chunk_bytes = rg_chunks.get(status_col_name)
+            value_chunk_bytes = rg_chunks.get(value_col_name)
+
+            if status_chunk_bytes is None or value_chunk_bytes is None:
+                 print(f"  Warning: Missing status or value column info for a row group. Skipping.")
+                 continue
+
+            # Decode the status column chunk and identify matching rows
+            failed_row_indices_in_rg = []
+            current_byte_offset_in_chunk = 0
+            num_rows_in_rg = rg_metadata['num_rows_in_group']
+
+            with tracing.span('filter', row_group=rg_index, column=status_col_name, rows=num_rows_in_rg):
+                for row_index_in_rg in range(num_rows_in_rg):
+                     # Decode one status string value from the chunk bytes
+                     # This requires re-implementing the decoding logic on bytes
+                     try:
+                         # Read length prefix
+                         length = struct.unpack('<i', status_chunk_bytes[current_byte_offset_in_chunk : current_byte_offset_in_chunk + 4])[0]
+                         current_byte_offset_in_chunk += 4
+
+                         if length == -1:
+                             status_value = None
+                         else:
+                             status_value = str(status_chunk_bytes[current_byte_offset_in_chunk : current_byte_offset_in_chunk + length], 'utf-8')
+                             current_byte_offset_in_chunk += length
+
+                         # Check filter
+                         if status_value == target_status:
+                             failed_row_indices_in_rg.append(row_index_in_rg)
+
+                     except IndexError:
+                         print(f"  Error decoding status string in RG at index {row_index_in_rg}. Stopping decode for this RG.")
+                         break # Stop decoding this chunk if malformed
+                     except Exception as e:
+                         print(f"  Unexpected error decoding status string in RG at index {row_index_in_rg}: {e}. Stopping decode for this RG.")
+                         break
+
+
+            # --- Column Pruning and Reading Relevant Data ---
+            # If there are any matching rows in this row group, decode their corresponding value data
+            # (the value chunk was already read ahead together with the status chunk)
+            if failed_row_indices_in_rg:
+                # Decode ONLY the value data for the rows that matched the status filter
+                # This is the key efficiency gain! We don't decode all values.
+                value_byte_size = 8 # Float is 8 bytes
+
+                with tracing.span('aggregate', row_group=rg_index, column=value_col_name, rows=len(failed_row_indices_in_rg)):
+                    for row_index_in_rg in failed_row_indices_in_rg:
+                        # Calculate the byte offset for this specific row's value within the value chunk
+                        value_byte_offset_in_chunk = row_index_in_rg * value_byte_size # Simple calculation for fixed-size types
+
+                        try:
+                             # Read and decode the specific value bytes
+                             bytes_val = value_chunk_bytes[value_byte_offset_in_chunk : value_byte_offset_in_chunk + value_byte_size]
+                             if bytes_val == b'\x00' * 8:
+                                 value = None
+                             else:
+                                 value = struct.unpack('<d', bytes_val)[0]
+
+                             if value is not None:
+                                 total_value_failed += value
+                                 failed_count += 1 # Count the transaction
+
+                        except IndexError:
+                             print(f"  Error decoding value float in RG at index {row_index_in_rg}. Skipping value.")
+                             pass # Skip this specific value
+                        except Exception as e:
+                             print(f"  Unexpected error decoding value float in RG at index {row_index_in_rg}: {e}. Skipping value.")
+                             pass
+
+
+    except FileNotFoundError:
+        print(f"Error: Binary file '{columnar_binary_file}' not found. Run steps 1-3 first.")
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+    total_bytes_read_columnar = read_ahead_stats.get('bytes_read', 0) # status + value chunks of every row group (+ any coalesced gaps)
+
+
+    end_time = time.time()
+    end_rusage = resource.getrusage(resource.RUSAGE_SELF)
+
+    duration = end_time - start_time
+    block_reads = end_rusage.ru_inblock - start_rusage.ru_inblock
+
+    average_value_failed = total_value_failed / failed_count if failed_count > 0 else 0
+
+    print(f"\nQuery complete (Columnar Binary).")
+    print(f"  Total bytes read from file (estimated): {total_bytes_read_columnar}") # This is the sum of status + value chunks for all RGs
+    print(f"  Transactions with status '{target_status}' found: {failed_count}")
+    print(f"  Sum of '{value_col_name}' for '{target_status}' transactions: {total_value_failed:.2f}")
+    print(f"Time taken for filtered query: {duration:.4f} seconds")
+    print(f"  Read requests: {read_ahead_stats.get('reads', 0)} for {read_ahead_stats.get('ranges', 0)} column chunks (coalesced)")
+    print(f"  Time spent waiting on I/O (not hidden by read-ahead): {read_ahead_stats.get('wait_seconds', 0):.4f} seconds")
+    print(f"Disk read block operations (ru_inblock): {block_reads}")
+    return {'seconds': duration, 'bytes_read': total_bytes_read_columnar, 'block_reads': block_reads}
+
+
+# --- Steps 5b/5c: Compound Filter with Selection Vectors, on the Plain and the Clustered File ---
+def query_compound_filter():
+    import numpy as np
+    from selection import filter_columnar_file, parse_predicate
+
+    value_col_name = 'value'
+
+    print(f"\nStep 5b: Compound filter on '{columnar_binary_file}': {' AND '.join(compound_predicates)}")
+    # Predicates are evaluated cheapest / most selective first; each later predicate only looks at the
+    # rows still selected, and a row group stops reading chunks as soon as nothing is selected.
+    start_time = time.time()
+    start_rusage = resource.getrusage(resource.RUSAGE_SELF)
+
+    compound_result = None
+    try:
+        parsed_predicates = [parse_predicate(text, col_types) for text in compound_predicates]
+        compound_result, compound_report = filter_columnar_file(columnar_binary_file, parsed_predicates, [value_col_name])
+    except FileNotFoundError:
+        print(f"Error: Binary file '{columnar_binary_file}' not found. Run steps 1-3 first.")
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+
+    end_time = time.time()
+    end_rusage = resource.getrusage(resource.RUSAGE_SELF)
+
+    if compound_result is not None:
+        compound_values = compound_result.column(value_col_name).to_numpy(zero_copy_only=False)
+        print(f"\nQuery complete (Columnar Binary, selection vectors).")
+        print(f"  Predicate order after adapting: {', '.join(f'{c} {op} {v}' for c, op, v in compound_report['predicate_order'])}")
+        for predicate, pass_rate in compound_report['pass_rates'].items():
+            if pass_rate is not None:
+                print(f"    {predicate[0]} {predicate[1]} {predicate[2]}: {pass_rate:.1%} of the rows it saw passed")
+        print(f"  Column chunks read: {compound_report['chunks_read']}, skipped (empty selection): {compound_report['chunks_skipped']}")
+        print(f"  Total bytes read from file: {compound_report['bytes_read']}")
+        print(f"  Rows selected: {compound_report['rows_selected']}")
+        print(f"  Sum of '{value_col_name}' for selected rows: {np.nansum(compound_values):.2f}")
+    print(f"Time taken for compound query: {end_time - start_time:.4f} seconds")
+    print(f"Disk read block operations (ru_inblock): {end_rusage.ru_inblock - start_rusage.ru_inblock}")
+    print(f"\nStep 5c: Compound filter on '{clustered_binary_file}' (sorted by {cluster_by})...")
+    # Zone maps skip row groups without the wanted status, binary search narrows the chunk that
+    # has it, and the file-wide order ends the scan after the last matching row.
+    start_time = time.time()
+    clustered_result = None
+    try:
+        clustered_result, clustered_report = filter_columnar_file(clustered_binary_file, parsed_predicates, [value_col_name])
+    except FileNotFoundError:
+        print(f"Error: Binary file '{clustered_binary_file}' not found. Run step 3b first.")
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+    end_time = time.time()
+
+    if clustered_result is not None:
+        print(f"\nQuery complete (Clustered Columnar Binary).")
+        print(f"  Row groups: {clustered_report['row_groups'] + clustered_report['row_groups_after_early_stop']} total, "
+              f"{clustered_report['row_groups_pruned_zone_map']} skipped by zone maps, "
+              f"{clustered_report['row_groups_after_early_stop']} skipped by early termination")
+        print(f"  Rows skipped by binary search in sorted chunks: {clustered_report['rows_skipped_binary_search']}")
+        print(f"  Total bytes read from file: {clustered_report['bytes_read']} (unclustered: {compound_report['bytes_read'] if compound_result is not None else 'n/a'})")
+        print(f"  Rows selected: {clustered_report['rows_selected']}")
+        print(f"  Sum of '{value_col_name}' for selected rows: {np.nansum(clustered_result.column(value_col_name).to_numpy(zero_copy_only=False)):.2f}")
+    print(f"Time taken for compound query: {end_time - start_time:.4f} seconds")
+
+
+# --- Step 5d: Dashboard Aggregates from Footer Metadata ---
+def query_dashboard_aggregates():
+    from metadata_query import aggregate_columnar_file, parse_aggregate
+
+    print(f"\nStep 5d: {', '.join(dashboard_aggregates)} on '{columnar_binary_file}' from the footer...")
+    # Every chunk's count / non_null / sum / min / max is in the footer: whole row groups need no data reads.
+    start_time = time.time()
+    try:
+        parsed_aggregates = [parse_aggregate(text, col_types) for text in dashboard_aggregates]
+        dashboard_results, dashboard_report = aggregate_columnar_file(columnar_binary_file, parsed_aggregates)
+        end_time = time.time()
+        for text, key in zip(dashboard_aggregates, parsed_aggregates):
+            print(f"  {text}: {dashboard_results[key]}")
+        print(f"  Row groups answered from the footer: {dashboard_report['row_groups_from_metadata']} of {dashboard_report['row_groups']}")
+        print(f"  Bytes of column data read: {dashboard_report['bytes_read']}")
+        print(f"Time taken for metadata-only query: {(end_time - start_time) * 1000:.2f} ms")
+    except FileNotFoundError:
+        print(f"Error: Binary file '{columnar_binary_file}' not found. Run steps 1-3 first.")
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+
+
+# --- Step 5e: Approximate Distinct Counts from Sketches ---
+def query_distinct_counts():
+    from metadata_query import count_distinct
+
+    print(f"\nStep 5e: Approximate COUNT(DISTINCT) of {distinct_columns} from per-chunk sketches...")
+    # Each chunk's HyperLogLog sketch is merged across row groups; no column data is read.
+    try:
+        for col_name in distinct_columns:
+            start_time = time.time()
+            distinct_estimate, distinct_report = count_distinct(columnar_binary_file, col_name)
+            end_time = time.time()
+            print(f"  {col_name}: ~{distinct_estimate:,.0f} distinct values "
+                  f"({distinct_report['row_groups_from_metadata']} sketches merged, {distinct_report['bytes_read']} bytes read, "
+                  f"{(end_time - start_time) * 1000:.2f} ms)")
+    except FileNotFoundError:
+        print(f"Error: Binary file '{columnar_binary_file}' not found. Run steps 1-3 first.")
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+
+
+# --- Step 5f: GROUP BY in One Scan ---
+def query_group_by():
+    from group_by import group_by
+
+    print(f"\nStep 5f: {', '.join(group_by_aggregates)} GROUP BY {', '.join(group_by_keys)} on '{columnar_binary_file}'...")
+    # Keys are factorized per row group and aggregated with NumPy; partials from the workers are merged.
+    try:
+        start_time = time.time()
+        grouped, group_report = group_by(columnar_binary_file, group_by_keys, group_by_aggregates, workers=num_workers)
+        end_time = time.time()
+        for row in grouped.to_pylist()[:10]:
+            print("  " + ", ".join(f"{name}={value}" for name, value in row.items()))
+        if grouped.num_rows > 10:
+            print(f"  ... {grouped.num_rows - 10} more groups")
+        print(f"  {grouped.num_rows} groups from {group_report['row_groups']} row groups in one scan ({num_workers} workers)")
+        print(f"Time taken for GROUP BY query: {(end_time - start_time) * 1000:.2f} ms")
+    except FileNotFoundError:
+        print(f"Error: Binary file '{columnar_binary_file}' not found. Run steps 1-3 first.")
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+
+
+# --- Step 6: Analyze and Compare ---
+def compare_results():
+    try:
+        with open(query_results_file) as f:
+            results = json.load(f)
+    except FileNotFoundError:
+        print(f"Error: '{query_results_file}' not found. Run the query step first.")
+        return
+    row_results, columnar_results = results['row_binary'], results['columnar']
+    total_bytes_read_columnar = columnar_results['bytes_read']
+
+    print(f"\n--- Analysis and Comparison ---")
+    print(f"Source CSV size: {os.path.getsize(source_data_csv) / (1024*1024):.2f} MB")
+    print(f"Row-oriented binary size: {os.path.getsize(row_oriented_binary_file) / (1024*1024):.2f} MB")
+    print(f"Columnar binary size: {os.path.getsize(columnar_binary_file) / (1024*1024):.2f} MB")
+    print("-" * 30)
+    print(f"Row-Oriented Binary Query Time: {os.path.getsize(row_oriented_binary_file) / (1024*1024):.2f} MB file -> {row_results['seconds']:.4f} seconds")
+    print(f"Columnar Binary Query Time:     {total_bytes_read_columnar / (1024*1024):.2f} MB read (estimated) -> {columnar_results['seconds']:.4f} seconds")
+    print("-" * 30)
+    print(f"Observed ru_inblock for Row-Oriented: {row_results['block_reads']}")
+    print(f"Observed ru_inblock for Columnar:     {columnar_results['block_reads']}")
+    print("-" * 30)
+    print("Reflection:")
+    print("- The columnar binary file might be slightly larger than row-oriented binary due to metadata overhead, but real Parquet uses better encoding/compression.")
+    print(f"- The Row-Oriented query had to conceptually read {os.path.getsize(row_oriented_binary_file) / (1024*1024):.2f} MB.")
+    print(f"- The Columnar query only had to read approximately {total_bytes_read_columnar / (1024*1024):.2f} MB (sum of status and value column chunks across all row groups).")
+    print("- You should observe that the Columnar query is significantly faster.")
+    print("- Even if ru_inblock is 0 (due to caching), the Columnar format reduces the amount of data transferred from cache and the CPU work needed for parsing/decoding.")
+    print("- This exercise demonstrates how metadata (footer) allows seeking and reading only relevant columnar data blocks.")
+
+
+# --- Steps ---
+
+def generate(state, force=False):
+    params = {
+        'num_rows': num_rows, 'random_seed': random_seed, 'base_timestamp_ms': base_timestamp_ms,
+        'block_rows': rows_per_row_group, 'column_definitions': column_definitions,
+        'statuses': statuses, 'categories': categories, 'description_prefixes': description_prefixes,
+        'columns_code': inspect.getsource(source_dataset),
+    }
+    run_step('Step 1', 'generate', params, module_files('datagen', 'mycol', 'row_format'), [source_data_csv],
+             write_source_csv, state, force)
+
+
+def convert(state, force=False):
+    run_step('Step 2', 'convert_row_binary', {'column_definitions': column_definitions},
+             [source_data_csv] + module_files('row_format', 'mycol'), [row_oriented_binary_file],
+             write_row_binary, state, force)
+    run_step('Step 3', 'convert_columnar', {'column_definitions': column_definitions, 'rows_per_row_group': rows_per_row_group,
+                                            'float_encoding': columnar_float_encoding, 'codec': columnar_codec,
+                                            'string_encoding': columnar_string_encoding,
+                                            'encode_code': inspect.getsource(encode_csv_column)}, # Runs in the workers
+             [source_data_csv] + module_files('mycol', 'hll'), [columnar_binary_file],
+             write_columnar_binary, state, force)
+    run_step('Step 3b', 'convert_clustered', {'cluster_by': cluster_by, 'rows_per_row_group': rows_per_row_group},
+             [columnar_binary_file] + module_files('clustering', 'mycol', 'hll'), [clustered_binary_file],
+             write_clustered_binary, state, force)
+
+
+def query(state, force=False):
+    """Run the queries (never skipped: their timings are the point) and save the measurements."""
+    results = {}
+    with tracing.span('query', step='4'):
+        results['row_binary'] = query_row_binary()
+    with tracing.span('query', step='5'):
+        results['columnar'] = query_columnar_binary()
+    with tracing.span('query', step='5b/5c'):
+        query_compound_filter()
+    with tracing.span('query', step='5d'):
+        query_dashboard_aggregates()
+    with tracing.span('query', step='5e'):
+        query_distinct_counts()
+    with tracing.span('query', step='5f'):
+        query_group_by()
+    with open(query_results_file, 'w') as f:
+        json.dump(results, f, indent=1)
+
+
+def compare(state, force=False):
+    compare_results()
+
+
+STEPS = {
+    'generate': generate,
+    'convert': convert,
+    'query': query,
+    'compare': compare,
+}
+
+
+def run(steps=tuple(STEPS), force=False):
+    """Run the named steps in pipeline order."""
+    state = load_state()
+    for name in STEPS:
+        if name in steps:
+            STEPS[name](state, force)
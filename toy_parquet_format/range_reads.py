@@ -0,0 +1,79 @@
+import io
+import os
+
+# --- Coalesced Range Reads ---
+# A reader that knows which byte ranges it needs (column chunks from a footer, pages from a
+# page index) should not pay one seek + read per range. Ranges that are adjacent or separated
+# by a small gap are merged into one larger read, and each caller gets a zero-copy memoryview
+# slice of the merged buffer. On high-latency storage the number of requests matters far
+# more than a few wasted gap bytes.
+
+DEFAULT_MAX_GAP = 64 * 1024               # Read through gaps up to this size instead of issuing a new read
+DEFAULT_MAX_READ_SIZE = 16 * 1024 * 1024  # Never grow a merged read beyond this (a single larger range is still read whole)
+
+
+def coalesce_ranges(ranges, max_gap=DEFAULT_MAX_GAP, max_read_size=DEFAULT_MAX_READ_SIZE):
+    """
+    Plan merged reads for a list of (offset, size) ranges.
+    Returns [(start, end, [indices into ranges])], sorted by start. Overlapping ranges are fine.
+    """
+    order = sorted(range(len(ranges)), key=lambda i: ranges[i][0])
+    reads = []
+    for i in order:
+        offset, size = ranges[i]
+        end = offset + size
+        if reads:
+            start, current_end, members = reads[-1]
+            if offset - current_end <= max_gap and max(end, current_end) - start <= max_read_size:
+                reads[-1] = (start, max(end, current_end), members + [i])
+                continue
+        reads.append((offset, end, [i]))
+    return reads
+
+
+def pread_into(fd, buffer, offset):
+    """Fill `buffer` from `fd` at `offset` (os.preadv / os.pread, no shared file position)."""
+    view = memoryview(buffer)
+    filled = 0
+    while filled < len(view):
+        if hasattr(os, 'preadv'):
+            n = os.preadv(fd, [view[filled:]], offset + filled)
+        else:
+            data = os.pread(fd, len(view) - filled, offset + filled)
+            n = len(data)
+            view[filled:filled + n] = data
+        if n == 0:
+            raise EOFError(f"Unexpected end of file reading {len(view)} bytes at offset {offset}")
+        filled += n
+    return view
+
+
+def read_ranges(f, ranges, max_gap=DEFAULT_MAX_GAP, max_read_size=DEFAULT_MAX_READ_SIZE, stats=None):
+    """
+    Read every (offset, size) range of an open binary file (or a raw file descriptor) with as
+    few reads as the gap and size limits allow. Returns one memoryview per range, in the order
+    of `ranges`.
+    If `stats` is a dict, 'ranges', 'reads', 'bytes_requested' and 'bytes_read' are added to it.
+    """
+    results = [None] * len(ranges)
+    plan = coalesce_ranges(ranges, max_gap, max_read_size)
+    try:
+        fd = (f if isinstance(f, int) else f.fileno()) if hasattr(os, 'pread') else None
+    except (AttributeError, io.UnsupportedOperation): # e.g. an in-memory file
+        fd = None
+    for start, end, members in plan:
+        buffer = bytearray(end - start)
+        if fd is not None:
+            view = pread_into(fd, buffer, start)
+        else:
+            f.seek(start)
+            view = memoryview(buffer)[:f.readinto(buffer)]
+        for i in members:
+            offset, size = ranges[i]
+            results[i] = view[offset - start:offset - start + size]
+    if stats is not None:
+        stats['ranges'] = stats.get('ranges', 0) + len(ranges)
+        stats['reads'] = stats.get('reads', 0) + len(plan)
+        stats['bytes_requested'] = stats.get('bytes_requested', 0) + sum(size for _, size in ranges)
+        stats['bytes_read'] = stats.get('bytes_read', 0) + sum(end - start for start, end, _ in plan)
+    return results
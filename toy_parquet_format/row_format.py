@@ -0,0 +1,275 @@
+import math
+import struct
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+import tracing
+from mycol import EMPTY_BINARY, INT_NULL, LENGTH_PREFIX, joined_data, length_prefixes
+
+# --- Row-oriented binary format ---
+# Rows are written back to back; each row is its fields in schema order, using the
+# per-value encodings from mycol.py (int '<q', float '<d', string '<i' length + bytes).
+# There is no header, index or footer: the reader must parse every field to find the next row.
+
+DEFAULT_BUFFER_SIZE = 1024 * 1024     # RowWriter flushes its output buffer at this size
+DEFAULT_BLOCK_SIZE = 4 * 1024 * 1024  # iter_row_blocks reads the file in blocks of this size
+STRUCT_CODES = {'int': 'q', 'float': 'd'}
+
+
+def fixed_width_field(values, dtype):
+    """Each value as its own 8-byte binary cell (zero copy over the NumPy buffer)."""
+    values = np.ascontiguousarray(values, dtype=dtype)
+    cells = pa.FixedSizeBinaryArray.from_buffers(pa.binary(values.itemsize), len(values), [None, pa.py_buffer(values)])
+    return cells.cast(pa.large_binary())
+
+
+def string_field(values):
+    values = values.cast(pa.large_binary())
+    lengths = pc.binary_length(values).fill_null(-1).to_numpy(zero_copy_only=False)
+    data = pc.if_else(values.is_null(), EMPTY_BINARY, values) if values.null_count else values
+    return pc.binary_join_element_wise(length_prefixes(lengths), data, EMPTY_BINARY)
+
+
+def encode_rows(columns, column_definitions):
+    """
+    Encode a block of rows. `columns` maps column name -> Arrow array (or NumPy array for
+    int/float). Returns the bytes of all rows, identical to writing
+    encoders[col_type](value) field by field, row by row.
+    """
+    fields = []
+    for col_name, col_type in column_definitions:
+        values = columns[col_name]
+        if col_type == 'int':
+            if isinstance(values, pa.Array):
+                values = values.fill_null(INT_NULL).to_numpy()
+            fields.append(fixed_width_field(values, '<i8'))
+        elif col_type == 'float':
+            if isinstance(values, pa.Array):
+                values = values.fill_null(0.0).to_numpy()
+            fields.append(fixed_width_field(values, '<f8'))
+        else:
+            if not isinstance(values, pa.Array):
+                values = pa.array(values, pa.string())
+            fields.append(string_field(values))
+    # Concatenate the fields of each row; the data buffer of the result is the row stream
+    rows = pc.binary_join_element_wise(*fields, EMPTY_BINARY)
+    return bytes(joined_data(rows))
+
+
+# --- Row-at-a-time Writer and Streaming Reader ---
+# Consecutive fixed-width columns are compiled into one struct.Struct ('<qdq' ...), so a row
+# costs one pack per run of int/float fields plus one per string, and the packed rows collect
+# in a bytearray that is written out in large pieces. The reader parses fixed-size blocks with
+# the same precompiled Structs (struct.iter_unpack when every column is fixed width) and keeps
+# only the partial row at the end of a block, so memory is bounded by the block size.
+
+def compile_row_layout(column_definitions):
+    """
+    Split a schema into segments: ('fixed', Struct, [column indices]) for each run of
+    consecutive int/float columns and ('string', None, [column index]) for each string column.
+    """
+    segments = []
+    for index, (_, col_type) in enumerate(column_definitions):
+        if col_type in STRUCT_CODES and segments and segments[-1][0] == 'fixed':
+            segments[-1][2].append(index)
+        elif col_type in STRUCT_CODES:
+            segments.append(('fixed', None, [index]))
+        else:
+            segments.append(('string', None, [index]))
+    types = [col_type for _, col_type in column_definitions]
+    return [
+        (kind, struct.Struct('<' + ''.join(STRUCT_CODES[types[i]] for i in indices)) if kind == 'fixed' else None, indices)
+        for kind, _, indices in segments
+    ]
+
+
+def to_int(value):
+    """int() as encode_int does it: None and unparsable values become the null placeholder."""
+    try:
+        return INT_NULL if value is None else int(value)
+    except (ValueError, TypeError):
+        return INT_NULL
+
+
+def to_float(value):
+    """float() as encode_float does it: None and unparsable values become 0.0 (all-zero bytes)."""
+    try:
+        return 0.0 if value is None else float(value)
+    except (ValueError, TypeError):
+        return 0.0
+
+
+class RowWriter:
+    """
+    Buffered row-oriented writer; the output is identical to writing
+    encoders[col_type](value) field by field.
+
+        with RowWriter(f, column_definitions) as writer:
+            offset = writer.write_row(['1', 'FAILED', '3.5', ...])
+
+    write_row returns the byte offset of the row, for point access with read_row_at().
+    """
+
+    def __init__(self, f, column_definitions, buffer_size=DEFAULT_BUFFER_SIZE):
+        self.f = f
+        self.segments = compile_row_layout(column_definitions)
+        kinds = [col_type for _, col_type in column_definitions]
+        self.converters = [[int if kinds[i] == 'int' else float for i in indices] for _, _, indices in self.segments]
+        self.safe_converters = [[to_int if kinds[i] == 'int' else to_float for i in indices] for _, _, indices in self.segments]
+        self.buffer = bytearray()
+        self.buffer_size = buffer_size
+        self.offset = f.tell()
+
+    def write_row(self, values):
+        """Append one row given as a sequence of values in schema order (CSV strings are fine)."""
+        row_offset = self.offset + len(self.buffer)
+        buffer = self.buffer
+        for (kind, packer, indices), converters, safe_converters in zip(self.segments, self.converters, self.safe_converters):
+            if kind == 'fixed':
+                fields = [values[i] for i in indices]
+                try:
+                    buffer += packer.pack(*[convert(v) for convert, v in zip(converters, fields)])
+                except (ValueError, TypeError): # Null or unparsable field somewhere in the run
+                    buffer += packer.pack(*[convert(v) for convert, v in zip(safe_converters, fields)])
+            else:
+                value = values[indices[0]]
+                if value is None:
+                    buffer += LENGTH_PREFIX.pack(-1)
+                else:
+                    data = value.encode('utf-8')
+                    buffer += LENGTH_PREFIX.pack(len(data))
+                    buffer += data
+        if len(buffer) >= self.buffer_size:
+            self.flush()
+        return row_offset
+
+    def flush(self):
+        if self.buffer:
+            self.f.write(self.buffer)
+            self.offset += len(self.buffer)
+            self.buffer = bytearray()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+
+
+def fixed_value(col_type, value):
+    if col_type == 'int':
+        return None if value == INT_NULL else value
+    return None if value == 0.0 and math.copysign(1.0, value) > 0 else value # All-zero bytes = null
+
+
+def parse_row(buffer, position, segments, types, wanted):
+    """
+    Parse the row starting at `position`. Returns (values, next_position), where values holds
+    the fields listed in `wanted` (column index -> output slot), or (None, position) when the
+    buffer ends inside the row. Unwanted strings are skipped without decoding.
+    """
+    values = [None] * len(wanted)
+    end = len(buffer)
+    for kind, unpacker, indices in segments:
+        if kind == 'fixed':
+            if position + unpacker.size > end:
+                return None, position
+            fields = unpacker.unpack_from(buffer, position)
+            position += unpacker.size
+            for index, value in zip(indices, fields):
+                if index in wanted:
+                    values[wanted[index]] = fixed_value(types[index], value)
+        else:
+            if position + 4 > end:
+                return None, position
+            (length,) = LENGTH_PREFIX.unpack_from(buffer, position)
+            position += 4
+            if length > 0: # -1 = null
+                if position + length > end:
+                    return None, position
+                if indices[0] in wanted:
+                    values[wanted[indices[0]]] = str(buffer[position:position + length], 'utf-8')
+                position += length
+            elif length == 0 and indices[0] in wanted:
+                values[wanted[indices[0]]] = ''
+    return values, position
+
+
+def iter_row_blocks(f, column_definitions, columns=None, block_size=DEFAULT_BLOCK_SIZE, stats=None):
+    """
+    Stream a row-oriented file in blocks of block_size bytes, yielding one list of row tuples
+    (only `columns`, in that order; all columns by default) per block. A row cut by the end of
+    a block is carried over to the next one. stats (a dict) receives 'bytes_read' and 'rows'.
+    """
+    names = [name for name, _ in column_definitions]
+    types = [col_type for _, col_type in column_definitions]
+    columns = names if columns is None else list(columns)
+    wanted = {names.index(name): slot for slot, name in enumerate(columns)}
+    segments = compile_row_layout(column_definitions)
+    stats = {} if stats is None else stats
+    stats.setdefault('bytes_read', 0)
+    stats.setdefault('rows', 0)
+
+    if len(segments) == 1 and segments[0][0] == 'fixed':
+        # Every column is fixed width: whole rows unpack with one Struct
+        unpacker = segments[0][1]
+        block_size = max(block_size // unpacker.size, 1) * unpacker.size
+        picks = list(wanted)
+        while True:
+            block = f.read(block_size)
+            stats['bytes_read'] += len(block)
+            if not block:
+                return
+            if len(block) % unpacker.size:
+                raise ValueError(f"Truncated row at the end of the file ({len(block) % unpacker.size} bytes left).")
+            rows = [tuple(fixed_value(types[i], row[i]) for i in picks) for row in unpacker.iter_unpack(block)]
+            stats['rows'] += len(rows)
+            yield rows
+
+    carry = b''
+    while True:
+        with tracing.span('read', bytes=block_size):
+            block = f.read(block_size)
+        stats['bytes_read'] += len(block)
+        if not block:
+            if carry:
+                raise ValueError(f"Truncated row at the end of the file ({len(carry)} bytes left).")
+            return
+        buffer = memoryview(carry + block if carry else block)
+        rows = []
+        position = 0
+        with tracing.span('decode') as span:
+            while True:
+                values, next_position = parse_row(buffer, position, segments, types, wanted)
+                if values is None:
+                    break
+                rows.append(tuple(values))
+                position = next_position
+                if position == len(buffer):
+                    break
+            span.set(rows=len(rows))
+        carry = bytes(buffer[position:])
+        stats['rows'] += len(rows)
+        if rows:
+            yield rows
+
+
+def read_row_at(f, offset, column_definitions, columns=None):
+    """Point access: decode the single row starting at byte `offset` (as returned by RowWriter.write_row)."""
+    names = [name for name, _ in column_definitions]
+    columns = names if columns is None else list(columns)
+    wanted = {names.index(name): slot for slot, name in enumerate(columns)}
+    segments = compile_row_layout(column_definitions)
+    types = [col_type for _, col_type in column_definitions]
+    size = 4096
+    while True:
+        f.seek(offset)
+        buffer = f.read(size)
+        values, _ = parse_row(memoryview(buffer), 0, segments, types, wanted)
+        if values is not None:
+            return tuple(values)
+        if len(buffer) < size:
+            raise ValueError(f"No complete row at offset {offset}.")
+        size *= 2
@@ -0,0 +1,382 @@
+import bisect
+import re
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+import tracing
+from mycol import INT_NULL, chunk_to_arrow, read_chunk, read_footer, string_positions
+
+# --- Selection Vectors for Compound Filters ---
+# Within a row group the selection is a NumPy array of row indices. The first predicate is
+# evaluated over the whole chunk; every later predicate only looks at the rows still selected,
+# and its column chunk is not even read once the selection is empty. Output columns are read
+# last and only the selected rows are materialized (late materialization).
+
+PREDICATE_PATTERN = re.compile(r'^\s*(\w+)\s*(?:(==|!=|<=|>=|=|<|>)|\s(in)\s)\s*(.+?)\s*$', re.IGNORECASE)
+
+TYPE_COST = {'int': 1.0, 'float': 1.0, 'string': 4.0} # Relative per-row cost of evaluating a predicate
+OP_SELECTIVITY = {'=': 0.1, 'in': 0.25, '!=': 0.9, '<': 0.5, '<=': 0.5, '>': 0.5, '>=': 0.5} # Guessed pass rate until observed
+
+COMPARISONS = {
+    '=': np.equal, '!=': np.not_equal,
+    '<': np.less, '<=': np.less_equal, '>': np.greater, '>=': np.greater_equal,
+}
+ARROW_COMPARISONS = { # Same comparisons over an Arrow string dictionary (UTF-8 byte order = code point order)
+    '=': pc.equal, '!=': pc.not_equal,
+    '<': pc.less, '<=': pc.less_equal, '>': pc.greater, '>=': pc.greater_equal,
+}
+
+
+def parse_predicate(text, col_types):
+    """'status=FAILED', 'value > 100', 'category in A,B' -> (column, op, value); 'in' values are a tuple."""
+    match = PREDICATE_PATTERN.match(text)
+    if not match:
+        raise ValueError(f"Cannot parse predicate: {text!r}")
+    column, op, in_op, raw_value = match.groups()
+    if column not in col_types:
+        raise ValueError(f"Unknown column in predicate: {column!r}")
+    op = '=' if op == '==' else (op or in_op.lower())
+    cast = {'int': int, 'float': float, 'string': str}[col_types[column]]
+    if op == 'in':
+        return column, op, tuple(cast(v.strip()) for v in raw_value.split(','))
+    return column, op, cast(raw_value)
+
+
+def order_predicates(predicates, col_types, observed=None):
+    """
+    Cheapest / most selective first: rank = cost per row / fraction of rows removed.
+    `observed` maps predicate -> [rows_in, rows_out] from earlier row groups and replaces the guess.
+    """
+    observed = observed or {}
+
+    def rank(predicate):
+        rows_in, rows_out = observed.get(predicate, (0, 0))
+        pass_rate = rows_out / rows_in if rows_in else OP_SELECTIVITY[predicate[1]]
+        return TYPE_COST[col_types[predicate[0]]] / max(1.0 - pass_rate, 1e-6)
+
+    return sorted(predicates, key=rank)
+
+
+def zone_may_match(chunk_info, predicate):
+    """False if the chunk's recorded min/max prove that no value can satisfy predicate."""
+    if 'min' not in chunk_info:
+        return True # No zone map for this chunk
+    low, high = chunk_info['min'], chunk_info['max']
+    if low is None:
+        return False # All null, and nulls never match
+    _, op, value = predicate
+    if op == '=':
+        return low <= value <= high
+    if op == 'in':
+        return any(low <= v <= high for v in value)
+    if op == '!=':
+        return not (low == high == value)
+    if op == '<':
+        return low < value
+    if op == '<=':
+        return low <= value
+    if op == '>':
+        return high > value
+    return high >= value # '>='
+
+
+def zone_covers(chunk_info, predicate):
+    """True if the chunk's footer aggregates prove that every row satisfies predicate."""
+    if 'non_null' not in chunk_info or chunk_info['non_null'] < chunk_info['count'] or chunk_info['min'] is None:
+        return False # Unknown, or nulls present (a null never matches)
+    low, high = chunk_info['min'], chunk_info['max']
+    _, op, value = predicate
+    if op == '=':
+        return low == high == value
+    if op == 'in':
+        return low == high and low in value
+    if op == '!=':
+        return high < value or low > value
+    if op == '<':
+        return high < value
+    if op == '<=':
+        return high <= value
+    if op == '>':
+        return low > value
+    return low >= value # '>='
+
+
+# --- Chunk Access ---
+
+def fixed_width_values(col_type, chunk_bytes, num_rows):
+    """(values, valid) NumPy views of an int/float chunk; nulls are the format's placeholders."""
+    if col_type == 'int':
+        values = np.frombuffer(chunk_bytes, dtype='<i8', count=num_rows)
+        return values, values != INT_NULL
+    values = np.frombuffer(chunk_bytes, dtype='<f8', count=num_rows)
+    return values, values.view('<u8') != 0 # All-zero bytes = null placeholder
+
+
+def strings_equal(chunk_array, starts, lengths, rows, value):
+    """Boolean mask over `rows`: string at row == value, compared as bytes without decoding."""
+    value_bytes = value.encode('utf-8')
+    mask = lengths[rows] == len(value_bytes)
+    if value_bytes and mask.any():
+        candidates = rows[mask]
+        gathered = chunk_array[starts[candidates][:, None] + np.arange(len(value_bytes))]
+        mask[mask] = (gathered == np.frombuffer(value_bytes, dtype=np.uint8)).all(axis=1)
+    return mask
+
+
+def decode_strings(chunk_bytes, starts, lengths, rows):
+    view = memoryview(chunk_bytes)
+    return [None if lengths[i] < 0 else str(view[starts[i]:starts[i] + lengths[i]], 'utf-8') for i in rows]
+
+
+class ChunkView:
+    """
+    One column chunk of a row group, decoded lazily from its bytes (string offsets computed at
+    most once). decode() instead converts the whole chunk up front - int/float values and
+    validity as NumPy arrays, strings as dictionary codes - and drops the bytes; that is the
+    form chunk_cache.py keeps between queries.
+    """
+
+    def __init__(self, col_type, chunk_bytes, num_rows):
+        self.col_type = col_type
+        self.chunk_bytes = chunk_bytes
+        self.num_rows = num_rows
+        self._fixed = None
+        self._positions = None
+        self.dictionary = None # Distinct strings (pa.StringArray), once decoded
+        self.codes = None      # Per row index into dictionary (int32), -1 = null
+
+    def fixed(self):
+        if self._fixed is None:
+            self._fixed = fixed_width_values(self.col_type, self.chunk_bytes, self.num_rows)
+        return self._fixed
+
+    def positions(self):
+        if self._positions is None:
+            self._positions = string_positions(self.chunk_bytes, self.num_rows)
+        return self._positions
+
+    def decode(self):
+        if self.col_type != 'string':
+            values, valid = self.fixed()
+            self._fixed = (values.copy(), valid) # Own the values instead of viewing the read buffer
+        else:
+            encoded = chunk_to_arrow(self.col_type, self.chunk_bytes, self.num_rows).dictionary_encode()
+            self.dictionary = encoded.dictionary
+            self.codes = encoded.indices.fill_null(-1).to_numpy(zero_copy_only=False)
+            self._positions = None
+        self.chunk_bytes = None
+        return self
+
+    def nbytes(self):
+        """Memory held by the view: the chunk bytes and/or what has been decoded from them."""
+        size = len(self.chunk_bytes) if self.chunk_bytes is not None else 0
+        if self._fixed is not None:
+            size += self._fixed[1].nbytes + (self._fixed[0].nbytes if self.chunk_bytes is None else 0)
+        if self._positions is not None:
+            size += self._positions[0].nbytes + self._positions[1].nbytes
+        if self.codes is not None:
+            size += self.codes.nbytes + self.dictionary.nbytes
+        return size
+
+    def filter(self, predicate, rows):
+        """The subset of `rows` (int64 row indices) whose value satisfies predicate. Nulls never match."""
+        _, op, value = predicate
+        if self.col_type != 'string':
+            values, valid = self.fixed()
+            values, valid = values[rows], valid[rows]
+            matches = np.isin(values, value) if op == 'in' else COMPARISONS[op](values, value)
+            return rows[matches & valid]
+
+        if self.codes is not None:
+            # Evaluate once per distinct string, then look every row's code up (code -1 = null -> False)
+            if op == 'in':
+                matches = pc.is_in(self.dictionary, value_set=pa.array(list(value), pa.string()))
+            else:
+                matches = ARROW_COMPARISONS[op](self.dictionary, value)
+            matches = np.append(matches.to_numpy(zero_copy_only=False), False)
+            return rows[matches[self.codes[rows]]]
+
+        starts, lengths = self.positions()
+        if op in ('=', '!=', 'in'):
+            chunk_array = np.frombuffer(self.chunk_bytes, dtype=np.uint8)
+            candidates = value if op == 'in' else (value,)
+            mask = np.zeros(len(rows), dtype=bool)
+            for candidate in candidates:
+                mask |= strings_equal(chunk_array, starts, lengths, rows, candidate)
+            if op == '!=':
+                mask = ~mask & (lengths[rows] >= 0)
+            return rows[mask]
+        # Ordering comparisons on strings: decode only the rows still selected
+        compare = COMPARISONS[op]
+        decoded = decode_strings(self.chunk_bytes, starts, lengths, rows)
+        return rows[np.array([s is not None and bool(compare(s, value)) for s in decoded], dtype=bool)]
+
+    def sorted_range(self, predicate):
+        """
+        For a chunk sorted ascending (nulls last) on this column, binary search the row range
+        [start, end) outside which predicate cannot hold. Returns (start, end, more_beyond):
+        more_beyond is True when non-null values above the predicate's upper bound follow the range.
+        """
+        _, op, value = predicate
+        if self.col_type != 'string':
+            values, valid = self.fixed()
+            num_valid = self.num_rows if valid.all() else int(np.argmin(valid))
+            keys = values[:num_valid]
+
+            def search(v, side):
+                return int(np.searchsorted(keys, v, side))
+        else:
+            if self.codes is not None:
+                valid = self.codes >= 0
+
+                def key(i):
+                    return self.dictionary[int(self.codes[i])].as_py()
+            else:
+                starts, lengths = self.positions()
+                valid = lengths >= 0
+                view = memoryview(self.chunk_bytes)
+
+                def key(i):
+                    return str(view[starts[i]:starts[i] + lengths[i]], 'utf-8')
+            num_valid = self.num_rows if valid.all() else int(np.argmin(valid))
+
+            def search(v, side):
+                probe = bisect.bisect_left if side == 'left' else bisect.bisect_right
+                return probe(range(num_valid), v, key=key)
+
+        if op in ('=', 'in'):
+            low, high = (min(value), max(value)) if op == 'in' else (value, value)
+            start, end = search(low, 'left'), search(high, 'right')
+        elif op == '<':
+            start, end = 0, search(value, 'left')
+        elif op == '<=':
+            start, end = 0, search(value, 'right')
+        elif op == '>':
+            start, end = search(value, 'right'), num_valid
+        elif op == '>=':
+            start, end = search(value, 'left'), num_valid
+        else: # '!=' narrows nothing
+            start, end = 0, num_valid
+        return start, end, end < num_valid
+
+    def materialize(self, rows):
+        """Arrow array of the selected rows only."""
+        if self.col_type != 'string':
+            values, valid = self.fixed()
+            return pa.array(values[rows], mask=~valid[rows])
+        if self.codes is not None:
+            codes = self.codes[rows]
+            return self.dictionary.take(pa.array(codes, mask=codes < 0))
+        starts, lengths = self.positions()
+        return pa.array(decode_strings(self.chunk_bytes, starts, lengths, rows), pa.string())
+
+
+# --- Query ---
+
+def filter_columnar_file(path, predicates, columns, metadata=None, read=None, cache=None, file_id=None):
+    """
+    SELECT columns FROM path WHERE p1 AND p2 ... over a MYCOL1 file.
+    Predicates are re-ordered after every row group using the pass rates seen so far.
+    Row groups whose zone maps (chunk min/max) rule a predicate out are not read. If the footer
+    records a sort order, predicates on its first column are answered by binary search within
+    the chunk, and with a file-wide order the scan stops at the first row past the upper bound.
+    `metadata` (the parsed footer) and `read` (chunk_info -> bytes) let a caller that already
+    holds them (see service.py) skip opening the file; with a `cache` (chunk_cache.ChunkCache)
+    decoded chunks are reused across queries, keyed by `file_id` (ChunkCache.file_id of the
+    descriptor `read` uses; required with a cache and a `read`). Returns (pyarrow.Table, report).
+    """
+    if read is None:
+        with open(path, 'rb') as f:
+            return filter_columnar_file(path, predicates, columns, metadata or read_footer(f), lambda info: read_chunk(f, info),
+                                        cache, cache.file_id(path, f.fileno()) if cache is not None else None)
+
+    report = {
+        'row_groups': 0,
+        'row_groups_pruned_zone_map': 0,
+        'row_groups_after_early_stop': 0, # Never visited: a file-wide sort order proved them out of range
+        'rows_skipped_binary_search': 0,
+        'row_groups_emptied': 0, # Selection became empty before all predicates / outputs were read
+        'chunks_read': 0,
+        'chunks_cached': 0,      # Decoded chunks served by the cache
+        'chunks_skipped': 0,     # Chunks never read because the selection was already empty
+        'bytes_read': 0,
+        'rows_selected': 0,
+    }
+    col_types = {name: col_type for name, col_type in metadata['columns']}
+    observed = {predicate: [0, 0] for predicate in predicates}
+    pieces = {name: [] for name in columns}
+    sort_order = metadata.get('sort_order')
+    sort_column = sort_order['columns'][0] if sort_order else None
+    range_predicates = [p for p in predicates if p[0] == sort_column]
+    if cache is not None and file_id is None:
+        raise ValueError("A chunk cache needs the file_id of the descriptor `read` reads from")
+
+    for rg_index, rg_metadata in enumerate(metadata['row_groups']):
+        report['row_groups'] += 1
+        num_rows = rg_metadata['num_rows_in_group']
+        views = {}
+        if not all(zone_may_match(rg_metadata['column_chunks'][p[0]], p) for p in predicates):
+            report['row_groups_pruned_zone_map'] += 1
+            continue
+
+        def chunk(name):
+            if name not in views:
+                view = cache.get((file_id, rg_index, name)) if cache is not None else None
+                if view is not None:
+                    report['chunks_cached'] += 1
+                else:
+                    chunk_info = rg_metadata['column_chunks'][name]
+                    with tracing.span('read', row_group=rg_index, column=name, bytes=chunk_info['size']):
+                        chunk_bytes = read(chunk_info)
+                    report['chunks_read'] += 1
+                    report['bytes_read'] += chunk_info['size']
+                    view = ChunkView(col_types[name], chunk_bytes, num_rows)
+                    if cache is not None:
+                        cache.put((file_id, rg_index, name), view)
+                views[name] = view
+            return views[name]
+
+        start, end, stop_after = 0, num_rows, False
+        for predicate in range_predicates:
+            view = chunk(sort_column)
+            with tracing.span('filter', row_group=rg_index, column=sort_column, rows=num_rows, binary_search=True):
+                low, high, more_beyond = view.sorted_range(predicate)
+            start, end = max(start, low), min(end, high)
+            stop_after |= more_beyond and sort_order['scope'] == 'file'
+        report['rows_skipped_binary_search'] += num_rows - max(end - start, 0)
+        rows = np.arange(start, max(start, end), dtype=np.int64)
+
+        for predicate in order_predicates(predicates, col_types, observed):
+            if not len(rows):
+                break
+            rows_in = len(rows)
+            view = chunk(predicate[0])
+            with tracing.span('filter', row_group=rg_index, column=predicate[0], rows=rows_in) as span:
+                rows = view.filter(predicate, rows)
+                span.set(rows_out=len(rows))
+            observed[predicate][0] += rows_in
+            observed[predicate][1] += len(rows)
+        if not len(rows):
+            report['row_groups_emptied'] += 1
+            needed = set(columns) | {p[0] for p in predicates}
+            report['chunks_skipped'] += len(needed - set(views))
+        else:
+            report['rows_selected'] += len(rows)
+            for name in columns:
+                view = chunk(name)
+                with tracing.span('decode', row_group=rg_index, column=name, rows=len(rows)):
+                    pieces[name].append(view.materialize(rows))
+
+        if stop_after: # Everything after this point sorts above a predicate's upper bound
+            report['row_groups_after_early_stop'] = len(metadata['row_groups']) - rg_index - 1
+            break
+
+    report['predicate_order'] = order_predicates(predicates, col_types, observed)
+    report['pass_rates'] = {p: (out / seen if seen else None) for p, (seen, out) in observed.items()}
+    arrays = {}
+    for name in columns:
+        arrow_type = pa.string() if col_types[name] == 'string' else (pa.int64() if col_types[name] == 'int' else pa.float64())
+        arrays[name] = pa.concat_arrays(pieces[name]) if pieces[name] else pa.array([], arrow_type)
+    return pa.table(arrays), report
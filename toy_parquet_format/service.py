@@ -0,0 +1,327 @@
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import json
+import os
+import random
+import struct
+import threading
+import time
+
+import numpy as np
+
+from chunk_cache import ChunkCache
+from metadata_query import aggregate_columnar_file, aggregate_columnar_states, parse_aggregate
+from mycol import FOOTER_MAGIC, FOOTER_POINTER_SIZE, load_chunk
+from range_reads import pread_into, read_ranges
+from selection import filter_columnar_file, parse_predicate
+
+# --- Concurrent Query Service ---
+# filter_columnar_file / aggregate_columnar_file open the file, parse the footer and seek+read
+# per query, so one open file cannot be shared between threads and every small query pays
+# for the footer again. ColumnarFileService keeps the shared state instead:
+#   - parsed footers, cached per file and re-parsed only when the file's size/mtime changes;
+#   - a bounded pool of read-only descriptors (least recently used idle ones are closed);
+#   - position-independent os.pread reads, so every query shares one descriptor per file;
+#   - a thread pool that bounds how many queries run at once (also usable from asyncio);
+#   - per-query latency metrics (queue wait + execution);
+#   - optionally a ChunkCache (chunk_cache.py) of decoded chunks shared by all queries.
+
+# --- Configuration ---
+columnar_binary_file = 'columnar_data.bin' # Written by main.py (Step 3)
+default_max_open_files = 64
+default_max_concurrency = 8
+default_footer_cache_size = 128
+
+QUERY_KINDS = { # kind -> function(path, *args, metadata=, read=, cache=, file_id=)
+    'filter': filter_columnar_file,
+    'aggregate': aggregate_columnar_file,
+    'aggregate_states': aggregate_columnar_states,
+}
+
+
+def same_file(stat, other):
+    return (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns) == \
+        (other.st_dev, other.st_ino, other.st_size, other.st_mtime_ns)
+
+
+class FilePool:
+    """
+    Bounded pool of read-only file descriptors, one per file, shared by all readers.
+    A descriptor whose path now names a different or changed file (e.g. replaced with
+    os.replace by compact()) is retired: new queries get a fresh one, and the old one is
+    closed once its last user releases it.
+    """
+
+    def __init__(self, max_open=default_max_open_files):
+        self.max_open = max_open
+        self.open_files = collections.OrderedDict() # path -> [fd, users], least recently used first
+        self.retired = {} # fd -> users, for descriptors of replaced files still in use
+        self.condition = threading.Condition()
+
+    def acquire(self, path):
+        """A descriptor of the file currently at `path`; hand it back with release(path, fd)."""
+        with self.condition:
+            while True:
+                entry = self.open_files.get(path)
+                if entry is not None and not same_file(os.stat(path), os.fstat(entry[0])):
+                    del self.open_files[path]
+                    if entry[1]:
+                        self.retired[entry[0]] = entry[1]
+                    else:
+                        os.close(entry[0])
+                    entry = None
+                if entry is not None:
+                    entry[1] += 1
+                    self.open_files.move_to_end(path)
+                    return entry[0]
+                if len(self.open_files) < self.max_open or self.close_idle():
+                    fd = os.open(path, os.O_RDONLY)
+                    self.open_files[path] = [fd, 1]
+                    return fd
+                self.condition.wait() # Every descriptor is busy: wait for a release
+
+    def release(self, path, fd):
+        with self.condition:
+            entry = self.open_files.get(path)
+            if entry is not None and entry[0] == fd:
+                entry[1] -= 1
+            else:
+                self.retired[fd] -= 1
+                if not self.retired[fd]:
+                    del self.retired[fd]
+                    os.close(fd)
+            self.condition.notify_all()
+
+    def close_idle(self):
+        """Close the least recently used idle descriptor. Returns False if all are in use."""
+        for path, (fd, users) in self.open_files.items():
+            if users == 0:
+                del self.open_files[path]
+                os.close(fd)
+                return True
+        return False
+
+    def close(self):
+        with self.condition:
+            for fd in [fd for fd, _ in self.open_files.values()] + list(self.retired):
+                os.close(fd)
+            self.open_files.clear()
+            self.retired.clear()
+
+
+class ColumnarFileService:
+    """
+    Long-lived query service over MYCOL1 files:
+
+        with ColumnarFileService(max_concurrency=8) as service:
+            table, report = service.filter(path, predicates, ['value'])           # calling thread
+            future = service.submit('aggregate', path, aggregates, predicates)    # thread pool
+            result = await service.run_async('filter', path, predicates, ['value'])  # asyncio
+
+    Predicates and aggregates are parsed tuples (selection.parse_predicate, parse_aggregate).
+    """
+
+    def __init__(self, max_open_files=default_max_open_files, max_concurrency=default_max_concurrency,
+                 footer_cache_size=default_footer_cache_size, max_latency_samples=100000, chunk_cache=None):
+        self.files = FilePool(max_open_files)
+        self.chunk_cache = chunk_cache
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='mycol-query')
+        self.footers = collections.OrderedDict() # path -> (os.stat_result, metadata)
+        self.footer_cache_size = footer_cache_size
+        self.lock = threading.Lock()
+        self.latencies = collections.deque(maxlen=max_latency_samples) # (kind, queued_seconds, run_seconds)
+        self.counters = collections.Counter() # footer_hits, footer_misses, reads, bytes_read, errors
+        self.started = time.perf_counter()
+
+    # --- File access ---
+
+    def footer(self, path, fd):
+        """Parsed footer of `path`, from the cache unless the file changed since it was parsed."""
+        stat = os.fstat(fd)
+        with self.lock:
+            cached = self.footers.get(path)
+            if cached and same_file(cached[0], stat):
+                self.footers.move_to_end(path)
+                self.counters['footer_hits'] += 1
+                return cached[1]
+        tail = pread_into(fd, bytearray(FOOTER_POINTER_SIZE), stat.st_size - FOOTER_POINTER_SIZE)
+        if bytes(tail[8:]) != FOOTER_MAGIC:
+            raise ValueError(f"Invalid footer magic number in '{path}'.")
+        footer_offset = struct.unpack_from('<q', tail)[0]
+        footer_size = stat.st_size - FOOTER_POINTER_SIZE - footer_offset
+        metadata = json.loads(bytes(pread_into(fd, bytearray(footer_size), footer_offset)).decode('utf-8'))
+        with self.lock:
+            self.counters['footer_misses'] += 1
+            self.footers[path] = (stat, metadata)
+            while len(self.footers) > self.footer_cache_size:
+                self.footers.popitem(last=False)
+        return metadata
+
+    def reader(self, fd):
+        """chunk_info -> plain chunk bytes via pread: no file position, safe from any number of threads."""
+        def read(chunk_info):
+            view, = read_ranges(fd, [(chunk_info['offset'], chunk_info['size'])])
+            with self.lock:
+                self.counters['reads'] += 1
+                self.counters['bytes_read'] += chunk_info['size']
+            return load_chunk(chunk_info, view)
+        return read
+
+    def run(self, kind, path, *args):
+        """Run one query in the calling thread: kind is one of QUERY_KINDS."""
+        if kind not in QUERY_KINDS:
+            raise ValueError(f"Unknown query kind: {kind!r}")
+        fd = self.files.acquire(path)
+        try:
+            metadata = self.footer(path, fd)
+            file_id = self.chunk_cache.file_id(path, fd) if self.chunk_cache is not None else None
+            return QUERY_KINDS[kind](path, *args, metadata=metadata, read=self.reader(fd), cache=self.chunk_cache,
+                                     file_id=file_id)
+        finally:
+            self.files.release(path, fd)
+
+    def filter(self, path, predicates, columns):
+        return self.run('filter', path, predicates, columns)
+
+    def aggregate(self, path, aggregates, predicates=()):
+        return self.run('aggregate', path, aggregates, predicates)
+
+    # --- Concurrency ---
+
+    def timed(self, kind, submitted, path, args):
+        started = time.perf_counter()
+        try:
+            return self.run(kind, path, *args)
+        except Exception:
+            with self.lock:
+                self.counters['errors'] += 1
+            raise
+        finally:
+            finished = time.perf_counter()
+            self.latencies.append((kind, started - submitted, finished - started))
+
+    def submit(self, kind, path, *args):
+        """Queue a query on the service's thread pool (at most max_concurrency run at once). Returns a Future."""
+        return self.executor.submit(self.timed, kind, time.perf_counter(), path, args)
+
+    async def run_async(self, kind, path, *args):
+        """Await a query from asyncio; it runs on the service's thread pool."""
+        return await asyncio.wrap_future(self.submit(kind, path, *args))
+
+    def metrics(self):
+        """Query count, throughput and latency percentiles (ms, queue wait included) per kind."""
+        samples = list(self.latencies)
+        summary = {'elapsed_seconds': time.perf_counter() - self.started, **self.counters}
+        if self.chunk_cache is not None:
+            summary['chunk_cache'] = self.chunk_cache.stats()
+        for kind in sorted({sample[0] for sample in samples}):
+            queued = np.array([q for k, q, _ in samples if k == kind]) * 1000
+            running = np.array([r for k, _, r in samples if k == kind]) * 1000
+            total = queued + running
+            summary[kind] = {
+                'queries': len(total),
+                'p50_ms': float(np.percentile(total, 50)),
+                'p95_ms': float(np.percentile(total, 95)),
+                'p99_ms': float(np.percentile(total, 99)),
+                'max_ms': float(total.max()),
+                'mean_queue_ms': float(queued.mean()),
+                'p50_run_ms': float(np.percentile(running, 50)),
+            }
+        return summary
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.files.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+# --- Load Test ---
+
+def random_queries(col_types, num_rows, count, seed=0):
+    """Small dashboard-style queries: narrow id ranges, with a filter or an aggregate."""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        low = rng.randrange(max(num_rows - 1000, 1))
+        predicates = [parse_predicate(f"id >= {low}", col_types), parse_predicate(f"id < {low + 1000}", col_types)]
+        if rng.random() < 0.5:
+            queries.append(('filter', predicates, ['value']))
+        else:
+            queries.append(('aggregate', [parse_aggregate('count(*)', col_types), parse_aggregate('sum(value)', col_types)], predicates))
+    return queries
+
+
+def print_metrics(label, metrics, duration, count):
+    print(f"\n  {label}: {count} queries in {duration:.2f} s ({count / duration:.0f} queries/s)")
+    for kind in ('filter', 'aggregate'):
+        if kind in metrics:
+            m = metrics[kind]
+            print(f"    {kind:<10} p50 {m['p50_ms']:.2f} ms, p95 {m['p95_ms']:.2f} ms, p99 {m['p99_ms']:.2f} ms, "
+                  f"max {m['max_ms']:.2f} ms (queue wait {m['mean_queue_ms']:.2f} ms, run p50 {m['p50_run_ms']:.2f} ms)")
+    print(f"    Footer cache: {metrics.get('footer_hits', 0)} hits, {metrics.get('footer_misses', 0)} misses; "
+          f"{metrics.get('reads', 0)} chunk reads, {metrics.get('bytes_read', 0) / (1024*1024):.1f} MB")
+    if 'chunk_cache' in metrics:
+        cache = metrics['chunk_cache']
+        print(f"    Chunk cache: {cache['hits']} hits, {cache['misses']} misses, {cache['evictions']} evictions, "
+              f"{cache['bytes'] / (1024*1024):.1f} MB")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fire many small concurrent queries at MYCOL1 files through ColumnarFileService.")
+    parser.add_argument('files', nargs='*', default=[columnar_binary_file])
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=default_max_concurrency)
+    parser.add_argument('--max-open-files', type=int, default=default_max_open_files)
+    parser.add_argument('--mode', choices=['threads', 'asyncio'], default='threads')
+    parser.add_argument('--cache-mb', type=float, default=0, help="Decoded chunk cache budget (0 = no cache)")
+    args = parser.parse_args()
+
+    for path in args.files:
+        if not os.path.exists(path):
+            print(f"Error: {path} not found. Run main.py (steps 1-3) first.")
+            raise SystemExit(1)
+
+    with open(args.files[0], 'rb') as f:
+        from mycol import read_footer
+        metadata = read_footer(f)
+    col_types = dict(tuple(col) for col in metadata['columns'])
+    workload = [(args.files[i % len(args.files)],) + query
+                for i, query in enumerate(random_queries(col_types, metadata['num_rows'], args.queries))]
+
+    print(f"\n--- {args.queries} small queries over {len(args.files)} file(s), concurrency {args.concurrency} ---")
+
+    # Baseline: every query opens the file and parses the footer itself
+    start_time = time.perf_counter()
+    baseline_latencies = []
+    for path, kind, *query_args in workload:
+        query_start = time.perf_counter()
+        if kind == 'filter':
+            filter_columnar_file(path, *query_args)
+        else:
+            aggregate_columnar_file(path, *query_args)
+        baseline_latencies.append((time.perf_counter() - query_start) * 1000)
+    duration = time.perf_counter() - start_time
+    print(f"\n  Open + parse footer per query (sequential): {len(workload)} queries in {duration:.2f} s "
+          f"({len(workload) / duration:.0f} queries/s), p50 {np.percentile(baseline_latencies, 50):.2f} ms, "
+          f"p99 {np.percentile(baseline_latencies, 99):.2f} ms")
+
+    chunk_cache = ChunkCache(int(args.cache_mb * 1024 * 1024)) if args.cache_mb else None
+    with ColumnarFileService(args.max_open_files, args.concurrency, chunk_cache=chunk_cache) as service:
+        start_time = time.perf_counter()
+        if args.mode == 'threads':
+            futures = [service.submit(kind, path, *query_args) for path, kind, *query_args in workload]
+            for future in futures:
+                future.result()
+        else:
+            async def fire():
+                await asyncio.gather(*(service.run_async(kind, path, *query_args) for path, kind, *query_args in workload))
+            asyncio.run(fire())
+        duration = time.perf_counter() - start_time
+        print_metrics(f"ColumnarFileService ({args.mode})", service.metrics(), duration, len(workload))
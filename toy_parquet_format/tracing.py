@@ -0,0 +1,185 @@
+import contextlib
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+
+# --- Tracing ---
+# Readers wrap their phases in nested spans:
+#
+#     with tracing.span('read', row_group=i, column=name, bytes=size):
+#         ...
+#
+# With tracing off (the default) span() returns a shared no-op object, so an instrumented hot
+# path costs one global lookup per span. While a Tracer is active every span becomes a Chrome
+# trace event (open the JSON in chrome://tracing or ui.perfetto.dev). Spans that name a
+# `column` also add their time, bytes and rows to per-(row group, column) counters. A tracer
+# can additionally run cProfile (calling thread only) and tracemalloc (net bytes allocated
+# per span).
+
+PHASES = ('footer', 'read', 'decode', 'filter', 'aggregate') # Summary column order; other span names follow
+
+active = None # The Tracer collecting spans, or None when tracing is off
+
+
+class NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+def span(name, **args):
+    """Context manager timing one phase; args (row_group, column, bytes, rows ...) go into the trace."""
+    if active is None:
+        return NULL_SPAN
+    return Span(active, name, args)
+
+
+def count(name, row_group, column, **values):
+    """Add values (bytes, rows ...) to a (row group, column) counter without timing a span."""
+    if active is not None:
+        active.count(name, row_group, column, values)
+
+
+class Span:
+    __slots__ = ('tracer', 'name', 'args', 'start', 'memory')
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        if self.tracer.track_allocations:
+            self.memory = tracemalloc.get_traced_memory()[0]
+        self.start = time.perf_counter_ns()
+        return self
+
+    def set(self, **args):
+        """Attach values only known inside the span (e.g. rows selected)."""
+        self.args.update(args)
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter_ns() - self.start
+        if self.tracer.track_allocations:
+            self.args['alloc_bytes'] = tracemalloc.get_traced_memory()[0] - self.memory
+        self.tracer.record(self.name, self.start, duration, self.args)
+        return False
+
+
+class Tracer:
+    def __init__(self, profile=False, track_allocations=False):
+        self.profile = profile
+        self.track_allocations = track_allocations
+        self.events = []   # Chrome trace 'X' events (list.append is atomic, spans may come from any thread)
+        self.totals = {}   # span name -> [calls, nanoseconds]
+        self.counters = {} # (row_group, column) -> {span name: {'seconds', 'bytes', 'rows', 'alloc_bytes'}}
+        self.lock = threading.Lock()
+        self.profiler = None
+        self.origin = time.perf_counter_ns()
+
+    def start(self):
+        global active
+        if self.track_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if self.profile:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        active = self
+        return self
+
+    def stop(self):
+        global active
+        active = None
+        if self.profiler is not None:
+            self.profiler.disable()
+        if self.track_allocations and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def record(self, name, start, duration, args):
+        self.events.append({
+            'name': name, 'cat': 'mycol', 'ph': 'X', 'pid': os.getpid(), 'tid': threading.get_ident(),
+            'ts': (start - self.origin) / 1000, 'dur': duration / 1000, 'args': args,
+        })
+        with self.lock:
+            total = self.totals.setdefault(name, [0, 0])
+            total[0] += 1
+            total[1] += duration
+        if 'column' in args:
+            self.count(name, args.get('row_group'), args['column'], dict(args, seconds=duration / 1e9))
+
+    def count(self, name, row_group, column, values):
+        with self.lock:
+            counter = self.counters.setdefault((row_group, column), {}).setdefault(
+                name, {'seconds': 0.0, 'bytes': 0, 'rows': 0, 'alloc_bytes': 0})
+            for key in counter:
+                counter[key] += values.get(key, 0)
+
+    def write_chrome_trace(self, path):
+        thread_names = [
+            {'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': thread.ident, 'args': {'name': thread.name}}
+            for thread in threading.enumerate()
+        ]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': thread_names + self.events, 'displayTimeUnit': 'ms'}, f, default=str)
+
+    def summary(self, profile_limit=15):
+        """Text tables: time per span name, then per-column and per-row-group counters."""
+        lines = ["  Span                 Calls    Total ms    Mean ms"]
+        for name, (calls, nanoseconds) in sorted(self.totals.items(), key=lambda item: -item[1][1]):
+            lines.append(f"  {name:<18} {calls:>7} {nanoseconds / 1e6:>11.2f} {nanoseconds / 1e6 / calls:>10.3f}")
+
+        names = [n for n in PHASES if any(n in c for c in self.counters.values())]
+        names += sorted({n for c in self.counters.values() for n in c} - set(names))
+        for label, key_index in (('Column', 1), ('Row group', 0)):
+            grouped = {}
+            for key, by_name in self.counters.items():
+                group = grouped.setdefault(key[key_index], {})
+                for name, counter in by_name.items():
+                    merged = group.setdefault(name, {'seconds': 0.0, 'bytes': 0, 'rows': 0, 'alloc_bytes': 0})
+                    for field in merged:
+                        merged[field] += counter[field]
+            if not grouped:
+                continue
+            lines.append("")
+            lines.append(f"  {label:<14}" + "".join(f"{name + ' ms':>14}" for name in names)
+                         + f"{'bytes read':>14}{'rows':>12}" + (f"{'alloc KB':>12}" if self.track_allocations else ""))
+            for group_key in sorted(grouped, key=lambda k: (k is None, k if k is not None else 0)):
+                group = grouped[group_key]
+                cells = "".join(f"{group[name]['seconds'] * 1000:>14.2f}" if name in group else f"{'-':>14}" for name in names)
+                bytes_read = group.get('read', {}).get('bytes', 0)
+                rows = max((counter['rows'] for counter in group.values()), default=0)
+                allocated = sum(counter['alloc_bytes'] for counter in group.values()) / 1024
+                lines.append(f"  {str(group_key):<14}{cells}{bytes_read:>14}{rows:>12}"
+                             + (f"{allocated:>12.1f}" if self.track_allocations else ""))
+
+        if self.profiler is not None:
+            out = io.StringIO()
+            pstats.Stats(self.profiler, stream=out).sort_stats('cumulative').print_stats(profile_limit)
+            lines.append("")
+            lines.append(out.getvalue().rstrip())
+        return "\n".join(lines)
+
+
+@contextlib.contextmanager
+def trace(path=None, profile=False, track_allocations=False):
+    """Trace everything inside the block; writes a Chrome trace JSON to `path` when given."""
+    tracer = Tracer(profile, track_allocations).start()
+    try:
+        yield tracer
+    finally:
+        tracer.stop()
+        if path:
+            tracer.write_chrome_trace(path)